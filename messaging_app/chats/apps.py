@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ChatsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chats'
+
+    def ready(self):
+        # Register signal handlers (denormalized summaries, etc.)
+        from . import signals  # noqa: F401
+        # Register job-queue tasks (chats.jobs)
+        from . import tasks  # noqa: F401
@@ -0,0 +1,88 @@
+# messaging_app/chats/archive.py
+
+"""
+Hot/cold tiering for messages.
+
+Messages older than `CHATS_ARCHIVE_AFTER_DAYS` are moved from `Message` to
+`ArchivedMessage` in small batches, each in its own short transaction, so
+the hot table (and its indexes) only holds the recent window.
+
+Archival is a storage move, not a deletion: the conversation summary and
+unread counters are left untouched, so rows are removed from the hot table
+with a plain DELETE that fires no Message signals. ETag versions are bumped,
+since listings are re-tiered. The
+search index only covers hot messages; archived ones are unindexed in the
+same transaction. Keyset reads in MessageViewSet fall through to the
+archive once the hot rows run out.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .models import ArchivedMessage, Message
+from .search import get_search_backend
+from .summaries import bump_versions
+
+ARCHIVED_FIELDS = ("message_id", "conversation_id", "sender_id", "message_body", "sent_at")
+
+
+def archive_cutoff(days=None):
+    days = days if days is not None else getattr(settings, "CHATS_ARCHIVE_AFTER_DAYS", 365)
+    return timezone.now() - timedelta(days=days)
+
+
+def _delete_hot(message_ids):
+    """
+    DELETE the hot rows without QuerySet.delete(): the Message post_delete
+    handlers would account for them as deleted. Nothing references Message
+    by FK.
+    """
+    connection = connections[router.db_for_write(Message)]
+    quote = connection.ops.quote_name
+    pk = Message._meta.pk
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(Message._meta.db_table)} "
+            f"WHERE {quote(pk.column)} IN ({', '.join(['%s'] * len(message_ids))})",
+            [pk.get_db_prep_value(message_id, connection) for message_id in message_ids],
+        )
+
+
+def archive_batch(cutoff, batch_size=500):
+    """Move up to `batch_size` of the oldest messages before `cutoff`; returns the count."""
+    with transaction.atomic(using=router.db_for_write(Message)):
+        rows = list(
+            Message.objects.filter(sent_at__lt=cutoff)
+            .order_by("sent_at", "message_id")
+            .values(*ARCHIVED_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ArchivedMessage.objects.bulk_create(
+            [ArchivedMessage(**row) for row in rows], ignore_conflicts=True
+        )
+        ids = [row["message_id"] for row in rows]
+        _delete_hot(ids)
+        # Stale entries would take slots in ranked_ids' result cap
+        get_search_backend().remove_many(ids)
+        # Cached listings (page contents, counts) no longer match
+        bump_versions({row["conversation_id"] for row in rows})
+    return len(rows)
+
+
+def archive_messages(cutoff, batch_size=500, pause=0.0, max_batches=None):
+    """Archive everything before `cutoff`; returns the number of messages moved."""
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(cutoff, batch_size)
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return moved
@@ -0,0 +1,209 @@
+# messaging_app/chats/async_views.py
+
+"""
+Async-native list/create endpoints for the message and conversation hot
+paths, mounted next to the DRF viewsets under /api/async/:
+
+    GET/POST /api/async/messages/       (keyset pages, like ?cursor= on
+                                          /api/messages/)
+    GET/POST /api/async/conversations/  (page-number pages, like
+                                          /api/conversations/)
+
+Responses are byte-identical to the corresponding viewset responses. Under
+ASGI these are plain `async def` Django views, so a request waiting on I/O
+holds a coroutine rather than a worker thread:
+
+- authentication: CachedJWTAuthentication.aauthenticate() (cache hits stay
+  on the event loop, misses use the async ORM);
+- membership: MembershipCache.a*() (same);
+- read replicas: GETs read from a replica as on the DRF views, with the
+  same read-your-writes pin (chats.db.replicas);
+- reads: the async ORM (`async for`, acount());
+- writes: one sync_to_async() call per request, because transaction.atomic()
+  (and the signal handlers maintaining summaries and indexes) are sync-only.
+
+Only Bearer tokens are accepted; message search, ordering and ETags stay
+on the DRF endpoints. Note that Django (4.2) still runs async ORM queries in a
+thread via sync_to_async; what moves to the event loop is everything else.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import inbox, jobs, participant_search
+from .authentication import CachedJWTAuthentication
+from .db import replicas
+from .fastpath import compile_plan
+from .membership import get_membership_cache
+from .models import ArchivedMessage, Conversation, Message, User
+from .pagination import KeysetPagination, MessagePagination
+from .serializers import ConversationSerializer, MessageBulkItemSerializer, MessageSerializer
+from .tasks import PUBLISH_MESSAGES
+from .views import ConversationViewSet, conversations_queryset
+
+renderer = JSONRenderer()
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(renderer.render(data), status=status_code, content_type="application/json")
+
+
+class AsyncAPIView(View):
+    """Async handlers behind JWT authentication; errors rendered like DRF."""
+
+    authentication = CachedJWTAuthentication()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Token-authenticated API, like rest_framework.views.APIView
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            result = await self.authentication.aauthenticate(request)
+            if result is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = result
+            replicas.stick_to_primary(request.user)
+            handler = getattr(self, request.method.lower(), None)
+            if request.method.lower() not in self.http_method_names or handler is None:
+                raise exceptions.MethodNotAllowed(request.method)
+            return await handler(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            response = json_response(
+                exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail},
+                exc.status_code,
+            )
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                response.status_code = status.HTTP_401_UNAUTHORIZED
+                response["WWW-Authenticate"] = self.authentication.authenticate_header(request)
+            return response
+
+    @staticmethod
+    def parse_json(request):
+        try:
+            return json.loads(request.body or b"null")
+        except ValueError as exc:
+            raise exceptions.ParseError(f"JSON parse error - {exc}")
+
+
+class AsyncMessageView(AsyncAPIView):
+    """Keyset-paginated message list and single-message create."""
+
+    http_method_names = ["get", "post"]
+    plan = compile_plan(MessageSerializer)
+
+    def get_archive_queryset(self):
+        """Cold-tier fall-through for KeysetPagination, as in MessageViewSet."""
+        return ArchivedMessage.objects.filter(
+            conversation_id__in=self.conversation_ids
+        ).values(*self.plan.lookups)
+
+    async def get(self, request):
+        self.conversation_ids = await get_membership_cache().aconversations(request.user.pk)
+        hot = Message.objects.filter(conversation_id__in=self.conversation_ids)
+        paginator = KeysetPagination()
+        paginator.page_size = MessagePagination.page_size or paginator.page_size
+        page = await paginator.apaginate_queryset(
+            hot.values(*self.plan.lookups), Request(request), view=self
+        )
+        return json_response({
+            "older": paginator.get_older_link(),
+            "newer": paginator.get_newer_link(),
+            "results": self.plan.render_many(page),
+        })
+
+    async def post(self, request):
+        serializer = MessageBulkItemSerializer(data=self.parse_json(request))
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        sender_id = data.get("sender_id") or request.user.pk
+        if not await get_membership_cache().ais_member(data["conversation_id"], sender_id):
+            raise exceptions.ValidationError("Sender must be a participant in the conversation.")
+        created = await sync_to_async(self.create_message)(
+            data["conversation_id"], sender_id, data["message_body"]
+        )
+        return json_response(created, status.HTTP_201_CREATED)
+
+    @staticmethod
+    def create_message(conversation_id, sender_id, body):
+        # Insert, summary update and side-effect jobs as in MessageViewSet.create
+        with transaction.atomic():
+            message = Message.objects.create(
+                conversation=Conversation.objects.get(pk=conversation_id),
+                sender=User.objects.get(pk=sender_id),
+                message_body=body,
+            )
+            data = MessageSerializer(message).data
+            jobs.enqueue(PUBLISH_MESSAGES, {"messages": [data]})
+        return data
+
+
+class AsyncConversationView(AsyncAPIView):
+    """Page-number-paginated conversation list and conversation create."""
+
+    http_method_names = ["get", "post"]
+    page_size = api_settings.PAGE_SIZE
+
+    @staticmethod
+    def messages_limit(params):
+        try:
+            limit = int(params["messages_limit"])
+        except (KeyError, ValueError):
+            return ConversationViewSet.messages_limit
+        return max(0, min(limit, ConversationViewSet.max_messages_limit))
+
+    async def get(self, request):
+        limit = self.messages_limit(request.GET)
+        user_id = request.user.pk
+        # The viewset's default ordering, from the caller's inbox rows
+        queryset = participant_search.filter_conversations(
+            inbox.for_user(conversations_queryset(user_id, None, limit), user_id),
+            request.GET.get("search", ""),
+        ).order_by(*ConversationViewSet.ordering)
+        try:
+            page_number = int(request.GET.get("page", 1))
+        except ValueError:
+            raise exceptions.NotFound("Invalid page.")
+        count = await queryset.acount()
+        start = (page_number - 1) * self.page_size
+        if page_number < 1 or (start >= count and page_number != 1):
+            raise exceptions.NotFound("Invalid page.")
+        # The prefetches run with the page query, in the same thread hop
+        page = [conversation async for conversation in queryset[start:start + self.page_size]]
+        url = request.build_absolute_uri()
+        return json_response({
+            "count": count,
+            "next": replace_query_param(url, "page", page_number + 1) if start + self.page_size < count else None,
+            "previous": (
+                None if page_number == 1
+                else remove_query_param(url, "page") if page_number == 2
+                else replace_query_param(url, "page", page_number - 1)
+            ),
+            "results": ConversationSerializer(page, many=True, context={"messages_limit": limit}).data,
+        })
+
+    async def post(self, request):
+        serializer = ConversationSerializer(data=self.parse_json(request))
+        data = await sync_to_async(self.create_conversation)(
+            serializer, request.user, self.messages_limit(request.GET)
+        )
+        return json_response(data, status.HTTP_201_CREATED)
+
+    @staticmethod
+    def create_conversation(serializer, user, limit):
+        # Validation looks the participants up, so it runs in the thread too
+        serializer.is_valid(raise_exception=True)
+        conversation = serializer.save(participants=[*serializer.validated_data["participants"], user])
+        return ConversationSerializer(conversation, context={"messages_limit": limit}).data
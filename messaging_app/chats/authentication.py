@@ -0,0 +1,233 @@
+# messaging_app/chats/authentication.py
+
+"""
+Authentication classes for the chats API.
+
+CachedBasicAuthentication remembers successful (username, password)
+verifications for a short TTL, keyed by an HMAC of the credentials under a
+random per-process key, so scripted clients pay the PBKDF2 cost once per
+TTL rather than once per request. Each entry records the password hash it
+was verified against; a password change makes it miss.
+
+CachedJWTAuthentication resolves the token's user from a bounded in-process
+LRU (with TTL) instead of a SELECT per request. Entries are dropped by the
+User post_save/post_delete handlers in chats.signals (profile edits,
+deactivation, password changes). With a shared cache alias configured,
+each user also gets an auth version in that cache; the handlers bump it so
+other worker processes notice the change on their next lookup.
+
+Configure with the CHATS_AUTH_USER_CACHE setting:
+    {"MAX_ENTRIES": 10000, "TTL": 60, "SHARED_ALIAS": None}
+Changes made with QuerySet.update() send no signals and are only picked up
+when the TTL expires.
+
+CachedJWTAuthentication.aauthenticate() is the coroutine used by the async
+views (chats.async_views): cache hits are answered without leaving the event
+loop and misses use the async ORM.
+"""
+
+import copy
+import hashlib
+import hmac
+import secrets
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .caching import LRUCache
+from .db.replicas import use_primary
+
+DEFAULTS = {
+    "MAX_ENTRIES": 10000,
+    "TTL": 60,
+    "SHARED_ALIAS": None,
+}
+
+VERSION_PREFIX = "chats:auth-version:"
+
+
+class UserAuthCache:
+
+    def __init__(self, max_entries, ttl, shared_alias=None):
+        self.local = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.shared = caches[shared_alias] if shared_alias else None
+
+    def _version(self, user_id):
+        if self.shared is None:
+            return 0
+        return self.shared.get(VERSION_PREFIX + str(user_id), 0)
+
+    def get(self, user_id):
+        entry = self.local.get(str(user_id))
+        if entry is None:
+            return None
+        version, user = entry
+        if version != self._version(user_id):
+            self.local.delete(str(user_id))
+            return None
+        # Callers may mutate request.user; never hand out the shared instance
+        return copy.copy(user)
+
+    def set(self, user_id, user):
+        self.local.set(str(user_id), (self._version(user_id), copy.copy(user)))
+
+    # Without a shared tier both are pure in-memory operations
+    async def aget(self, user_id):
+        if self.shared is None:
+            return self.get(user_id)
+        return await sync_to_async(self.get)(user_id)
+
+    async def aset(self, user_id, user):
+        if self.shared is None:
+            return self.set(user_id, user)
+        return await sync_to_async(self.set)(user_id, user)
+
+    def _drop(self, user_id):
+        self.local.delete(str(user_id))
+        if self.shared is not None:
+            key = VERSION_PREFIX + str(user_id)
+            self.shared.add(key, 0, timeout=None)
+            self.shared.incr(key)
+
+    def invalidate(self, user_id):
+        self._drop(user_id)
+        # Again after commit, in case a request cached the uncommitted row
+        transaction.on_commit(lambda: self._drop(user_id))
+
+    def clear(self):
+        self.local.clear()
+
+
+_cache = None
+
+
+def get_user_auth_cache():
+    global _cache
+    if _cache is None:
+        config = {**DEFAULTS, **getattr(settings, "CHATS_AUTH_USER_CACHE", {})}
+        _cache = UserAuthCache(config["MAX_ENTRIES"], config["TTL"], config["SHARED_ALIAS"])
+    return _cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication with the per-request user SELECT served from cache."""
+
+    @staticmethod
+    def _user_id(validated_token):
+        try:
+            return validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        cache = get_user_auth_cache()
+        user = cache.get(user_id)
+        if user is None:
+            # Full lookup and checks; only successfully resolved users are
+            # cached (read from the primary, see chats.db.replicas)
+            with use_primary():
+                user = super().get_user(validated_token)
+            cache.set(user_id, user)
+            return user
+        return self.check_user(user, validated_token)
+
+    async def aget_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        cache = get_user_auth_cache()
+        user = await cache.aget(user_id)
+        if user is None:
+            try:
+                with use_primary():
+                    user = await self.user_model.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            self.check_user(user, validated_token)
+            await cache.aset(user_id, user)
+            return user
+        return self.check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        """Async counterpart of authenticate() for plain Django requests."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    def check_user(self, user, validated_token):
+        """The checks of JWTAuthentication.get_user, against a loaded user."""
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if jwt_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+        return user
+
+
+# Never persisted or shared: cached digests are useless outside this process
+_CREDENTIAL_KEY = secrets.token_bytes(32)
+_verified = None
+
+
+def credential_digest(username, password):
+    message = f"{username}\0{password}".encode("utf-8")
+    return hmac.new(_CREDENTIAL_KEY, message, hashlib.sha256).hexdigest()
+
+
+def get_verified_credentials_cache():
+    global _verified
+    if _verified is None:
+        _verified = LRUCache(
+            max_entries=getattr(settings, "CHATS_BASIC_AUTH_CACHE_SIZE", 1000),
+            ttl=getattr(settings, "CHATS_BASIC_AUTH_CACHE_TTL", 60),
+        )
+    return _verified
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """BasicAuthentication that skips re-hashing recently verified credentials."""
+
+    def authenticate_credentials(self, userid, password, request=None):
+        verified = get_verified_credentials_cache()
+        digest = credential_digest(userid, password)
+        entry = verified.get(digest)
+        if entry is not None:
+            user_id, password_hash = entry
+            user = self._load_user(user_id)
+            if user is not None and user.password == password_hash:
+                if not user.is_active:
+                    raise AuthenticationFailed(_("User inactive or deleted."))
+                return (user, None)
+            # Password changed (or user gone): verify from scratch
+            verified.delete(digest)
+
+        user, auth = super().authenticate_credentials(userid, password, request)
+        verified.set(digest, (user.pk, user.password))
+        return (user, auth)
+
+    @staticmethod
+    def _load_user(user_id):
+        cache = get_user_auth_cache()
+        user = cache.get(user_id)
+        if user is None:
+            with use_primary():
+                user = get_user_model().objects.filter(pk=user_id).first()
+            if user is not None:
+                cache.set(user_id, user)
+        return user
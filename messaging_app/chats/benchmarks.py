@@ -0,0 +1,87 @@
+# messaging_app/chats/benchmarks.py
+
+"""
+Shared helpers for the `bench_*` management commands.
+
+Benchmarks that touch the database run against a throwaway test database
+(created and destroyed around the run) so they never pollute real data.
+"""
+
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """Create a fresh test database for the duration of the block."""
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize_latencies(seconds):
+    """p50/p95/p99/mean in milliseconds for a list of durations in seconds."""
+    values = sorted(value * 1000 for value in seconds)
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.fmean(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+    }
+
+
+class Timer:
+    """Context manager measuring wall-clock time in seconds."""
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+
+
+def backdated_bulk_create(model, objs, batch_size=None):
+    """
+    bulk_create() keeping the values given for `auto_now_add` fields.
+
+    Those fields are stamped with now() on insert; the given values (e.g. a
+    backdated sent_at) are written back with a follow-up UPDATE, leaving the
+    shared model fields alone for other threads. The objects need their
+    primary keys before the insert (client-generated UUIDs).
+    """
+    objs = list(objs)
+    fields = [field for field in model._meta.concrete_fields if getattr(field, "auto_now_add", False)]
+    given = [[getattr(obj, field.attname) for field in fields] for obj in objs]
+    model.objects.bulk_create(objs, batch_size=batch_size)
+    for obj, values in zip(objs, given):
+        for field, value in zip(fields, values):
+            if value is not None:
+                setattr(obj, field.attname, value)
+    if fields and objs:
+        model.objects.bulk_update(objs, [field.name for field in fields], batch_size=batch_size)
+    return objs
+
+
+def time_repeated(func, repeat):
+    """Run `func` `repeat` times; returns summarize_latencies() of the runs."""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    return summarize_latencies(durations)
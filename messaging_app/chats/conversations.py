@@ -0,0 +1,101 @@
+# messaging_app/chats/conversations.py
+
+"""
+Conversation creation and participant-set deduplication.
+
+Every conversation created here stores `participant_key`, a canonical hash
+of its participant set, under a unique index. "Open a chat with Bob"
+(`find_or_create_conversation`) is then one indexed equality lookup instead
+of an M2M set-equality query, and the unique index settles races between
+concurrent creators.
+
+At most one conversation owns a key: a plain create whose set already has
+a conversation is stored without one. A conversation whose membership
+changes afterwards gives its key up (see chats.signals) -- it is no longer
+the conversation "of" that set.
+
+Creation writes the conversation row and all through-rows with two
+INSERTs (the through-rows in one bulk insert) and applies the membership
+side effects that bulk_create skips: cache invalidation, the participant
+search index and the inbox rows. The response then needs one participants
+SELECT.
+"""
+
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
+
+from . import inbox, participant_search
+from .membership import get_membership_cache
+from .models import Conversation, ConversationParticipant
+
+
+def participant_key(user_ids):
+    """Canonical hex digest of a set of user ids (order and duplicates ignored)."""
+    canonical = ",".join(sorted({str(user_id).replace("-", "").lower() for user_id in user_ids}))
+    return hashlib.sha256(canonical.encode("ascii")).hexdigest()
+
+
+def _prime_participants(conversation):
+    """Prefetch what the response renders, as the list queryset does."""
+    prefetch_related_objects([conversation], "participants")
+    # Nothing to show yet (see ConversationSerializer.get_messages)
+    conversation.latest_messages = []
+
+
+def _unique(users):
+    return list({user.pk: user for user in users}.values())
+
+
+def _create(users, key):
+    conversation = Conversation.objects.create(participant_key=key)
+    ConversationParticipant.objects.bulk_create(
+        ConversationParticipant(conversation=conversation, user=user) for user in users
+    )
+    get_membership_cache().invalidate([conversation.pk], [user.pk for user in users])
+    participant_search.index_memberships((conversation.pk, user) for user in users)
+    inbox.add_members(conversation, [user.pk for user in users])
+    _prime_participants(conversation)
+    return conversation
+
+
+def create_conversation(users):
+    """
+    Create a conversation for `users`. It takes the set's key unless
+    another conversation already owns it.
+    """
+    users = _unique(users)
+    key = participant_key(user.pk for user in users)
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                return _create(users, key)
+        except IntegrityError:
+            return _create(users, None)
+
+
+def find_or_create_conversation(users, queryset=None):
+    """
+    Returns (conversation, created). The existing conversation is looked up
+    by key in `queryset` (e.g. one with the prefetches a response needs).
+    """
+    queryset = Conversation.objects.all() if queryset is None else queryset
+    users = _unique(users)
+    key = participant_key(user.pk for user in users)
+    existing = queryset.filter(participant_key=key).first()
+    if existing is not None:
+        return existing, False
+    try:
+        with transaction.atomic():
+            return _create(users, key), True
+    except IntegrityError:
+        # A concurrent request created it first
+        return queryset.get(participant_key=key), False
+
+
+def release_participant_keys(conversation_ids):
+    """After a membership change: these conversations no longer own a set."""
+    Conversation.objects.filter(pk__in=conversation_ids, participant_key__isnull=False).update(
+        participant_key=None
+    )
@@ -0,0 +1,97 @@
+# messaging_app/chats/db/backends/mysql_pool/base.py
+
+"""
+django.db.backends.mysql with pooled physical connections.
+
+    DATABASES["default"] = {
+        "ENGINE": "chats.db.backends.mysql_pool",
+        ...,
+        "POOL": {"MIN_SIZE": 2, "MAX_SIZE": 20, "MAX_LIFETIME": 1800,
+                 "CHECKOUT_TIMEOUT": 5, "HEALTH_CHECK_AFTER": 1},
+    }
+
+Django still "closes" its connection at the end of each request
+(CONN_MAX_AGE = 0), but the MySQL session goes back to a per-process pool
+instead of being torn down, so the TCP/auth handshake and `init_command`
+run only when a physical connection is opened. Connections are rolled
+back on return, checked with ping() on checkout once they have been idle
+for HEALTH_CHECK_AFTER seconds, and replaced after MAX_LIFETIME seconds.
+
+Set "POOL": {"ENABLED": False} to fall back to plain connections. Pool
+counters (checkouts, waits, timeouts, ...) are served at /api/metrics/sql/.
+"""
+
+import threading
+
+from django.db.backends.mysql import base as mysql_base
+
+from chats.db.pool import ConnectionPool, PoolTimeout
+
+DEFAULT_POOL = {
+    "ENABLED": True,
+    "MIN_SIZE": 0,
+    "MAX_SIZE": 10,
+    "MAX_LIFETIME": 1800.0,
+    "CHECKOUT_TIMEOUT": 5.0,
+    "HEALTH_CHECK_AFTER": 1.0,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_options(settings_dict):
+    return {**DEFAULT_POOL, **settings_dict.get("POOL", {})}
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+
+    @property
+    def pool_enabled(self):
+        return pool_options(self.settings_dict)["ENABLED"]
+
+    @property
+    def pool_key(self):
+        # Keyed by database name too, so test databases get their own pool
+        return (self.alias, self.settings_dict["NAME"])
+
+    def get_pool(self):
+        return _pools.get(self.pool_key)
+
+    def _get_pool(self, conn_params):
+        pool = _pools.get(self.pool_key)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(self.pool_key)
+                if pool is None:
+                    options = pool_options(self.settings_dict)
+                    connect = super(DatabaseWrapper, self).get_new_connection
+                    pool = ConnectionPool(
+                        connect=lambda: connect(conn_params),
+                        ping=lambda conn: conn.ping(),
+                        reset=lambda conn: conn.rollback(),
+                        min_size=options["MIN_SIZE"],
+                        max_size=options["MAX_SIZE"],
+                        max_lifetime=options["MAX_LIFETIME"],
+                        checkout_timeout=options["CHECKOUT_TIMEOUT"],
+                        health_check_after=options["HEALTH_CHECK_AFTER"],
+                    )
+                    pool.prefill()
+                    _pools[self.pool_key] = pool
+        return pool
+
+    def get_new_connection(self, conn_params):
+        if not self.pool_enabled:
+            return super().get_new_connection(conn_params)
+        try:
+            return self._get_pool(conn_params).checkout()
+        except PoolTimeout as exc:
+            raise mysql_base.Database.OperationalError(str(exc)) from exc
+
+    def _close(self):
+        pool = self.get_pool() if self.pool_enabled else None
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            # A connection that raised errors may be half-broken: replace it
+            pool.checkin(self.connection, discard=self.errors_occurred and not self.is_usable())
@@ -0,0 +1,201 @@
+# messaging_app/chats/db/pool.py
+
+"""
+A small, thread-safe connection pool for DB-API connections.
+
+Used by the `chats.db.backends.mysql_pool` Django backend; it does not
+depend on any particular driver. `connect()` creates a physical connection,
+`ping(conn)` is the liveness check, `reset(conn)` cleans a connection on
+return.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the checkout timeout."""
+
+
+class PooledConnection:
+    __slots__ = ("raw", "created_at", "returned_at")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = self.returned_at = time.monotonic()
+
+
+class ConnectionPool:
+
+    def __init__(
+        self,
+        connect,
+        ping=None,
+        reset=None,
+        min_size=0,
+        max_size=10,
+        max_lifetime=1800.0,
+        checkout_timeout=5.0,
+        health_check_after=0.0,
+    ):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Pool requires 0 <= min_size <= max_size and max_size >= 1.")
+        self._connect = connect
+        self._ping = ping
+        self._reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        # Only ping connections that sat idle at least this long (0: always)
+        self.health_check_after = health_check_after
+
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self.metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_closed": 0,
+            "failed_health_checks": 0,
+            "expired": 0,
+        }
+
+    # --- internals (lock not held) ---
+    def _close(self, pooled):
+        try:
+            pooled.raw.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self.metrics["connections_closed"] += 1
+            self._available.notify()
+
+    def _new(self):
+        try:
+            pooled = PooledConnection(self._connect())
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._available.notify()
+            raise
+        with self._lock:
+            self.metrics["connections_created"] += 1
+        return pooled
+
+    def _expired(self, pooled, now):
+        return self.max_lifetime is not None and now - pooled.created_at >= self.max_lifetime
+
+    def _healthy(self, pooled, now):
+        if self._ping is None or now - pooled.returned_at < self.health_check_after:
+            return True
+        try:
+            self._ping(pooled.raw)
+            return True
+        except Exception:
+            return False
+
+    # --- public API ---
+    def prefill(self):
+        """Open connections until `min_size` exist."""
+        while True:
+            with self._lock:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            pooled = self._new()
+            with self._lock:
+                self._idle.append(pooled)
+                self._available.notify()
+
+    def checkout(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        waited_since = None
+        while True:
+            pooled = None
+            create = False
+            with self._lock:
+                while not self._idle and self._size >= self.max_size:
+                    if waited_since is None:
+                        waited_since = time.monotonic()
+                        self.metrics["waits"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.metrics["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"No connection available within {self.checkout_timeout}s "
+                            f"(max_size={self.max_size})."
+                        )
+                    self._available.wait(remaining)
+                if waited_since is not None:
+                    self.metrics["wait_time"] += time.monotonic() - waited_since
+                    waited_since = None
+                if self._idle:
+                    pooled = self._idle.pop()  # LIFO keeps a hot working set
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                pooled = self._new()
+            else:
+                now = time.monotonic()
+                if self._expired(pooled, now):
+                    with self._lock:
+                        self.metrics["expired"] += 1
+                    self._close(pooled)
+                    continue
+                if not self._healthy(pooled, now):
+                    with self._lock:
+                        self.metrics["failed_health_checks"] += 1
+                    self._close(pooled)
+                    continue
+
+            with self._lock:
+                self._in_use[id(pooled.raw)] = pooled
+                self.metrics["checkouts"] += 1
+            return pooled.raw
+
+    def checkin(self, raw, discard=False):
+        """Return a connection; `discard=True` closes it instead (e.g. broken)."""
+        with self._lock:
+            pooled = self._in_use.pop(id(raw), None)
+        if pooled is None:
+            raw.close()
+            return
+        if not discard and self._reset is not None:
+            try:
+                self._reset(raw)
+            except Exception:
+                discard = True
+        if discard or self._expired(pooled, time.monotonic()):
+            self._close(pooled)
+            return
+        pooled.returned_at = time.monotonic()
+        with self._lock:
+            self._idle.append(pooled)
+            self._available.notify()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for pooled in idle:
+            self._close(pooled)
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.metrics,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            }
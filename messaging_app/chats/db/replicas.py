@@ -0,0 +1,208 @@
+# messaging_app/chats/db/replicas.py
+
+"""
+Read-replica routing with read-your-writes stickiness.
+
+- `ReplicaRouter` (DATABASE_ROUTERS) sends every write, and every read
+  outside a replica-routed request, to `default` (the primary).
+- `ReplicaRoutingMiddleware` marks GET/HEAD requests as replica-safe and
+  picks one replica per request, so all reads of a response come from the
+  same snapshot. Requests with other methods never touch a replica.
+- After a successful unsafe request the user is pinned to the primary for
+  STICKY_SECONDS, long enough to cover replication lag: their next reads see
+  their own writes. The pin is checked once the user is known, by
+  `ReadYourWritesMixin.initial()` (DRF views) or `stick_to_primary()`.
+  Pins live in an in-process LRU tier and, with several workers, in a
+  shared cache alias (as chats.membership).
+- The middleware is sync and async capable, so under ASGI async views are
+  awaited directly instead of through a thread.
+
+Other users see a write once their replica has applied it. Caches that are
+invalidated on write (membership, JWT users) fill inside `use_primary()`, so
+a lagging replica cannot put a stale entry back after an invalidation.
+
+    CHATS_DB_ROUTING = {
+        "REPLICAS": ["replica"],   # aliases in DATABASES; empty: no routing
+        "STICKY_SECONDS": 5,
+        "MAX_ENTRIES": 10000,
+        "SHARED_ALIAS": None,
+    }
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from ..caching import LRUCache
+
+DEFAULTS = {
+    "REPLICAS": [],
+    "STICKY_SECONDS": 5,
+    "MAX_ENTRIES": 10000,
+    "SHARED_ALIAS": None,
+}
+
+SAFE_METHODS = ("GET", "HEAD")
+PIN_PREFIX = "chats:primary-pin:"
+
+
+def get_settings():
+    return {**DEFAULTS, **getattr(settings, "CHATS_DB_ROUTING", {})}
+
+
+class Route:
+    """Read alias for the current request; `replica` None means the primary."""
+
+    __slots__ = ("replica",)
+
+    def __init__(self, replica):
+        self.replica = replica
+
+
+_route = ContextVar("chats_db_route", default=None)
+
+
+def current_read_alias():
+    route = _route.get()
+    return route.replica if route is not None and route.replica else DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_primary():
+    """Route the reads in this block to the primary."""
+    token = _route.set(None)
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        alias = current_read_alias()
+        # A transaction on the primary keeps its reads there
+        if alias != DEFAULT_DB_ALIAS and connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+class PrimaryPins:
+    """Users recently written for, with the time their pin expires."""
+
+    def __init__(self, sticky_seconds, max_entries, shared_alias=None):
+        self.sticky_seconds = sticky_seconds
+        self.local = LRUCache(max_entries=max_entries, ttl=sticky_seconds)
+        self.shared = caches[shared_alias] if shared_alias else None
+
+    def pin(self, user_id):
+        key = PIN_PREFIX + str(user_id)
+        until = time.time() + self.sticky_seconds
+        self.local.set(key, until)
+        if self.shared is not None:
+            self.shared.set(key, until, self.sticky_seconds)
+
+    def is_pinned(self, user_id):
+        key = PIN_PREFIX + str(user_id)
+        until = self.local.get(key)
+        if until is None and self.shared is not None:
+            until = self.shared.get(key)
+            if until is not None:
+                self.local.set(key, until)
+        return until is not None and until > time.time()
+
+    def clear(self):
+        self.local.clear()
+
+
+_pins = None
+
+
+def get_primary_pins():
+    global _pins
+    if _pins is None:
+        config = get_settings()
+        _pins = PrimaryPins(
+            sticky_seconds=config["STICKY_SECONDS"],
+            max_entries=config["MAX_ENTRIES"],
+            shared_alias=config["SHARED_ALIAS"],
+        )
+    return _pins
+
+
+def stick_to_primary(user):
+    """Send the rest of this request's reads to the primary if `user` just wrote."""
+    route = _route.get()
+    if route is not None and route.replica and user.is_authenticated and get_primary_pins().is_pinned(user.pk):
+        route.replica = None
+
+
+class ReadYourWritesMixin:
+    """DRF views: apply the primary pin once the request is authenticated."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        stick_to_primary(request.user)
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.replicas = list(get_settings()["REPLICAS"])
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def route(self, request):
+        safe = request.method in SAFE_METHODS
+        return safe, _route.set(Route(random.choice(self.replicas) if safe else None))
+
+    @staticmethod
+    def pin_writer(request, safe, response):
+        """Pin the user after a successful unsafe request."""
+        # DRF and the async views store the authenticated user on the request
+        user = getattr(request, "user", None)
+        if not safe and response.status_code < 400 and user is not None and user.is_authenticated:
+            get_primary_pins().pin(user.pk)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.replicas:
+            return self.get_response(request)
+        safe, token = self.route(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _route.reset(token)
+        self.pin_writer(request, safe, response)
+        return response
+
+    async def __acall__(self, request):
+        if not self.replicas:
+            return await self.get_response(request)
+        safe, token = self.route(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _route.reset(token)
+        if not safe:
+            # request.user may still be a lazy session lookup: not on the loop
+            await sync_to_async(self.pin_writer)(request, safe, response)
+        return response
@@ -0,0 +1,74 @@
+# messaging_app/chats/etags.py
+
+"""
+Conditional GET (ETag / If-None-Match) for the chats viewsets.
+
+ETags are derived from `Conversation.version` counters instead of the
+response body, so an unchanged resource is answered with 304 after one
+cheap aggregate over the version column -- no serialization at all.
+
+Note: embedded user profile fields (names, email) are not versioned; a
+profile edit alone does not change the ETag.
+"""
+
+import hashlib
+
+from django.db.models import Count, Sum
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Conversation
+
+
+def conversations_etag(request, conversation_ids):
+    """ETag covering the given conversations, the caller and the query string."""
+    conversation_ids = sorted(str(cid) for cid in conversation_ids)
+    totals = Conversation.objects.filter(pk__in=conversation_ids).aggregate(
+        versions=Sum("version"), count=Count("pk")
+    )
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (
+        str(request.user.pk),
+        request.path,
+        request.META.get("QUERY_STRING", ""),
+        ",".join(conversation_ids),
+        str(totals["versions"] or 0),
+        str(totals["count"]),
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return quote_etag(digest.hexdigest())
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag handling to list/retrieve. The viewset provides
+    `get_etag_conversation_ids()` returning the conversations a response
+    depends on (None to skip conditional handling).
+    """
+
+    def get_etag_conversation_ids(self):
+        return None
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        conversation_ids = self.get_etag_conversation_ids()
+        if conversation_ids is None:
+            return handler(request, *args, **kwargs)
+        etag = conversations_etag(request, conversation_ids)
+        if_none_match = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            # Responses are per-user
+            response["Cache-Control"] = "private, no-cache"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
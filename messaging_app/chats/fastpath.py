@@ -0,0 +1,141 @@
+# messaging_app/chats/fastpath.py
+
+"""
+Lean read path for serializers used on hot list endpoints.
+
+`compile_plan()` walks a (read-only use of a) ModelSerializer once and turns
+it into a flat plan: the `.values()` lookups to fetch and a converter per
+output key that reproduces the DRF field's `to_representation`. Rendering a
+row is then a loop over plain dicts -- no model instances, no field
+binding, no per-row attribute resolution -- and the JSON output is
+byte-identical to the serializer's.
+"""
+
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+NESTED = object()
+
+
+def _datetime_converter(field):
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601 or hasattr(field, "timezone"):
+        return field.to_representation
+
+    def convert(value):
+        # DateTimeField.to_representation for aware values in ISO 8601
+        if not timezone.is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(timezone.get_current_timezone()).isoformat()
+        if value.endswith("+00:00"):
+            value = value[:-6] + "Z"
+        return value
+
+    return convert
+
+
+def _converter(field):
+    """A callable equivalent to field.to_representation for non-None values."""
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == "hex_verbose":
+        return str
+    if isinstance(field, serializers.ChoiceField):
+        mapping = field.choice_strings_to_values
+
+        def convert(value):
+            if value == "":
+                return value
+            return mapping.get(str(value), value)
+
+        return convert
+    if type(field) in (serializers.CharField, serializers.EmailField):
+        return str
+    if isinstance(field, (serializers.IntegerField, serializers.BooleanField)):
+        return field.to_representation
+    if isinstance(field, (serializers.SerializerMethodField, serializers.ManyRelatedField, serializers.ListSerializer)):
+        raise TypeError(f"{type(field).__name__} cannot be rendered from .values() rows")
+    return field.to_representation
+
+
+class Plan:
+    """Compiled rendering plan for one serializer class."""
+
+    def __init__(self, serializer, prefix=""):
+        self.steps = []
+        self.lookups = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == "*":
+                raise TypeError(f"Field {name!r} uses source='*'")
+            lookup = prefix + "__".join(field.source_attrs)
+            if isinstance(field, serializers.BaseSerializer):
+                nested = Plan(field, lookup + "__")
+                self.steps.append((name, NESTED, nested))
+                self.lookups.extend(nested.lookups)
+            else:
+                self.steps.append((name, lookup, _converter(field)))
+                self.lookups.append(lookup)
+
+    def render(self, row):
+        out = {}
+        for name, lookup, convert in self.steps:
+            if lookup is NESTED:
+                out[name] = convert.render(row)
+            else:
+                value = row[lookup]
+                out[name] = None if value is None else convert(value)
+        return out
+
+    def render_many(self, rows):
+        render = self.render
+        return [render(row) for row in rows]
+
+
+_plans = {}
+
+
+def compile_plan(serializer_class):
+    plan = _plans.get(serializer_class)
+    if plan is None:
+        plan = _plans[serializer_class] = Plan(serializer_class())
+    return plan
+
+
+class FastReadMixin:
+    """
+    list/retrieve through a compiled plan of `fast_serializer_class`
+    (defaults to `serializer_class`). Querysets are narrowed to `.values()`
+    after filtering, so pagination and filters work unchanged.
+    """
+
+    fast_serializer_class = None
+
+    def get_fast_plan(self):
+        return compile_plan(self.fast_serializer_class or self.serializer_class)
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_fast_plan()
+        queryset = self.filter_queryset(self.get_queryset()).values(*plan.lookups)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.render_many(page))
+        return Response(plan.render_many(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        plan = self.get_fast_plan()
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            row = queryset.filter(**{self.lookup_field: self.kwargs[lookup]}).values(*plan.lookups).first()
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        if row is None:
+            return super().retrieve(request, *args, **kwargs)
+        return Response(plan.render(row))
@@ -0,0 +1,44 @@
+# messaging_app/chats/filters.py
+
+from rest_framework import filters
+
+from . import participant_search
+from .search import get_search_backend
+
+
+class MessageSearchFilter(filters.SearchFilter):
+    """
+    ?search=<text> answered from the full-text index (chats.search), ranked
+    by relevance unless the client asked for an explicit ?ordering=.
+
+    Must run after OrderingFilter so the relevance order is not overridden.
+    Sets `request.search_truncated` when hits past the backend's
+    `max_results` were dropped.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        backend = get_search_backend()
+        if not backend.uses_index:
+            return super().filter_queryset(request, queryset, view)
+
+        query = request.query_params.get(self.search_param, "").strip()
+        if not query:
+            return queryset
+        ordered = filters.OrderingFilter.ordering_param in request.query_params
+        results, request.search_truncated = backend.search_ranked(queryset, query, request.user)
+        if ordered:
+            return results.order_by(*queryset.query.order_by)
+        return results
+
+
+class ParticipantSearchFilter(filters.SearchFilter):
+    """
+    ?search=<words> on conversations: every word must be a prefix of a
+    participant's username, email, name or one of their word parts
+    (accent- and case-insensitive), answered from the participant search
+    index (chats.participant_search) instead of icontains over the join.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "")
+        return participant_search.filter_conversations(queryset, query)
@@ -0,0 +1,177 @@
+# messaging_app/chats/inbox.py
+
+"""
+Materialized per-user inbox, answered from `InboxEntry`.
+
+Every participant has one row per conversation holding the conversation's
+latest activity (its last message, or its creation while it has none) and
+a snippet of that message. `(user, last_activity_at, conversation)` is
+indexed, so "my conversations, most recently active first" is a range
+scan over the caller's rows instead of a MAX(sent_at) aggregate over
+their messages.
+
+Rows are written on message write (fan-out-on-write): for conversations of
+up to FAN_OUT_BATCH_SIZE members that is one UPDATE inside the message's
+transaction. Larger groups get the sender's row updated inline and the
+rest from the job queue (chats.jobs), in UPDATEs of FAN_OUT_BATCH_SIZE
+members, each in its own short transaction. Updates only move activity
+forward, so replays and out-of-order batches are harmless. Membership rows
+are kept by the signals in chats.signals.
+
+    CHATS_INBOX = {
+        "FAN_OUT_BATCH_SIZE": 500,
+    }
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from . import jobs
+from .membership import get_membership_cache
+from .models import Conversation, ConversationParticipant, InboxEntry, make_preview
+
+DEFAULTS = {
+    "FAN_OUT_BATCH_SIZE": 500,
+}
+
+SUMMARY_FIELDS = ("last_message_at", "created_at", "last_message_preview")
+
+
+def get_settings():
+    return {**DEFAULTS, **getattr(settings, "CHATS_INBOX", {})}
+
+
+def for_user(queryset, user_id):
+    """
+    `queryset` (of Conversation) restricted to `user_id`'s inbox, with
+    aliases to order by: ("-last_activity_at", "-inbox_conversation_id")
+    reads inbox_user_activity_idx backwards, with no sort step.
+    """
+    return queryset.filter(inbox_entries__user_id=user_id).alias(
+        last_activity_at=F("inbox_entries__last_activity_at"),
+        inbox_conversation_id=F("inbox_entries__conversation_id"),
+    )
+
+
+def _activity(last_message_at, created_at, preview):
+    """(last_activity_at, snippet) from a conversation's summary fields."""
+    return last_message_at or created_at, preview
+
+
+def add_memberships(pairs):
+    """Create the rows of (conversation_id, user_id) pairs; returns rows written."""
+    pairs = list(pairs)
+    conversations = Conversation.objects.filter(pk__in={conversation_id for conversation_id, _ in pairs})
+    summaries = {pk: _activity(*summary) for pk, *summary in conversations.values_list("pk", *SUMMARY_FIELDS)}
+    rows = [
+        InboxEntry(
+            conversation_id=conversation_id,
+            user_id=user_id,
+            last_activity_at=summaries[conversation_id][0],
+            snippet=summaries[conversation_id][1],
+        )
+        for conversation_id, user_id in pairs
+        if conversation_id in summaries
+    ]
+    InboxEntry.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+def add_members(conversation, user_ids):
+    """`add_memberships` for a loaded conversation (e.g. just created): no SELECT."""
+    last_activity_at, snippet = _activity(*(getattr(conversation, field) for field in SUMMARY_FIELDS))
+    InboxEntry.objects.bulk_create(
+        [
+            InboxEntry(conversation=conversation, user_id=user_id, last_activity_at=last_activity_at, snippet=snippet)
+            for user_id in user_ids
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def remove_memberships(conversation_ids, user_ids):
+    InboxEntry.objects.filter(conversation_id__in=conversation_ids, user_id__in=user_ids).delete()
+
+
+def fan_out(conversation_id, last_activity_at, snippet, user_ids=None):
+    """
+    Move the rows of `conversation_id` (only `user_ids`' if given) forward
+    to `last_activity_at`; returns the number of rows updated.
+    """
+    rows = InboxEntry.objects.filter(conversation_id=conversation_id, last_activity_at__lt=last_activity_at)
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    return rows.update(last_activity_at=last_activity_at, snippet=snippet)
+
+
+def fan_out_batched(conversation_id, last_activity_at, snippet, batch_size=None):
+    """`fan_out` to every member, FAN_OUT_BATCH_SIZE members per transaction."""
+    batch_size = batch_size or get_settings()["FAN_OUT_BATCH_SIZE"]
+    user_ids = sorted(get_membership_cache().members(conversation_id))
+    updated = 0
+    for start in range(0, len(user_ids), batch_size):
+        with transaction.atomic():
+            updated += fan_out(conversation_id, last_activity_at, snippet, user_ids[start:start + batch_size])
+    return updated
+
+
+def messages_created(messages):
+    """Account for newly inserted messages (also after bulk_create)."""
+    from .tasks import INBOX_FAN_OUT
+
+    latest = {}
+    for message in messages:
+        current = latest.get(message.conversation_id)
+        if current is None or (message.sent_at, message.message_id) > (current.sent_at, current.message_id):
+            latest[message.conversation_id] = message
+
+    batch_size = get_settings()["FAN_OUT_BATCH_SIZE"]
+    members = get_membership_cache().members_many(latest)
+    for conversation_id, message in latest.items():
+        snippet = make_preview(message.message_body)
+        if len(members[conversation_id]) <= batch_size:
+            fan_out(conversation_id, message.sent_at, snippet)
+            continue
+        # Large group: the sender sees it now, everyone else shortly
+        fan_out(conversation_id, message.sent_at, snippet, [message.sender_id])
+        jobs.enqueue(INBOX_FAN_OUT, {
+            "conversation_id": str(conversation_id),
+            "last_activity_at": message.sent_at.isoformat(),
+            "snippet": snippet,
+        })
+
+
+def refresh(conversation_id, last_message_id=None):
+    """
+    Reset a conversation's rows from its summary after its last message
+    was edited or deleted (activity may move back). With `last_message_id`,
+    only if that is still the conversation's last message.
+    """
+    conversations = Conversation.objects.filter(pk=conversation_id)
+    if last_message_id is not None:
+        conversations = conversations.filter(last_message_id=last_message_id)
+    summary = conversations.values_list(*SUMMARY_FIELDS).first()
+    if summary is None:
+        return 0  # deleted (cascade), or not its last message
+    last_activity_at, snippet = _activity(*summary)
+    rows = InboxEntry.objects.filter(conversation_id=conversation_id)
+    return rows.exclude(last_activity_at=last_activity_at, snippet=snippet).update(
+        last_activity_at=last_activity_at, snippet=snippet
+    )
+
+
+def rebuild_inbox(batch_size=1000):
+    """Recreate every row from the membership table; returns rows written."""
+    written = 0
+    with transaction.atomic():
+        InboxEntry.objects.all().delete()
+        memberships = ConversationParticipant.objects.order_by().values_list("conversation_id", "user_id")
+        batch = []
+        for pair in memberships.iterator(chunk_size=batch_size):
+            batch.append(pair)
+            if len(batch) >= batch_size:
+                written += add_memberships(batch)
+                batch = []
+        written += add_memberships(batch)
+    return written
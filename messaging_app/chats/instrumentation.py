@@ -0,0 +1,308 @@
+# messaging_app/chats/instrumentation.py
+
+"""
+Per-request SQL instrumentation.
+
+`SQLInstrumentationMiddleware` installs a database execute wrapper on a
+sample of requests and records the number of queries, the total DB time,
+the slowest statement, the queries per database alias (primary vs read
+replicas, see chats.db.replicas) and repeated statement fingerprints (the
+same SQL shape run again and again in one request is the signature of an
+N+1).
+Results go into response headers and into a per-view in-memory registry
+exposed by `SQLMetricsView`. Counts and timings are sent to any client; the
+slowest statement's SQL text shows the schema, so it is only sent with
+DEBUG or to staff users.
+
+Unsampled requests pay only for one random() call; sampled ones for a
+perf_counter() pair and a dict increment per query. Fingerprinting only
+runs once per distinct statement at the end of the request. Under ASGI the
+middleware stays async; on sampled requests the wrapper is installed in the
+request's sync_to_async thread, where its ORM queries run.
+
+    CHATS_SQL_INSTRUMENTATION = {
+        "ENABLED": True,
+        "SAMPLE_RATE": 0.05,       # fraction of requests instrumented
+        "HEADERS": True,           # add X-DB-* / Server-Timing headers
+        "REPEAT_THRESHOLD": 3,     # same fingerprint this often: N+1 candidate
+    }
+"""
+
+import random
+import re
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 1.0,
+    "HEADERS": True,
+    "REPEAT_THRESHOLD": 3,
+}
+
+# Histogram bucket upper bounds; the last bucket is "+Inf"
+DB_TIME_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+# Distinct fingerprints kept per view
+MAX_FINGERPRINTS = 50
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?|NULL)\s*,?)+\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def get_settings():
+    return {**DEFAULTS, **getattr(settings, "CHATS_SQL_INSTRUMENTATION", {})}
+
+
+def normalize_sql(sql):
+    """Collapse literals and IN lists so that equivalent statements compare equal."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql.replace("%s", "?"))
+    return _SPACE.sub(" ", sql).strip()
+
+
+def _digest(normalized):
+    return format(zlib.crc32(normalized.encode()), "08x")
+
+
+def fingerprint(sql):
+    """Short stable id of a statement's shape."""
+    return _digest(normalize_sql(sql))
+
+
+class QueryRecorder:
+    """Execute wrapper accumulating statistics for one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_sql = ""
+        self.slowest_duration = 0.0
+        self.statements = Counter()
+        self.aliases = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            self.statements[sql] += 1
+            self.aliases[context["connection"].alias] += 1
+            if elapsed > self.slowest_duration:
+                self.slowest_duration = elapsed
+                self.slowest_sql = sql
+
+    def repeated(self, threshold):
+        """{fingerprint: (count, normalized sql)} for shapes run >= threshold times."""
+        shapes = {}
+        for sql, count in self.statements.items():
+            normalized = normalize_sql(sql)
+            key = _digest(normalized)
+            previous, _ = shapes.get(key, (0, normalized))
+            shapes[key] = (previous + count, normalized)
+        return {key: value for key, value in shapes.items() if value[0] >= threshold}
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def as_dict(self):
+        labels = [str(bound) for bound in self.bounds] + ["+Inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.count,
+            "sum": round(self.total, 3),
+        }
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.n_plus_one_requests = 0
+        self.max_queries = 0
+        self.db_time_ms = Histogram(DB_TIME_BUCKETS_MS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.repeated = Counter()
+        self.samples = {}
+        self.queries_by_alias = Counter()
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "n_plus_one_requests": self.n_plus_one_requests,
+            "max_queries": self.max_queries,
+            "db_time_ms": self.db_time_ms.as_dict(),
+            "queries": self.queries.as_dict(),
+            "queries_by_alias": dict(sorted(self.queries_by_alias.items())),
+            "repeated_queries": [
+                {"fingerprint": key, "occurrences": count, "sql": self.samples[key]}
+                for key, count in self.repeated.most_common(10)
+            ],
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe per-view aggregation of sampled requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, recorder, repeated):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = ViewStats()
+            stats.requests += 1
+            stats.max_queries = max(stats.max_queries, recorder.count)
+            stats.db_time_ms.observe(recorder.duration * 1000)
+            stats.queries.observe(recorder.count)
+            stats.queries_by_alias.update(recorder.aliases)
+            if repeated:
+                stats.n_plus_one_requests += 1
+            for key, (count, sql) in repeated.items():
+                if key in stats.repeated or len(stats.repeated) < MAX_FINGERPRINTS:
+                    stats.repeated[key] += count
+                    stats.samples[key] = sql
+
+    def snapshot(self):
+        with self._lock:
+            return {view: stats.as_dict() for view, stats in sorted(self._views.items())}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+def pool_stats():
+    """Counters of the connection pools in use (chats.db.backends.mysql_pool), per alias."""
+    stats = {}
+    for alias in connections:
+        get_pool = getattr(connections[alias], "get_pool", None)
+        pool = get_pool() if get_pool is not None else None
+        if pool is not None:
+            stats[alias] = pool.stats()
+    return stats
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "<unresolved>"
+    return match.view_name or match.route or match._func_path
+
+
+def _header_value(text, limit=200):
+    """Single-line, latin-1 safe header text."""
+    return _SPACE.sub(" ", text).encode("latin-1", "replace").decode("latin-1")[:limit]
+
+
+def may_see_sql(request):
+    """SQL text (table and column names) goes to DEBUG setups and staff only."""
+    if settings.DEBUG:
+        return True
+    user = getattr(request, "user", None)
+    return user is not None and user.is_staff
+
+
+class SQLInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_settings()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        config = self.config
+        return config["ENABLED"] and random.random() < config["SAMPLE_RATE"]
+
+    @staticmethod
+    def install(recorder):
+        """Wrap every connection of the calling thread; close() to remove."""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        return stack
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        with self.install(recorder):
+            response = self.get_response(request)
+        return self.record(request, response, recorder, may_see_sql(request))
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        # Connections are per thread: ORM calls of this request run in its
+        # thread-sensitive sync_to_async thread, so wrap them there
+        stack = await sync_to_async(self.install)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        # request.user may be a lazy session lookup: not on the event loop
+        return self.record(request, response, recorder, await sync_to_async(may_see_sql)(request))
+
+    def record(self, request, response, recorder, show_sql):
+        config = self.config
+        repeated = recorder.repeated(config["REPEAT_THRESHOLD"])
+        registry.record(view_name(request), recorder, repeated)
+        if config["HEADERS"]:
+            db_ms = recorder.duration * 1000
+            response["X-DB-Query-Count"] = str(recorder.count)
+            response["X-DB-Time-Ms"] = f"{db_ms:.2f}"
+            if recorder.aliases:
+                response["X-DB-Aliases"] = ", ".join(
+                    f"{alias}={count}" for alias, count in sorted(recorder.aliases.items())
+                )
+            if recorder.count:
+                response["X-DB-Slowest-Ms"] = f"{recorder.slowest_duration * 1000:.2f}"
+                if show_sql:
+                    response["X-DB-Slowest-Query"] = _header_value(normalize_sql(recorder.slowest_sql))
+            if repeated:
+                response["X-DB-Repeated-Queries"] = ", ".join(
+                    f"{key}={count}"
+                    for key, (count, _) in sorted(repeated.items(), key=lambda item: -item[1][0])
+                )
+            timing = f"db;dur={db_ms:.2f}"
+            response["Server-Timing"] = (
+                f"{response['Server-Timing']}, {timing}" if response.has_header("Server-Timing") else timing
+            )
+        return response
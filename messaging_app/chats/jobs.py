@@ -0,0 +1,218 @@
+# messaging_app/chats/jobs.py
+
+"""
+Local durable job queue, backed by the `Job` table (no external broker).
+
+Write paths call `enqueue()` inside their transaction, so a job exists if
+and only if the write committed. `manage.py run_job_worker` processes them:
+
+- pickup is batched: a worker claims up to BATCH_SIZE due jobs at once
+  (SELECT ... FOR UPDATE SKIP LOCKED where supported, then a conditional
+  UPDATE, so concurrent workers never run the same job);
+- jobs of the same task in a batch are handed to the task together, so e.g.
+  one search-index statement covers the whole batch;
+- a task's DB effects and the deletion of its jobs commit together;
+- failures are retried with exponential backoff, and after `max_attempts`
+  the job is parked with status DEAD (the dead-letter set) until requeued;
+- a RUNNING job whose worker died is picked up again once its LEASE ends.
+
+Tasks are registered with `@task(name)` and always receive a list of
+payloads. With EAGER set, enqueue() runs the task immediately instead (or on
+commit, for tasks registered with on_commit=True), which is handy for tests
+and development without a worker. A task whose `in_process()` check returns
+True is run that way too, whatever EAGER says: e.g. a WebSocket publish
+while the broker is the in-process one, which only this process can reach.
+
+    CHATS_JOBS = {
+        "EAGER": False,
+        "BATCH_SIZE": 100,
+        "MAX_ATTEMPTS": 5,
+        "RETRY_BACKOFF": 2.0,   # seconds; doubled on every attempt
+        "LEASE": 300,           # seconds a claimed job may run
+        "POLL_INTERVAL": 1.0,   # idle worker sleep, seconds
+    }
+"""
+
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "EAGER": False,
+    "BATCH_SIZE": 100,
+    "MAX_ATTEMPTS": 5,
+    "RETRY_BACKOFF": 2.0,
+    "LEASE": 300,
+    "POLL_INTERVAL": 1.0,
+}
+
+
+def get_settings():
+    return {**DEFAULTS, **getattr(settings, "CHATS_JOBS", {})}
+
+
+class Task:
+    __slots__ = ("name", "func", "on_commit", "in_process")
+
+    def __init__(self, name, func, on_commit=False, in_process=None):
+        self.name = name
+        self.func = func
+        self.on_commit = on_commit
+        self.in_process = in_process
+
+
+_registry = {}
+
+
+def task(name, on_commit=False, in_process=None):
+    """
+    Register `func(payloads)` as task `name`. `on_commit` marks tasks with
+    effects outside the database (only relevant when run in-process).
+    `in_process`, a callable, returns True while the task must run in the
+    enqueuing process rather than in a worker.
+    """
+    def decorator(func):
+        _registry[name] = Task(name, func, on_commit, in_process)
+        return func
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"Unknown job task {name!r}") from None
+
+
+def enqueue(name, payload, delay=0):
+    """Queue `payload` for task `name`; returns the Job (None in EAGER mode)."""
+    handler = get_task(name)
+    config = get_settings()
+    if config["EAGER"] or (handler.in_process is not None and handler.in_process()):
+        if handler.on_commit:
+            transaction.on_commit(lambda: handler.func([payload]))
+        else:
+            handler.func([payload])
+        return None
+    return Job.objects.create(
+        task=name,
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=config["MAX_ATTEMPTS"],
+    )
+
+
+def _due(now, lease):
+    return Job.objects.filter(
+        Q(status=Job.Status.PENDING, run_at__lte=now)
+        | Q(status=Job.Status.RUNNING, locked_at__lt=now - timedelta(seconds=lease))
+    )
+
+
+def claim(worker_id, batch_size, lease=None):
+    """Lock up to `batch_size` due jobs for `worker_id`, oldest first."""
+    lease = get_settings()["LEASE"] if lease is None else lease
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = _due(now, lease).order_by("run_at", "id")
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return []
+        # Re-checks due-ness: without SKIP LOCKED another worker may have won a row
+        _due(now, lease).filter(id__in=ids).update(
+            status=Job.Status.RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        )
+    return list(Job.objects.filter(id__in=ids, locked_by=worker_id, locked_at=now).order_by("id"))
+
+
+def _execute(handler, jobs):
+    with transaction.atomic():
+        handler.func([job.payload for job in jobs])
+        Job.objects.filter(id__in=[job.id for job in jobs]).delete()
+
+
+def _fail(job, error):
+    config = get_settings()
+    if job.attempts >= job.max_attempts:
+        status, run_at = Job.Status.DEAD, job.run_at
+        logger.error("Job %s (%s) moved to dead letters: %s", job.pk, job.task, error.splitlines()[-1])
+    else:
+        status = Job.Status.PENDING
+        run_at = timezone.now() + timedelta(seconds=config["RETRY_BACKOFF"] * 2 ** (job.attempts - 1))
+    Job.objects.filter(pk=job.pk).update(
+        status=status, run_at=run_at, locked_by="", locked_at=None, last_error=error
+    )
+
+
+def run_jobs(jobs):
+    """Run claimed jobs grouped by task; returns (succeeded, failed) counts."""
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.task, []).append(job)
+
+    succeeded = failed = 0
+    for name, group in groups.items():
+        try:
+            handler = get_task(name)
+            _execute(handler, group)
+            succeeded += len(group)
+            continue
+        except Exception:
+            error = traceback.format_exc()
+        if name not in _registry or len(group) == 1:
+            for job in group:
+                _fail(job, error)
+            failed += len(group)
+            continue
+        # Retry the batch job by job so one bad payload does not fail the rest
+        for job in group:
+            try:
+                _execute(handler, [job])
+                succeeded += 1
+            except Exception:
+                _fail(job, traceback.format_exc())
+                failed += 1
+    return succeeded, failed
+
+
+def run_pending(worker_id="inline", batch_size=None, max_batches=None):
+    """Claim and run batches until nothing is due; returns (succeeded, failed)."""
+    batch_size = batch_size or get_settings()["BATCH_SIZE"]
+    succeeded = failed = batches = 0
+    while max_batches is None or batches < max_batches:
+        jobs = claim(worker_id, batch_size)
+        if not jobs:
+            break
+        ok, bad = run_jobs(jobs)
+        succeeded, failed, batches = succeeded + ok, failed + bad, batches + 1
+    return succeeded, failed
+
+
+def requeue_dead(task_name=None):
+    """Give dead-lettered jobs a fresh set of attempts; returns the count."""
+    dead = Job.objects.filter(status=Job.Status.DEAD)
+    if task_name:
+        dead = dead.filter(task=task_name)
+    return dead.update(status=Job.Status.PENDING, attempts=0, run_at=timezone.now(), last_error="")
+
+
+def queue_stats():
+    """Job counts per status."""
+    counts = dict.fromkeys(Job.Status.values, 0)
+    for row in Job.objects.order_by().values("status").annotate(count=Count("id")):
+        counts[row["status"]] = row["count"]
+    return counts
@@ -0,0 +1,136 @@
+# messaging_app/chats/loadgen.py
+
+"""
+Synthetic data for load tests and benchmarks.
+
+`seed_dataset()` bulk-inserts users, conversations and messages with a
+skewed (Zipf-like) shape, as real chat data has: a few users sit in many
+conversations, most conversations are 1:1, a few are large groups, and a
+few conversations receive most of the traffic. Since bulk_create sends no
+signals, the side effects of the message/membership signals (summaries,
+unread counters, message and participant search indexes) are applied
+here explicitly.
+"""
+
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import inbox, participant_search, summaries
+from .benchmarks import backdated_bulk_create
+from .ids import uuid7
+from .models import Conversation, ConversationParticipant, Message, User
+from .search import get_search_backend
+
+SEED_PASSWORD = "loadgen-pass"
+
+WORDS = (
+    "hello meeting tomorrow invoice lunch project deadline photo travel "
+    "coffee review deploy weekend call update thanks budget launch ticket"
+).split()
+
+
+def zipf_weights(count, skew):
+    """Cumulative weights for rank-based Zipf sampling (skew 0: uniform)."""
+    return list(itertools.accumulate(1.0 / (rank + 1) ** skew for rank in range(count)))
+
+
+def conversation_size(rng, max_participants, skew):
+    """Mostly 2, with a heavy tail of group sizes up to `max_participants`."""
+    if skew <= 0:
+        return rng.randint(2, max_participants)
+    return min(max_participants, 1 + int(rng.paretovariate(skew + 1)))
+
+
+def seed_dataset(
+    users=1000,
+    conversations=2000,
+    messages=50000,
+    max_participants=50,
+    skew=1.1,
+    days=90,
+    prefix="load",
+    batch_size=5000,
+    seed=0,
+):
+    """
+    Insert a synthetic dataset and return the created users and conversations
+    (user order follows popularity: users[0] is in the most conversations).
+    """
+    rng = random.Random(seed)
+    password = make_password(SEED_PASSWORD)
+    user_objs = User.objects.bulk_create(
+        [
+            User(
+                username=f"{prefix}{i}",
+                email=f"{prefix}{i}@example.com",
+                first_name=rng.choice(("Ada", "Grace", "Linus", "Barbara", "Ken", "Margaret")),
+                last_name=f"{prefix.title()}{i}",
+                password=password,
+            )
+            for i in range(users)
+        ],
+        batch_size=batch_size,
+    )
+    user_weights = zipf_weights(users, skew)
+    max_participants = max(2, min(max_participants, users))
+
+    conversation_objs = Conversation.objects.bulk_create(
+        [Conversation() for _ in range(conversations)], batch_size=batch_size
+    )
+    now = timezone.now()
+    # Joined before the earliest backdated message, so the counters kept by
+    # messages_created() agree with summaries.unread_count_for()
+    joined_at = now - timedelta(days=days)
+    members = {}
+    rows = []
+    for conversation in conversation_objs:
+        size = conversation_size(rng, max_participants, skew)
+        chosen = {}
+        while len(chosen) < size:
+            user = rng.choices(user_objs, cum_weights=user_weights)[0]
+            chosen[user.pk] = user
+        members[conversation.pk] = list(chosen.values())
+        rows.extend(
+            ConversationParticipant(conversation=conversation, user=u, joined_at=joined_at) for u in chosen.values()
+        )
+    ConversationParticipant.objects.bulk_create(rows, batch_size=batch_size)
+    for start in range(0, len(conversation_objs), batch_size):
+        ConversationParticipant.objects.filter(
+            conversation__in=conversation_objs[start:start + batch_size]
+        ).update(joined_at=joined_at)
+    participant_search.index_memberships(
+        (conversation_id, user) for conversation_id, participants in members.items() for user in participants
+    )
+    summaries.bump_versions([c.pk for c in conversation_objs])
+
+    conversation_weights = zipf_weights(conversations, skew)
+    backend = get_search_backend()
+    for start in range(0, messages, batch_size):
+        batch = []
+        for _ in range(start, min(messages, start + batch_size)):
+            conversation = rng.choices(conversation_objs, cum_weights=conversation_weights)[0]
+            sender = rng.choice(members[conversation.pk])
+            sent_at = now - timedelta(seconds=rng.uniform(0, days * 86400))
+            batch.append(Message(
+                # Keyed by its own (backdated) time, as if sent then
+                message_id=uuid7(int(sent_at.timestamp() * 1000)),
+                conversation=conversation,
+                sender=sender,
+                message_body=" ".join(rng.choices(WORDS, k=rng.randint(3, 20))),
+                sent_at=sent_at,
+            ))
+        with transaction.atomic():
+            backdated_bulk_create(Message, batch)
+            summaries.messages_created(batch)
+            backend.index_many(batch)
+    # Messages are backdated before their conversations' creation, which the
+    # forward-only fan-out would ignore: build the rows from the summaries
+    inbox.add_memberships(
+        (conversation_id, user.pk) for conversation_id, participants in members.items() for user in participants
+    )
+    return user_objs, conversation_objs
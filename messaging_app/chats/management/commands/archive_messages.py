@@ -0,0 +1,31 @@
+# messaging_app/chats/management/commands/archive_messages.py
+
+from django.core.management.base import BaseCommand
+
+from chats.archive import archive_cutoff, archive_messages
+
+
+class Command(BaseCommand):
+    help = "Move messages older than the hot window into the ArchivedMessage table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days", type=int, default=None,
+            help="Defaults to settings.CHATS_ARCHIVE_AFTER_DAYS.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--pause", type=float, default=0.05,
+            help="Seconds to sleep between batches to limit lock contention.",
+        )
+        parser.add_argument("--max-batches", type=int, default=None)
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options["older_than_days"])
+        moved = archive_messages(
+            cutoff,
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            max_batches=options["max_batches"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} messages sent before {cutoff:%Y-%m-%d %H:%M}."))
@@ -0,0 +1,173 @@
+# messaging_app/chats/management/commands/bench_api.py
+
+import json
+import random
+import threading
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from chats.benchmarks import Timer, benchmark_database, summarize_latencies
+from chats.loadgen import WORDS, seed_dataset, zipf_weights
+from chats.models import ConversationParticipant, Message
+
+SCENARIOS = (
+    "conversation_list",
+    "conversation_retrieve",
+    "message_list",
+    "message_retrieve",
+    "message_create",
+    "message_search",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway database and drive the conversation/message endpoints "
+        "in-process with concurrent workers; prints latency percentiles, "
+        "queries per request and throughput per scenario as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--conversations", type=int, default=1000)
+        parser.add_argument("--messages", type=int, default=20000)
+        parser.add_argument("--skew", type=float, default=1.1)
+        parser.add_argument("--requests", type=int, default=500, help="Requests per scenario.")
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        scenarios = [name for name in options["scenarios"].split(",") if name]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        with benchmark_database():
+            result = self.run(scenarios, options)
+        report = json.dumps(result, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(report + "\n")
+        self.stdout.write(report)
+
+    def run(self, scenarios, options):
+        with Timer() as seeding:
+            users, _ = seed_dataset(
+                users=options["users"],
+                conversations=options["conversations"],
+                messages=options["messages"],
+                skew=options["skew"],
+                seed=options["seed"],
+                prefix="bench",
+            )
+        memberships = {}
+        for user_id, conversation_id in ConversationParticipant.objects.values_list(
+            "user_id", "conversation_id"
+        ):
+            memberships.setdefault(user_id, []).append(conversation_id)
+        # Callers are drawn with the same popularity skew as the data
+        callers = [u for u in users if u.pk in memberships]
+        self.callers = callers
+        self.caller_weights = zipf_weights(len(callers), options["skew"])
+        self.memberships = memberships
+        self.messages_by_conversation = {}
+        for message_id, conversation_id in Message.objects.values_list("message_id", "conversation_id"):
+            self.messages_by_conversation.setdefault(conversation_id, []).append(message_id)
+
+        result = {
+            "dataset": {
+                "users": options["users"],
+                "conversations": options["conversations"],
+                "messages": options["messages"],
+                "skew": options["skew"],
+                "seed_seconds": round(seeding.elapsed, 2),
+            },
+            "concurrency": options["concurrency"],
+            "scenarios": {},
+        }
+        for name in scenarios:
+            result["scenarios"][name] = self.run_scenario(
+                name, options["requests"], options["concurrency"], options["seed"]
+            )
+        return result
+
+    def request_for(self, name, rng):
+        """Build (user, method, path, payload) for one request of `name`."""
+        while True:
+            user = rng.choices(self.callers, cum_weights=self.caller_weights)[0]
+            conversation_id = rng.choice(self.memberships[user.pk])
+            if name != "message_retrieve" or conversation_id in self.messages_by_conversation:
+                break
+        if name == "conversation_list":
+            return user, "get", "/api/conversations/", None
+        if name == "conversation_retrieve":
+            return user, "get", f"/api/conversations/{conversation_id}/", None
+        if name == "message_list":
+            return user, "get", "/api/messages/", None
+        if name == "message_retrieve":
+            message_id = rng.choice(self.messages_by_conversation[conversation_id])
+            return user, "get", f"/api/messages/{message_id}/", None
+        if name == "message_create":
+            payload = {
+                "conversation_id": str(conversation_id),
+                "message_body": " ".join(rng.choices(WORDS, k=8)),
+            }
+            return user, "post", "/api/messages/", payload
+        return user, "get", f"/api/messages/?search={rng.choice(WORDS)}", None
+
+    def run_scenario(self, name, total, workers, seed):
+        per_worker = [total // workers + (1 if i < total % workers else 0) for i in range(workers)]
+        latencies, query_counts, statuses, errors = [], [], Counter(), []
+        lock = threading.Lock()
+        # SQLite (shared-cache test DB) fails concurrent writers immediately
+        # rather than waiting; serialize writes there so errors mean bugs.
+        write_lock = threading.Lock() if connections["default"].vendor == "sqlite" else None
+
+        def worker(index):
+            rng = random.Random(f"{seed}:{name}:{index}")
+            client = APIClient()
+            connection = connections["default"]
+            try:
+                for _ in range(per_worker[index]):
+                    user, method, path, payload = self.request_for(name, rng)
+                    client.force_authenticate(user)
+                    if write_lock is not None and method != "get":
+                        write_lock.acquire()
+                    try:
+                        with CaptureQueriesContext(connection) as queries, Timer() as timer:
+                            response = getattr(client, method)(path, payload, format="json")
+                    except Exception as exc:  # counted, not fatal for the run
+                        with lock:
+                            errors.append(repr(exc))
+                        continue
+                    finally:
+                        if write_lock is not None and method != "get":
+                            write_lock.release()
+                    with lock:
+                        latencies.append(timer.elapsed)
+                        query_counts.append(len(queries))
+                        statuses[response.status_code] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+        with Timer() as wall:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return {
+            "requests": len(latencies),
+            "serialized_writes": write_lock is not None,
+            "errors": len(errors),
+            "error_samples": errors[:3],
+            "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+            "throughput_rps": round(len(latencies) / wall.elapsed, 1) if wall.elapsed else 0.0,
+            "latency": summarize_latencies(latencies),
+            "queries_per_request": round(sum(query_counts) / len(query_counts), 2) if query_counts else 0.0,
+        }
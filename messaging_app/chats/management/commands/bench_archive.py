@@ -0,0 +1,94 @@
+# messaging_app/chats/management/commands/bench_archive.py
+
+import json
+import random
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chats.archive import archive_cutoff, archive_messages
+from chats.benchmarks import Timer, backdated_bulk_create, benchmark_database, time_repeated
+from chats.models import Conversation, ConversationParticipant, Message, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure hot-table message query latency before and after archiving "
+        "messages older than the hot window, on a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=100000)
+        parser.add_argument("--conversations", type=int, default=200)
+        parser.add_argument("--history-days", type=int, default=730)
+        parser.add_argument("--hot-days", type=int, default=30)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            result = self.run(options)
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def seed(self, total, conversation_count, history_days):
+        users = User.objects.bulk_create([
+            User(username=f"arch{i}", email=f"arch{i}@example.com", first_name="A", last_name=str(i))
+            for i in range(20)
+        ])
+        conversations = Conversation.objects.bulk_create([Conversation() for _ in range(conversation_count)])
+        ConversationParticipant.objects.bulk_create([
+            ConversationParticipant(conversation=c, user=u)
+            for i, c in enumerate(conversations)
+            for u in (users[i % 20], users[(i + 1) % 20])
+        ])
+        now = timezone.now()
+        rng = random.Random(42)
+        for start in range(0, total, 5000):
+            backdated_bulk_create(Message, [
+                Message(
+                    message_id=uuid.uuid4(),
+                    conversation=conversations[rng.randrange(conversation_count)],
+                    sender=users[0],
+                    message_body=f"message {n}",
+                    sent_at=now - timedelta(seconds=rng.uniform(0, history_days * 86400)),
+                )
+                for n in range(start, min(total, start + 5000))
+            ])
+        return users[0], conversations[0]
+
+    def measure(self, user, conversation, repeat):
+        conversation_ids = list(
+            ConversationParticipant.objects.filter(user=user).values_list("conversation_id", flat=True)
+        )
+        scoped = Message.objects.filter(conversation_id__in=conversation_ids)
+        return {
+            "hot_rows": Message.objects.count(),
+            "newest_page_for_user": time_repeated(
+                lambda: list(scoped.order_by("-sent_at", "-message_id")[:21]), repeat
+            ),
+            "count_for_user": time_repeated(lambda: scoped.count(), repeat),
+            "newest_page_for_conversation": time_repeated(
+                lambda: list(
+                    Message.objects.filter(conversation=conversation).order_by("-sent_at")[:20]
+                ),
+                repeat,
+            ),
+        }
+
+    def run(self, options):
+        with Timer() as seeding:
+            user, conversation = self.seed(
+                options["messages"], options["conversations"], options["history_days"]
+            )
+        before = self.measure(user, conversation, options["repeat"])
+        with Timer() as archiving:
+            moved = archive_messages(archive_cutoff(options["hot_days"]), batch_size=1000)
+        after = self.measure(user, conversation, options["repeat"])
+        return {
+            "seed_seconds": round(seeding.elapsed, 2),
+            "archived_rows": moved,
+            "archive_seconds": round(archiving.elapsed, 2),
+            "before": before,
+            "after": after,
+        }
@@ -0,0 +1,154 @@
+# messaging_app/chats/management/commands/bench_asgi.py
+
+import asyncio
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chats.benchmarks import Timer, benchmark_database, summarize_latencies
+from chats.loadgen import seed_dataset
+
+ENDPOINTS = {
+    "message_list": ("/api/messages/", "/api/async/messages/", b"cursor="),
+    "conversation_list": ("/api/conversations/", "/api/async/conversations/", b""),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the ASGI application in-process with N concurrent in-flight "
+        "requests and compare the sync DRF viewsets with the async views "
+        "(chats.async_views): latency percentiles, throughput and peak threads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", default="1,10,50,200")
+        parser.add_argument("--requests", type=int, default=400, help="Requests per run.")
+        parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+        parser.add_argument(
+            "--db-latency-ms", type=float, default=0.0,
+            help="Sleep this long in every query, to simulate a remote database.",
+        )
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--conversations", type=int, default=400)
+        parser.add_argument("--messages", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            result = self.run(options)
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def run(self, options):
+        users, _ = seed_dataset(
+            users=options["users"],
+            conversations=options["conversations"],
+            messages=options["messages"],
+            prefix="asgi",
+        )
+        tokens = [str(AccessToken.for_user(user)).encode() for user in users[:50]]
+        latency = options["db_latency_ms"] / 1000
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow_query)
+
+        if latency:
+            connection.execute_wrappers.append(slow_query)
+            connection_created.connect(add_latency, dispatch_uid="bench_asgi.latency")
+
+        from messaging_app.asgi import application
+
+        result = {"db_latency_ms": options["db_latency_ms"], "runs": []}
+        try:
+            for endpoint in options["endpoints"].split(","):
+                sync_path, async_path, query = ENDPOINTS[endpoint]
+                for concurrency in [int(n) for n in options["concurrency"].split(",")]:
+                    for mode, path in (("sync", sync_path), ("async", async_path)):
+                        stats = asyncio.run(
+                            self.drive(application, path, query, tokens, options["requests"], concurrency)
+                        )
+                        result["runs"].append({"endpoint": endpoint, "mode": mode, "concurrency": concurrency, **stats})
+        finally:
+            connection_created.disconnect(dispatch_uid="bench_asgi.latency")
+            if slow_query in connection.execute_wrappers:
+                connection.execute_wrappers.remove(slow_query)
+        return result
+
+    async def drive(self, application, path, query, tokens, total, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, statuses = [], {}
+        peak_threads = threading.active_count()
+        done = asyncio.Event()
+
+        async def sample_threads():
+            nonlocal peak_threads
+            while not done.is_set():
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.005)
+
+        async def one(index):
+            async with semaphore:
+                started = time.perf_counter()
+                status = await self.request(application, path, query, tokens[index % len(tokens)])
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        sampler = asyncio.create_task(sample_threads())
+        with Timer() as wall:
+            await asyncio.gather(*(one(i) for i in range(total)))
+        done.set()
+        await sampler
+        return {
+            "requests": total,
+            "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+            "throughput_rps": round(total / wall.elapsed, 1),
+            "latency": summarize_latencies(latencies),
+            "peak_threads": peak_threads,
+        }
+
+    @staticmethod
+    async def request(application, path, query, token):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query,
+            "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"authorization", b"Bearer " + token)],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        received = False
+        disconnected = asyncio.Event()
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        status = None
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body"):
+                disconnected.set()
+
+        await application(scope, receive, send)
+        return status
@@ -0,0 +1,79 @@
+# messaging_app/chats/management/commands/bench_db_pool.py
+
+import json
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from chats.benchmarks import Timer, summarize_latencies
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/second with and without the MySQL connection pool. "
+        "Each simulated request opens Django's connection, runs a query and "
+        "closes it again, as a CONN_MAX_AGE=0 request cycle does."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--query", default="SELECT 1")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "mysql" or "POOL" not in connection.settings_dict:
+            raise CommandError(
+                "bench_db_pool needs the chats.db.backends.mysql_pool engine (set DB_ENGINE=mysql)."
+            )
+        pool_settings = connection.settings_dict["POOL"]
+        original = pool_settings.get("ENABLED", True)
+        result = {}
+        try:
+            for label, enabled in (("unpooled", False), ("pooled", True)):
+                pool_settings["ENABLED"] = enabled
+                result[label] = self.run(options)
+                if enabled:
+                    result[label]["pool"] = connection.get_pool().stats()
+        finally:
+            pool_settings["ENABLED"] = original
+        result["speedup"] = round(
+            result["pooled"]["requests_per_second"] / result["unpooled"]["requests_per_second"], 2
+        )
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def run(self, options):
+        total, workers, query = options["requests"], options["concurrency"], options["query"]
+        per_worker = [total // workers + (1 if i < total % workers else 0) for i in range(workers)]
+        latencies = [[] for _ in range(workers)]
+        errors = []
+
+        def worker(index):
+            conn = connections["default"]
+            try:
+                for _ in range(per_worker[index]):
+                    with Timer() as timer:
+                        with conn.cursor() as cursor:
+                            cursor.execute(query)
+                            cursor.fetchall()
+                        conn.close()
+                    latencies[index].append(timer.elapsed)
+            except Exception as exc:  # reported, not fatal for the other workers
+                errors.append(repr(exc))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+        with Timer() as wall:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        done = [value for values in latencies for value in values]
+        return {
+            "requests": len(done),
+            "concurrency": workers,
+            "errors": errors[:5],
+            "requests_per_second": round(len(done) / wall.elapsed, 1) if wall.elapsed else 0.0,
+            "latency": summarize_latencies(done),
+        }
@@ -0,0 +1,64 @@
+# messaging_app/chats/management/commands/bench_export.py
+
+import json
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from rest_framework.test import APIClient
+
+from chats.benchmarks import Timer, benchmark_database
+from chats.loadgen import seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream GET /api/messages/export/ (chats.export) for growing mailbox "
+        "sizes and report rows/sec and peak Python memory, against paging "
+        "through GET /api/messages/ 20 rows at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="2000,10000,30000", help="Messages per run.")
+        parser.add_argument("--page-size", type=int, default=20)
+
+    def handle(self, *args, **options):
+        result = []
+        for size in [int(n) for n in options["sizes"].split(",")]:
+            with benchmark_database():
+                result.append(self.run(size, options["page_size"]))
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def run(self, size, page_size):
+        # Few users and conversations: users[0] sees most of the history
+        users, _ = seed_dataset(users=4, conversations=3, messages=size, max_participants=4, prefix="export")
+        client = APIClient()
+        client.force_authenticate(users[0])
+
+        tracemalloc.start()
+        with Timer() as streamed:
+            response = client.get("/api/messages/export/")
+            rows = sum(chunk.count(b"\n") for chunk in response.streaming_content)
+        _, stream_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        pages, url = 0, f"/api/messages/?page_size={page_size}"
+        with Timer() as paged:
+            while url:
+                url = client.get(url).json()["next"]
+                pages += 1
+        _, paged_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            "messages": rows,
+            "export": {
+                "rows_per_sec": round(rows / streamed.elapsed, 1),
+                "peak_memory_kb": round(stream_peak / 1024),
+            },
+            "paged": {
+                "pages": pages,
+                "rows_per_sec": round(rows / paged.elapsed, 1),
+                "peak_memory_kb": round(paged_peak / 1024),
+            },
+        }
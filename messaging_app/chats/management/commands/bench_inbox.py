@@ -0,0 +1,92 @@
+# messaging_app/chats/management/commands/bench_inbox.py
+
+import json
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max
+from django.db.models.functions import Coalesce
+
+from chats import inbox
+from chats.benchmarks import benchmark_database, time_repeated
+from chats.loadgen import seed_dataset
+from chats.models import Conversation, ConversationParticipant, Message
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of one page of a user's conversations ordered by latest "
+        "activity: MAX(sent_at) over their messages versus the materialized "
+        "inbox (chats.inbox), plus the cost of a message write with its "
+        "fan-out, on a throwaway seeded database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--conversations", type=int, default=3000)
+        parser.add_argument("--messages", type=int, default=200000)
+        parser.add_argument("--max-participants", type=int, default=50)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            seed_dataset(
+                users=options["users"],
+                conversations=options["conversations"],
+                messages=options["messages"],
+                max_participants=options["max_participants"],
+            )
+            result = self.run(options)
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def run(self, options):
+        # The busiest user: the case a per-request aggregate hurts most
+        user_id, conversation_count = (
+            ConversationParticipant.objects.values_list("user_id")
+            .annotate(n=Count("conversation"))
+            .order_by("-n")
+            .first()
+        )
+        page = options["page_size"]
+        conversation_ids = list(
+            ConversationParticipant.objects.filter(user_id=user_id).values_list("conversation_id", flat=True)
+        )
+
+        def aggregate_page():
+            # Same ordering as the inbox: last message, else creation
+            return list(
+                Conversation.objects.filter(pk__in=conversation_ids)
+                .annotate(latest=Coalesce(Max("messages__sent_at"), "created_at"))
+                .order_by("-latest", "-pk")
+                .values_list("pk", flat=True)[:page]
+            )
+
+        def inbox_page():
+            return list(
+                inbox.for_user(Conversation.objects.all(), user_id)
+                .order_by("-last_activity_at", "-inbox_conversation_id")
+                .values_list("pk", flat=True)[:page]
+            )
+
+        # Message writes to the largest conversation, with signals and fan-out
+        largest = (
+            ConversationParticipant.objects.values_list("conversation_id")
+            .annotate(n=Count("user"))
+            .order_by("-n")
+            .first()
+        )
+        sender_id = (
+            ConversationParticipant.objects.filter(conversation_id=largest[0]).values_list("user_id", flat=True).first()
+        )
+
+        def write():
+            Message.objects.create(conversation_id=largest[0], sender_id=sender_id, message_body="bench")
+
+        return {
+            "user_conversations": conversation_count,
+            "page_size": page,
+            "pages_agree": aggregate_page() == inbox_page(),
+            "max_aggregate": time_repeated(aggregate_page, options["repeat"]),
+            "inbox_range_scan": time_repeated(inbox_page, options["repeat"]),
+            "message_write": {"members": largest[1], **time_repeated(write, options["repeat"])},
+        }
@@ -0,0 +1,108 @@
+# messaging_app/chats/management/commands/bench_jobs.py
+
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from chats import jobs
+from chats.benchmarks import Timer, benchmark_database, summarize_latencies
+from chats.loadgen import seed_dataset
+from chats.models import ConversationParticipant, Job
+from chats.tasks import PUBLISH_MESSAGES
+
+
+class QueryCounter:
+    """Execute wrapper counting statements (the debug query log is capped)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure POST /api/messages/ latency with side effects (search "
+        "indexing, realtime publish) run inline versus enqueued on the job "
+        "queue, and the worker's drain throughput per batch size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--batch-sizes", default="1,10,100")
+        parser.add_argument(
+            "--side-effect-ms", type=float, default=0.0,
+            help="Extra time each publish takes, to simulate a remote broker.",
+        )
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--conversations", type=int, default=400)
+        parser.add_argument("--messages", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        handler = jobs.get_task(PUBLISH_MESSAGES)
+        original = handler.func
+        delay = options["side_effect_ms"] / 1000
+
+        def slow_publish(payloads):
+            time.sleep(delay * sum(len(payload["messages"]) for payload in payloads))
+            return original(payloads)
+
+        if delay:
+            handler.func = slow_publish
+        try:
+            with benchmark_database():
+                result = self.run(options)
+        finally:
+            handler.func = original
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def run(self, options):
+        seed_dataset(
+            users=options["users"],
+            conversations=options["conversations"],
+            messages=options["messages"],
+            prefix="jobs",
+        )
+        membership = ConversationParticipant.objects.select_related("user").order_by("pk").first()
+        client = APIClient()
+        client.force_authenticate(membership.user)
+        payload = {"conversation_id": str(membership.conversation_id), "message_body": "benchmark hello"}
+        total = options["requests"]
+        result = {"requests": total, "side_effect_ms": options["side_effect_ms"], "create": {}, "drain": []}
+
+        for mode, eager in (("inline", True), ("enqueued", False)):
+            latencies = []
+            with override_settings(CHATS_JOBS={**jobs.get_settings(), "EAGER": eager}):
+                queries = QueryCounter()
+                with connection.execute_wrapper(queries):
+                    for _ in range(total):
+                        started = time.perf_counter()
+                        client.post("/api/messages/", payload, format="json")
+                        latencies.append(time.perf_counter() - started)
+            result["create"][mode] = {
+                "latency": summarize_latencies(latencies),
+                "queries_per_request": round(queries.count / total, 2),
+            }
+
+        # Drain the same backlog once per batch size
+        backlog = list(Job.objects.values("task", "payload"))
+        for batch_size in [int(n) for n in options["batch_sizes"].split(",")]:
+            Job.objects.all().delete()
+            Job.objects.bulk_create(Job(task=row["task"], payload=row["payload"]) for row in backlog)
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries), Timer() as drain:
+                succeeded, failed = jobs.run_pending("bench", batch_size=batch_size)
+            result["drain"].append({
+                "batch_size": batch_size,
+                "jobs": succeeded + failed,
+                "failed": failed,
+                "jobs_per_sec": round((succeeded + failed) / drain.elapsed, 1),
+                "queries_per_job": round(queries.count / max(1, succeeded + failed), 2),
+            })
+        return result
@@ -0,0 +1,75 @@
+# messaging_app/chats/management/commands/bench_message_ingest.py
+
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from chats.benchmarks import Timer, benchmark_database
+from chats.models import Conversation, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare message ingestion throughput of POST /api/messages/ (one per "
+        "request) against POST /api/messages/bulk/, on a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=2000)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--conversations", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            result = self.run(options["messages"], options["batch_size"], options["conversations"])
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def run(self, total, batch_size, conversation_count):
+        users = [
+            User.objects.create_user(
+                username=f"bench{i}", email=f"bench{i}@example.com", password="x",
+                first_name="Bench", last_name=str(i),
+            )
+            for i in range(2)
+        ]
+        conversations = []
+        for _ in range(conversation_count):
+            conversation = Conversation.objects.create()
+            conversation.participants.set(users)
+            conversations.append(conversation)
+
+        client = APIClient()
+        client.force_authenticate(users[0])
+        payloads = [
+            {
+                "conversation_id": str(conversations[i % conversation_count].conversation_id),
+                "sender_id": str(users[i % 2].pk),
+                "message_body": f"benchmark message {i}",
+            }
+            for i in range(total)
+        ]
+
+        with CaptureQueriesContext(connection) as single_queries, Timer() as single:
+            for payload in payloads:
+                client.post("/api/messages/", payload, format="json")
+
+        with CaptureQueriesContext(connection) as bulk_queries, Timer() as bulk:
+            for start in range(0, total, batch_size):
+                client.post("/api/messages/bulk/", payloads[start:start + batch_size], format="json")
+
+        return {
+            "messages": total,
+            "batch_size": batch_size,
+            "single": {
+                "messages_per_sec": round(total / single.elapsed, 1),
+                "queries_per_message": round(len(single_queries) / total, 2),
+            },
+            "bulk": {
+                "messages_per_sec": round(total / bulk.elapsed, 1),
+                "queries_per_message": round(len(bulk_queries) / total, 3),
+            },
+            "speedup": round(single.elapsed / bulk.elapsed, 1),
+        }
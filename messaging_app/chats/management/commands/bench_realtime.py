@@ -0,0 +1,115 @@
+# messaging_app/chats/management/commands/bench_realtime.py
+
+import asyncio
+import json
+import resource
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from chats.realtime import InProcessBroker, serve_subscription
+
+
+def rss_mb():
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test for chats.realtime: hold N concurrent in-process WebSocket "
+        "subscribers on one worker and measure fan-out latency and memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--subscribers", default="100,1000,5000,10000,20000",
+            help="Comma-separated subscriber counts to try.",
+        )
+        parser.add_argument("--conversations", type=int, default=100)
+        parser.add_argument("--messages", type=int, default=20, help="Publishes per conversation.")
+        parser.add_argument(
+            "--latency-budget-ms", type=float, default=100.0,
+            help="p99 fan-out latency a level must stay under to count as held.",
+        )
+
+    def handle(self, *args, **options):
+        results = []
+        for count in [int(n) for n in options["subscribers"].split(",")]:
+            result = asyncio.run(self.run_level(count, options["conversations"], options["messages"]))
+            result["within_budget"] = result["p99_ms"] <= options["latency_budget_ms"]
+            results.append(result)
+            self.stderr.write(json.dumps(result))
+
+        held = [r["subscribers"] for r in results if r["within_budget"]]
+        self.stdout.write(json.dumps({
+            "levels": results,
+            "max_subscribers_within_budget": max(held) if held else 0,
+            "latency_budget_ms": options["latency_budget_ms"],
+        }, indent=2))
+
+    async def run_level(self, count, conversation_count, messages_per_conversation):
+        broker = InProcessBroker()
+        conversations = [uuid.uuid4() for _ in range(conversation_count)]
+        latencies = []
+        received = 0
+        done = asyncio.Event()
+        expected = count * messages_per_conversation
+        rss_before = rss_mb()
+
+        async def fake_socket(conversation_id):
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {"type": "websocket.disconnect"}
+
+            async def send(event):
+                nonlocal received
+                sent = json.loads(event["text"])["sent"]
+                latencies.append(time.perf_counter() - sent)
+                received += 1
+                if received >= expected:
+                    done.set()
+
+            task = asyncio.ensure_future(serve_subscription(conversation_id, receive, send, broker))
+            return task, disconnect
+
+        sockets = [await fake_socket(conversations[i % conversation_count]) for i in range(count)]
+        await asyncio.sleep(0)  # let every subscription register
+        rss_after = rss_mb()
+
+        def publisher():
+            # Publishing happens on request threads in production.
+            for _ in range(messages_per_conversation):
+                for conversation_id in conversations:
+                    broker.publish(conversation_id, json.dumps({"sent": time.perf_counter()}))
+
+        started = time.perf_counter()
+        thread = threading.Thread(target=publisher)
+        thread.start()
+        try:
+            await asyncio.wait_for(done.wait(), timeout=120)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+        thread.join()
+
+        for task, disconnect in sockets:
+            disconnect.set()
+        await asyncio.gather(*(task for task, _ in sockets))
+
+        latencies.sort()
+        ms = [value * 1000 for value in latencies] or [0.0]
+        return {
+            "subscribers": count,
+            "delivered": received,
+            "expected": expected,
+            "deliveries_per_sec": round(received / elapsed, 1) if elapsed else None,
+            "p50_ms": round(statistics.median(ms), 3),
+            "p99_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.99))], 3),
+            "rss_growth_mb": round(rss_after - rss_before, 2),
+        }
@@ -0,0 +1,67 @@
+# messaging_app/chats/management/commands/bench_serializers.py
+
+import json
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from chats.benchmarks import benchmark_database, time_repeated
+from chats.fastpath import compile_plan
+from chats.models import Conversation, ConversationParticipant, Message, User
+from chats.serializers import MessageSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/second of MessageSerializer against the compiled "
+        "chats.fastpath plan (fetch + serialize + render JSON)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-sizes", default="20,200,2000")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        page_sizes = [int(n) for n in options["page_sizes"].split(",")]
+        with benchmark_database():
+            result = self.run(page_sizes, options["repeat"])
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def seed(self, total):
+        users = User.objects.bulk_create([
+            User(username=f"ser{i}", email=f"ser{i}@example.com", first_name="S", last_name=str(i))
+            for i in range(10)
+        ])
+        conversation = Conversation.objects.create()
+        ConversationParticipant.objects.bulk_create(
+            [ConversationParticipant(conversation=conversation, user=u) for u in users]
+        )
+        Message.objects.bulk_create([
+            Message(conversation=conversation, sender=users[n % 10], message_body=f"message body {n}")
+            for n in range(total)
+        ])
+
+    def run(self, page_sizes, repeat):
+        self.seed(max(page_sizes))
+        plan = compile_plan(MessageSerializer)
+        renderer = JSONRenderer()
+        base = Message.objects.order_by("sent_at", "message_id")
+        results = []
+        for size in page_sizes:
+            def drf():
+                rows = list(base.select_related("conversation", "sender")[:size])
+                return renderer.render(MessageSerializer(rows, many=True).data)
+
+            def fast():
+                return renderer.render(plan.render_many(base.values(*plan.lookups)[:size]))
+
+            assert drf() == fast(), "fast path output differs from MessageSerializer"
+            drf_stats = time_repeated(drf, repeat)
+            fast_stats = time_repeated(fast, repeat)
+            results.append({
+                "page_size": size,
+                "serializer_rows_per_sec": round(size / (drf_stats["p50_ms"] / 1000)),
+                "fastpath_rows_per_sec": round(size / (fast_stats["p50_ms"] / 1000)),
+                "speedup": round(drf_stats["p50_ms"] / fast_stats["p50_ms"], 2),
+            })
+        return results
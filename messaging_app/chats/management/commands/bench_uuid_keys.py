@@ -0,0 +1,72 @@
+# messaging_app/chats/management/commands/bench_uuid_keys.py
+
+import json
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from chats.benchmarks import Timer, benchmark_database
+from chats.ids import uuid7
+from chats.models import Conversation, Message, User
+
+SCHEMES = {"v4": uuid.uuid4, "v7": uuid7}
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert throughput into a large Message table with random (v4) "
+        "versus time-ordered (v7, chats.ids) primary keys, on a throwaway "
+        "database. Rows are bulk-inserted, so only the table and its "
+        "indexes are exercised (no signals or search indexing)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--schemes", default="v4,v7")
+        parser.add_argument("--existing", type=int, default=200000, help="Rows in the table before timing.")
+        parser.add_argument("--inserts", type=int, default=50000, help="Rows inserted while timing.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows per INSERT (and transaction).")
+        parser.add_argument(
+            "--cache-kb", type=int, default=2048,
+            help="SQLite page cache while timing; smaller than the index, like a busy buffer pool.",
+        )
+
+    def handle(self, *args, **options):
+        result = {key: options[key] for key in ("existing", "inserts", "batch_size", "cache_kb")}
+        result["runs"] = []
+        for scheme in options["schemes"].split(","):
+            with benchmark_database():
+                result["runs"].append({"scheme": scheme, **self.run(SCHEMES[scheme], options)})
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def run(self, make_key, options):
+        sender = User.objects.create_user(username="keys", email="keys@example.com", password="x")
+        conversation = Conversation.objects.create()
+        batch_size = options["batch_size"]
+
+        def insert(count):
+            for start in range(0, count, batch_size):
+                with transaction.atomic():
+                    Message.objects.bulk_create(
+                        Message(message_id=make_key(), conversation=conversation, sender=sender, message_body="x")
+                        for _ in range(min(batch_size, count - start))
+                    )
+
+        insert(options["existing"])
+        sqlite = connection.vendor == "sqlite"
+        if sqlite:
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA cache_size = -{options['cache_kb']}")
+                cursor.execute("PRAGMA page_count")
+                pages_before = cursor.fetchone()[0]
+
+        with Timer() as timer:
+            insert(options["inserts"])
+
+        stats = {"rows_per_sec": round(options["inserts"] / timer.elapsed, 1)}
+        if sqlite:
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA page_count")
+                # Page splits leave half-empty pages: more pages per row
+                stats["pages_added"] = cursor.fetchone()[0] - pages_before
+        return stats
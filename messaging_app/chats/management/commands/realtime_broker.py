@@ -0,0 +1,62 @@
+# messaging_app/chats/management/commands/realtime_broker.py
+
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the local pub/sub broker process used by chats.realtime.TCPBroker "
+        "to fan messages out across ASGI workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--max-buffer", type=int, default=1024 * 1024,
+            help="Drop a subscriber whose unsent bytes exceed this (it reconnects).",
+        )
+
+    def handle(self, *args, **options):
+        asyncio.run(self.serve(options["host"], options["port"], options["max_buffer"]))
+
+    async def serve(self, host, port, max_buffer):
+        server = await self.start_server(host, port, max_buffer)
+        self.stdout.write(self.style.SUCCESS(f"Realtime broker listening on {host}:{port}"))
+        async with server:
+            await server.serve_forever()
+
+    @staticmethod
+    async def start_server(host, port, max_buffer=1024 * 1024):
+        subscribers = set()
+
+        def drop(subscriber):
+            subscribers.discard(subscriber)
+            subscriber.close()
+
+        async def handle_connection(reader, writer):
+            try:
+                while line := await reader.readline():
+                    if line.startswith(b'{"subscribe"'):
+                        subscribers.add(writer)
+                        continue
+                    # No drain(): one slow worker must not stall the others.
+                    # Like CLOSE_TOO_SLOW on the socket side, a subscriber
+                    # that falls behind is dropped; its relay reconnects.
+                    for subscriber in list(subscribers):
+                        try:
+                            subscriber.write(line)
+                        except (ConnectionError, RuntimeError):
+                            subscribers.discard(subscriber)
+                            continue
+                        if subscriber.transport.get_write_buffer_size() > max_buffer:
+                            drop(subscriber)
+            except ConnectionError:
+                pass
+            finally:
+                subscribers.discard(writer)
+                writer.close()
+
+        return await asyncio.start_server(handle_connection, host, port)
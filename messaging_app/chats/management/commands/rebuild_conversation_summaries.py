@@ -0,0 +1,27 @@
+# messaging_app/chats/management/commands/rebuild_conversation_summaries.py
+
+from django.core.management.base import BaseCommand
+
+from chats import summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized message summary stored on each conversation."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only-stale",
+            action="store_true",
+            help="Only rebuild conversations whose message count is out of date.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options["only_stale"]:
+            ids = list(summaries.stale_summaries().values_list("pk", flat=True))
+            for conversation_id in ids:
+                summaries.rebuild_summary(conversation_id)
+            processed = len(ids)
+        else:
+            processed = summaries.rebuild_all_summaries(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {processed} conversation summaries."))
@@ -0,0 +1,16 @@
+# messaging_app/chats/management/commands/rebuild_inbox.py
+
+from django.core.management.base import BaseCommand
+
+from chats.inbox import rebuild_inbox
+
+
+class Command(BaseCommand):
+    help = "Repopulate the per-user inbox rows from the membership table and conversation summaries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_inbox(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} inbox rows."))
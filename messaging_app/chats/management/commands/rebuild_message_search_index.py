@@ -0,0 +1,36 @@
+# messaging_app/chats/management/commands/rebuild_message_search_index.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chats.models import Message
+from chats.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Repopulate the message full-text search index from the messages table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        if not backend.uses_index:
+            self.stdout.write(f"{type(backend).__name__} keeps no index; nothing to do.")
+            return
+
+        batch_size = options["batch_size"]
+        messages = Message.objects.select_related("sender").order_by()
+        indexed = 0
+        with transaction.atomic():
+            backend.clear()
+            batch = []
+            for message in messages.iterator(chunk_size=batch_size):
+                batch.append(message)
+                if len(batch) >= batch_size:
+                    backend.index_many(batch)
+                    indexed += len(batch)
+                    batch = []
+            backend.index_many(batch)
+            indexed += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} messages."))
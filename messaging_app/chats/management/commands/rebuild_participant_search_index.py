@@ -0,0 +1,16 @@
+# messaging_app/chats/management/commands/rebuild_participant_search_index.py
+
+from django.core.management.base import BaseCommand
+
+from chats.participant_search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Repopulate the conversation participant search terms from the membership table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {written} participant terms."))
@@ -0,0 +1,60 @@
+# messaging_app/chats/management/commands/run_job_worker.py
+
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from chats import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Process the chats job queue (chats.jobs): claim due jobs in batches, "
+        "run them, retry failures with backoff and dead-letter exhausted jobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--poll-interval", type=float, default=None, help="Idle sleep, seconds.")
+        parser.add_argument("--worker-id", default=f"{socket.gethostname()}:{os.getpid()}")
+        parser.add_argument("--burst", action="store_true", help="Exit once no job is due.")
+        parser.add_argument("--max-batches", type=int, default=None)
+        parser.add_argument(
+            "--requeue-dead", nargs="?", const="", default=None, metavar="TASK",
+            help="Requeue dead-lettered jobs (optionally of one task) and exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options["requeue_dead"] is not None:
+            count = jobs.requeue_dead(options["requeue_dead"] or None)
+            self.stdout.write(self.style.SUCCESS(f"Requeued {count} dead jobs."))
+            return
+
+        config = jobs.get_settings()
+        batch_size = options["batch_size"] or config["BATCH_SIZE"]
+        poll_interval = config["POLL_INTERVAL"] if options["poll_interval"] is None else options["poll_interval"]
+        worker_id = options["worker_id"]
+        succeeded = failed = batches = 0
+        self.stdout.write(f"Job worker {worker_id} started (batch size {batch_size}).")
+        try:
+            while options["max_batches"] is None or batches < options["max_batches"]:
+                close_old_connections()
+                claimed = jobs.claim(worker_id, batch_size)
+                if not claimed:
+                    if options["burst"]:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                ok, bad = jobs.run_jobs(claimed)
+                succeeded, failed, batches = succeeded + ok, failed + bad, batches + 1
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"batch {batches}: {ok} done, {bad} failed")
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {succeeded + failed} jobs in {batches} batches "
+            f"({succeeded} done, {failed} failed); queue: {jobs.queue_stats()}"
+        ))
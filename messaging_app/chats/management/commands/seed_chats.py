@@ -0,0 +1,51 @@
+# messaging_app/chats/management/commands/seed_chats.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chats.benchmarks import Timer
+from chats.loadgen import SEED_PASSWORD, seed_dataset
+from chats.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-insert synthetic users, conversations (skewed participant "
+        "distribution) and messages into the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--conversations", type=int, default=2000)
+        parser.add_argument("--messages", type=int, default=50000)
+        parser.add_argument("--max-participants", type=int, default=50)
+        parser.add_argument(
+            "--skew", type=float, default=1.1,
+            help="Zipf exponent for user popularity, group sizes and traffic (0 = uniform).",
+        )
+        parser.add_argument("--days", type=int, default=90, help="Spread sent_at over this many days.")
+        parser.add_argument("--prefix", default="load", help="Username/email prefix of seeded users.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for reproducible data.")
+
+    def handle(self, *args, **options):
+        if options["users"] < 2:
+            raise CommandError("--users must be at least 2.")
+        if User.objects.filter(username__startswith=options["prefix"]).exists():
+            raise CommandError(f"Users with prefix {options['prefix']!r} exist; pass another --prefix.")
+        with Timer() as timer:
+            users, conversations = seed_dataset(
+                users=options["users"],
+                conversations=options["conversations"],
+                messages=options["messages"],
+                max_participants=options["max_participants"],
+                skew=options["skew"],
+                days=options["days"],
+                prefix=options["prefix"],
+                batch_size=options["batch_size"],
+                seed=options["seed"],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users, {len(conversations)} conversations and "
+            f"{options['messages']} messages in {timer.elapsed:.1f}s "
+            f"(password for {users[0].username}..: {SEED_PASSWORD!r})."
+        ))
@@ -0,0 +1,36 @@
+# messaging_app/chats/management/commands/sync_sqlite_replica.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the SQLite primary into a SQLite replica file (online backup), "
+        "to exercise chats.db.replicas locally. With --interval, keep copying, "
+        "which behaves like a replica with that much replication lag."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--replica", default="replica", help="Replica database alias.")
+        parser.add_argument("--interval", type=float, default=0.0, help="Repeat every N seconds.")
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        replica = connections[options["replica"]]
+        if primary.vendor != "sqlite" or replica.vendor != "sqlite":
+            raise CommandError("Both databases must use the sqlite3 backend.")
+        while True:
+            started = time.perf_counter()
+            primary.ensure_connection()
+            replica.ensure_connection()
+            primary.connection.backup(replica.connection)
+            self.stdout.write(
+                f"Copied {primary.settings_dict['NAME']} -> {replica.settings_dict['NAME']} "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,169 @@
+# messaging_app/chats/membership.py
+
+"""
+Conversation membership cache used for authorization on the hot paths.
+
+Two maps are cached:
+- conversation_id -> frozenset of participant user ids
+- user_id         -> frozenset of conversation ids
+
+Lookups go through an in-process LRU tier, then an optional shared tier
+(a Django cache alias, e.g. Redis/Memcached), then the database. Entries are
+invalidated by the ConversationParticipant signal handlers in chats.signals,
+both immediately and again on commit so that a value read inside a
+rolled-back transaction cannot linger.
+
+Configure with the CHATS_MEMBERSHIP_CACHE setting:
+    {"MAX_ENTRIES": 10000, "LOCAL_TTL": 5, "SHARED_ALIAS": None, "SHARED_TTL": 300}
+With several workers, LOCAL_TTL bounds how long another process may serve a
+stale local entry after a membership change.
+
+The `a*` coroutines (for chats.async_views) answer local hits on the event
+loop and fall back to the blocking lookup in a worker thread.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .caching import LRUCache
+from .db.replicas import use_primary
+from .models import ConversationParticipant
+
+DEFAULTS = {
+    "MAX_ENTRIES": 10000,
+    "LOCAL_TTL": 5,
+    "SHARED_ALIAS": None,
+    "SHARED_TTL": 300,
+}
+
+MEMBERS_PREFIX = "chats:members:"
+CONVERSATIONS_PREFIX = "chats:user-conversations:"
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "CHATS_MEMBERSHIP_CACHE", {})}
+
+
+class MembershipCache:
+
+    def __init__(self, max_entries, local_ttl, shared_alias=None, shared_ttl=300):
+        self.local = LRUCache(max_entries=max_entries, ttl=local_ttl)
+        self.shared = caches[shared_alias] if shared_alias else None
+        self.shared_ttl = shared_ttl
+
+    # --- tiered get ---
+    def _get_many(self, prefix, ids, load):
+        """Return {id: frozenset} for `ids`, loading misses with one query."""
+        found, missing = {}, []
+        for key in ids:
+            value = self.local.get(prefix + str(key))
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+
+        if missing and self.shared is not None:
+            shared = self.shared.get_many([prefix + str(key) for key in missing])
+            still_missing = []
+            for key in missing:
+                value = shared.get(prefix + str(key))
+                if value is None:
+                    still_missing.append(key)
+                else:
+                    found[key] = value
+                    self.local.set(prefix + str(key), value)
+            missing = still_missing
+
+        if missing:
+            loaded = load(missing)
+            for key in missing:
+                value = frozenset(loaded.get(key, ()))
+                found[key] = value
+                self.local.set(prefix + str(key), value)
+            if self.shared is not None:
+                self.shared.set_many(
+                    {prefix + str(key): found[key] for key in missing}, self.shared_ttl
+                )
+        return found
+
+    @staticmethod
+    def _load(key_field, value_field, ids):
+        loaded = {}
+        # Never from a lagging replica: the result outlives the invalidation
+        with use_primary():
+            rows = ConversationParticipant.objects.filter(**{f"{key_field}__in": ids}).values_list(
+                key_field, value_field
+            )
+            for key, value in rows:
+                loaded.setdefault(key, set()).add(value)
+        return loaded
+
+    def members_many(self, conversation_ids):
+        return self._get_many(
+            MEMBERS_PREFIX, list(conversation_ids),
+            lambda ids: self._load("conversation_id", "user_id", ids),
+        )
+
+    def conversations_many(self, user_ids):
+        return self._get_many(
+            CONVERSATIONS_PREFIX, list(user_ids),
+            lambda ids: self._load("user_id", "conversation_id", ids),
+        )
+
+    def members(self, conversation_id):
+        return self.members_many([conversation_id])[conversation_id]
+
+    def conversations(self, user_id):
+        return self.conversations_many([user_id])[user_id]
+
+    def is_member(self, conversation_id, user_id):
+        return user_id in self.members(conversation_id)
+
+    async def amembers(self, conversation_id):
+        value = self.local.get(MEMBERS_PREFIX + str(conversation_id))
+        if value is None:
+            value = await sync_to_async(self.members)(conversation_id)
+        return value
+
+    async def aconversations(self, user_id):
+        value = self.local.get(CONVERSATIONS_PREFIX + str(user_id))
+        if value is None:
+            value = await sync_to_async(self.conversations)(user_id)
+        return value
+
+    async def ais_member(self, conversation_id, user_id):
+        return user_id in await self.amembers(conversation_id)
+
+    # --- invalidation ---
+    def _delete(self, keys):
+        for key in keys:
+            self.local.delete(key)
+        if self.shared is not None and keys:
+            self.shared.delete_many(keys)
+
+    def invalidate(self, conversation_ids=(), user_ids=()):
+        keys = [MEMBERS_PREFIX + str(cid) for cid in conversation_ids]
+        keys += [CONVERSATIONS_PREFIX + str(uid) for uid in user_ids]
+        self._delete(keys)
+        transaction.on_commit(lambda: self._delete(keys))
+
+    def clear(self):
+        self.local.clear()
+
+
+_cache = None
+
+
+def get_membership_cache():
+    global _cache
+    if _cache is None:
+        config = _config()
+        _cache = MembershipCache(
+            max_entries=config["MAX_ENTRIES"],
+            local_ttl=config["LOCAL_TTL"],
+            shared_alias=config["SHARED_ALIAS"],
+            shared_ttl=config["SHARED_TTL"],
+        )
+    return _cache
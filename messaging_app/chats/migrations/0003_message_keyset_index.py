@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-17 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0002_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sent_at', 'message_id'], name='message_sent_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Side index for chats.search (FTS5 on SQLite, FULLTEXT on MySQL).
+
+from django.db import migrations
+
+CREATE_SQL = {
+    "sqlite": [
+        "CREATE TABLE chats_message_search ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " message_id CHAR(32) NOT NULL UNIQUE,"
+        " conversation_id CHAR(32) NOT NULL,"
+        " body TEXT NOT NULL,"
+        " sender VARCHAR(512) NOT NULL)",
+        "CREATE INDEX chats_message_search_conversation ON chats_message_search (conversation_id)",
+        # External-content FTS5 table over chats_message_search, kept in sync by triggers
+        "CREATE VIRTUAL TABLE chats_message_fts USING fts5("
+        " body, sender, content='chats_message_search', content_rowid='id',"
+        " tokenize = 'unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER chats_message_search_ai AFTER INSERT ON chats_message_search BEGIN"
+        " INSERT INTO chats_message_fts (rowid, body, sender) VALUES (new.id, new.body, new.sender);"
+        " END",
+        "CREATE TRIGGER chats_message_search_ad AFTER DELETE ON chats_message_search BEGIN"
+        " INSERT INTO chats_message_fts (chats_message_fts, rowid, body, sender)"
+        " VALUES ('delete', old.id, old.body, old.sender);"
+        " END",
+        "CREATE TRIGGER chats_message_search_au AFTER UPDATE ON chats_message_search BEGIN"
+        " INSERT INTO chats_message_fts (chats_message_fts, rowid, body, sender)"
+        " VALUES ('delete', old.id, old.body, old.sender);"
+        " INSERT INTO chats_message_fts (rowid, body, sender) VALUES (new.id, new.body, new.sender);"
+        " END",
+    ],
+    "mysql": [
+        "CREATE TABLE chats_message_search ("
+        " message_id CHAR(32) NOT NULL PRIMARY KEY,"
+        " conversation_id CHAR(32) NOT NULL,"
+        " body LONGTEXT NOT NULL,"
+        " sender VARCHAR(512) NOT NULL,"
+        " KEY chats_message_search_conversation (conversation_id),"
+        " FULLTEXT KEY chats_message_search_text (body, sender)"
+        ") ENGINE=InnoDB",
+    ],
+}
+
+DROP_SQL = {
+    "sqlite": [
+        "DROP TABLE IF EXISTS chats_message_fts",
+        "DROP TABLE IF EXISTS chats_message_search",
+    ],
+    "mysql": [
+        "DROP TABLE IF EXISTS chats_message_search",
+    ],
+}
+
+POPULATE_SQL = {
+    "sqlite": (
+        "INSERT INTO chats_message_search (message_id, conversation_id, body, sender) "
+        "SELECT m.message_id, m.conversation_id, m.message_body,"
+        " u.username || ' ' || u.first_name || ' ' || u.last_name || ' ' || u.email "
+        "FROM chats_message m JOIN chats_user u ON u.user_id = m.sender_id"
+    ),
+    "mysql": (
+        "INSERT INTO chats_message_search (message_id, conversation_id, body, sender) "
+        "SELECT m.message_id, m.conversation_id, m.message_body,"
+        " CONCAT_WS(' ', u.username, u.first_name, u.last_name, u.email) "
+        "FROM chats_message m JOIN chats_user u ON u.user_id = m.sender_id"
+    ),
+}
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for statement in CREATE_SQL.get(vendor, []):
+        schema_editor.execute(statement)
+    if vendor in POPULATE_SQL:
+        schema_editor.execute(POPULATE_SQL[vendor])
+
+
+def drop_index(apps, schema_editor):
+    for statement in DROP_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0003_message_keyset_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-17 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0004_message_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.24 on 2026-10-17 04:19
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill(apps, schema_editor):
+    # No read cursors yet: everything from others since joining is unread
+    ConversationParticipant = apps.get_model("chats", "ConversationParticipant")
+    Message = apps.get_model("chats", "Message")
+    unread = (
+        Message.objects.filter(conversation_id=OuterRef("conversation_id"), sent_at__gte=OuterRef("joined_at"))
+        .exclude(sender_id=OuterRef("user_id"))
+        .order_by()
+        .values("conversation_id")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    ConversationParticipant.objects.update(
+        unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0005_conversation_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='last_read_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='last_read_message_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
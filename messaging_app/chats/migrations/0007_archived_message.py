@@ -0,0 +1,30 @@
+# Generated by Django 4.2.24 on 2026-10-17 04:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0006_participant_read_cursor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('message_id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('message_body', models.TextField()),
+                ('sent_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='chats.conversation')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['sent_at'],
+                'indexes': [models.Index(fields=['sent_at', 'message_id'], name='archived_sent_at_id_idx'), models.Index(fields=['conversation', 'sent_at'], name='archived_conv_sent_at_idx')],
+            },
+        ),
+    ]
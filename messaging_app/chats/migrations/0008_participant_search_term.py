@@ -0,0 +1,69 @@
+# Generated by Django 4.2.24 on 2026-10-17 04:36
+
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Frozen copy of chats.participant_search.terms_for as of this migration
+SEARCH_FIELDS = ("username", "email", "first_name", "last_name")
+TERM_LENGTH = 254
+_WORD_SPLIT = re.compile(r"[^\w]+|_")
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold().strip()
+
+
+def terms_for(user):
+    terms = set()
+    for field in SEARCH_FIELDS:
+        value = normalize(getattr(user, field))
+        if not value:
+            continue
+        terms.add(value[:TERM_LENGTH])
+        terms.update(part[:TERM_LENGTH] for part in _WORD_SPLIT.split(value) if part)
+    return terms
+
+
+def backfill(apps, schema_editor):
+    ConversationParticipant = apps.get_model("chats", "ConversationParticipant")
+    ParticipantSearchTerm = apps.get_model("chats", "ParticipantSearchTerm")
+    rows = []
+    memberships = ConversationParticipant.objects.select_related("user").order_by()
+    for membership in memberships.iterator(chunk_size=1000):
+        rows.extend(
+            ParticipantSearchTerm(conversation_id=membership.conversation_id, user_id=membership.user_id, term=term)
+            for term in terms_for(membership.user)
+        )
+        if len(rows) >= 1000:
+            ParticipantSearchTerm.objects.bulk_create(rows)
+            rows = []
+    ParticipantSearchTerm.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0007_archived_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticipantSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=254)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='chats.conversation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'conversation'], name='participant_term_idx')],
+                'unique_together': {('conversation', 'user', 'term')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
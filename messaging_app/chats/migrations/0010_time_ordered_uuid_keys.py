@@ -0,0 +1,38 @@
+# Generated by Django 4.2.24 on 2026-10-17 05:06
+
+import chats.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    New rows get time-ordered (version 7) keys. The default is applied in
+    Python, so the columns are unchanged and existing version 4 keys stay
+    valid; only the migration state moves (no table rebuild).
+    """
+
+    dependencies = [
+        ('chats', '0009_job_queue'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='conversation',
+                    name='conversation_id',
+                    field=models.UUIDField(db_index=True, default=chats.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='message',
+                    name='message_id',
+                    field=models.UUIDField(db_index=True, default=chats.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='user',
+                    name='user_id',
+                    field=models.UUIDField(db_index=True, default=chats.ids.uuid7, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.24 on 2026-10-17 05:10
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def participant_key(user_ids):
+    # Frozen copy of chats.conversations.participant_key as of this migration
+    canonical = ",".join(sorted({str(user_id).replace("-", "").lower() for user_id in user_ids}))
+    return hashlib.sha256(canonical.encode("ascii")).hexdigest()
+
+
+def backfill(apps, schema_editor):
+    # The oldest conversation of each participant set owns its key
+    Conversation = apps.get_model("chats", "Conversation")
+    ConversationParticipant = apps.get_model("chats", "ConversationParticipant")
+    members = {}
+    for conversation_id, user_id in ConversationParticipant.objects.order_by().values_list(
+        "conversation_id", "user_id"
+    ).iterator(chunk_size=1000):
+        members.setdefault(conversation_id, []).append(user_id)
+    taken = set()
+    for conversation in Conversation.objects.order_by("created_at", "pk").only("pk").iterator(chunk_size=1000):
+        user_ids = members.get(conversation.pk)
+        if not user_ids:
+            continue
+        key = participant_key(user_ids)
+        if key not in taken:
+            taken.add(key)
+            Conversation.objects.filter(pk=conversation.pk).update(participant_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0010_time_ordered_uuid_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='participant_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
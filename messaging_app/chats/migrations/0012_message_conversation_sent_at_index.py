@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-17 05:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0011_conversation_participant_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'sent_at', 'message_id'], name='message_conv_sent_at_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.24 on 2026-10-17 05:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill(apps, schema_editor):
+    ConversationParticipant = apps.get_model("chats", "ConversationParticipant")
+    InboxEntry = apps.get_model("chats", "InboxEntry")
+    rows = []
+    memberships = ConversationParticipant.objects.select_related("conversation").order_by()
+    for membership in memberships.iterator(chunk_size=1000):
+        conversation = membership.conversation
+        rows.append(InboxEntry(
+            conversation_id=conversation.pk,
+            user_id=membership.user_id,
+            last_activity_at=conversation.last_message_at or conversation.created_at,
+            snippet=conversation.last_message_preview,
+        ))
+        if len(rows) >= 1000:
+            InboxEntry.objects.bulk_create(rows)
+            rows = []
+    InboxEntry.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0012_message_conversation_sent_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_activity_at', models.DateTimeField()),
+                ('snippet', models.CharField(blank=True, default='', max_length=41)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='chats.conversation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'last_activity_at', 'conversation'], name='inbox_user_activity_idx')],
+                'unique_together': {('conversation', 'user')},
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,21 @@
 # messaging_app/chats/models.py
 
-import uuid
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
+from .ids import uuid7
+
+# Length of the stored/serialized last message preview (ellipsis excluded)
+PREVIEW_LENGTH = 40
+
+
+def make_preview(text: str) -> str:
+    """Truncate a message body to the conversation-list preview format."""
+    text = text or ""
+    return (text[:PREVIEW_LENGTH] + "…") if len(text) > PREVIEW_LENGTH else text
+
 
 class User(AbstractUser):
     """
@@ -25,7 +37,7 @@ class User(AbstractUser):
 
     user_id = models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         editable=False,
         db_index=True,
     )
@@ -51,10 +63,18 @@ class User(AbstractUser):
 class Conversation(models.Model):
     """
     A conversation with 2+ participants.
+
+    The `messages_count` / `last_*` columns are a denormalized summary of the
+    conversation's messages. They are maintained by the Message signal
+    handlers in `chats.signals` and can be rebuilt with
+    `manage.py rebuild_conversation_summaries`.
+
+    `version` is bumped whenever the conversation's messages or participants
+    change; it drives the ETags served by the viewsets (chats.etags).
     """
     conversation_id = models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         editable=False,
         db_index=True,
     )
@@ -64,6 +84,23 @@ class Conversation(models.Model):
         related_name="conversations",
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveBigIntegerField(default=0)
+    # Hash of the participant set for find-or-create (chats.conversations);
+    # NULL once the membership changed or when another conversation owns it
+    participant_key = models.CharField(max_length=64, unique=True, blank=True, null=True, editable=False)
+
+    # --- Denormalized message summary ---
+    messages_count = models.PositiveIntegerField(default=0)
+    last_message_id = models.UUIDField(blank=True, null=True)
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH + 1, blank=True, default="")
+    last_message_at = models.DateTimeField(blank=True, null=True)
+    last_sender = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="+",
+    )
 
     class Meta:
         ordering = ["-created_at"]
@@ -75,6 +112,11 @@ class Conversation(models.Model):
 class ConversationParticipant(models.Model):
     """
     Through table to ensure each (conversation, user) pair is unique.
+
+    Also carries the participant's read cursor (`last_read_at`,
+    `last_read_message_id`) and a maintained `unread_count` of messages from
+    other participants after that cursor (or after `joined_at` while the
+    cursor is unset). See chats.summaries.
     """
     conversation = models.ForeignKey(
         Conversation,
@@ -87,6 +129,9 @@ class ConversationParticipant(models.Model):
         related_name="conversation_memberships",
     )
     joined_at = models.DateTimeField(auto_now_add=True)
+    last_read_at = models.DateTimeField(blank=True, null=True)
+    last_read_message_id = models.UUIDField(blank=True, null=True)
+    unread_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ("conversation", "user")
@@ -98,13 +143,77 @@ class ConversationParticipant(models.Model):
         return f"{self.user} in {self.conversation_id}"
 
 
+class ParticipantSearchTerm(models.Model):
+    """
+    Denormalized participant search index: one row per (conversation,
+    participant, normalized term), where the terms are the casefolded,
+    accent-stripped username, email and names of the participant and their
+    word parts. `(term, conversation)` is indexed so a prefix search is a
+    range scan (see chats.participant_search); maintained by the membership
+    and user signals in chats.signals.
+    """
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name="search_terms",
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    term = models.CharField(max_length=254)
+
+    class Meta:
+        unique_together = ("conversation", "user", "term")
+        indexes = [
+            models.Index(fields=["term", "conversation"], name="participant_term_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.term!r} in {self.conversation_id}"
+
+
+class InboxEntry(models.Model):
+    """
+    Materialized inbox: one row per (user, conversation) with the time of
+    the conversation's latest activity and a snippet of its last message.
+    `(user, last_activity_at, conversation)` is indexed so a user's
+    conversations by recency are a range scan (see chats.inbox); maintained
+    on message write and by the membership signals in chats.signals.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="inbox_entries",
+    )
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name="inbox_entries",
+    )
+    last_activity_at = models.DateTimeField()
+    snippet = models.CharField(max_length=PREVIEW_LENGTH + 1, blank=True, default="")
+
+    class Meta:
+        # Leading conversation: fan-out updates one conversation's rows
+        unique_together = ("conversation", "user")
+        indexes = [
+            models.Index(fields=["user", "last_activity_at", "conversation"], name="inbox_user_activity_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} inbox: {self.conversation_id} @ {self.last_activity_at}"
+
+
 class Message(models.Model):
     """
     Message sent by a user within a conversation.
     """
+    # Time-ordered keys (chats.ids): inserts append to the primary-key index
     message_id = models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         editable=False,
         db_index=True,
     )
@@ -126,8 +235,79 @@ class Message(models.Model):
         ordering = ["sent_at"]
         indexes = [
             models.Index(fields=["sent_at"]),
+            # Keyset pagination (chats.pagination) seeks on this pair
+            models.Index(fields=["sent_at", "message_id"], name="message_sent_at_id_idx"),
+            # One conversation's page (nested route): equality, then the keyset pair
+            models.Index(fields=["conversation", "sent_at", "message_id"], name="message_conv_sent_at_idx"),
         ]
 
     def __str__(self):
         body = (self.message_body[:30] + "…") if len(self.message_body) > 30 else self.message_body
         return f"{self.sender} -> {self.conversation_id}: {body}"
+
+
+class ArchivedMessage(models.Model):
+    """
+    Cold storage for messages older than the hot window (see chats.archive).
+    Same columns as Message, so MessageSerializer can render either; rows are
+    moved here in small batches by `manage.py archive_messages`.
+    """
+    message_id = models.UUIDField(primary_key=True, editable=False)
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name="archived_messages",
+    )
+    sender = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="archived_messages",
+    )
+    message_body = models.TextField()
+    sent_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["sent_at"]
+        indexes = [
+            models.Index(fields=["sent_at", "message_id"], name="archived_sent_at_id_idx"),
+            models.Index(fields=["conversation", "sent_at"], name="archived_conv_sent_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"[archived] {self.sender} -> {self.conversation_id}"
+
+
+class Job(models.Model):
+    """
+    A unit of deferred work in the local durable job queue (chats.jobs).
+
+    Rows are inserted in the same transaction as the write that caused them
+    and deleted once their task succeeds. Failed jobs are retried with
+    backoff and parked as DEAD after `max_attempts` (the dead-letter set).
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        DEAD = "dead", "Dead"
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(encoder=DjangoJSONEncoder, default=dict)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default="")
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Pickup: oldest due jobs of a status
+            models.Index(fields=["status", "run_at", "id"], name="job_pickup_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
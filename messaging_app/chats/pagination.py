@@ -0,0 +1,240 @@
+# messaging_app/chats/pagination.py
+
+import base64
+from collections import OrderedDict
+from datetime import datetime
+import uuid
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+OLDER = "o"
+NEWER = "n"
+
+
+def encode_cursor(sent_at, message_id, direction):
+    raw = f"{direction}|{sent_at.isoformat()}|{uuid.UUID(str(message_id)).hex}"
+    return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Return (direction, sent_at, message_id) or raise NotFound."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii")
+        direction, sent_at, message_id = raw.split("|")
+        if direction not in (OLDER, NEWER):
+            raise ValueError(direction)
+        return direction, datetime.fromisoformat(sent_at), uuid.UUID(message_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise NotFound("Invalid cursor.")
+
+
+class KeysetPagination:
+    """
+    Keyset ("seek") pagination on (sent_at, message_id).
+
+    Every page is a single indexed range scan with LIMIT page_size + 1, so deep
+    pages cost the same as the first one and no COUNT(*) is issued.
+
+    - `?cursor=` (empty) returns the newest page.
+    - If the view defines `get_archive_queryset()`, pages continue into the
+      archived (cold) messages past the end of the hot table.
+    - The response carries opaque `older` / `newer` cursors; each page is
+      returned in ascending (sent_at, message_id) order.
+    - `newer` is always set, also on the newest page and on an empty newer
+      page (which repeats its own cursor): clients poll it for messages
+      that arrive after their first load.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size = 20
+    max_page_size = 200
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    @staticmethod
+    def seek_queryset(queryset, direction, sent_at, message_id, limit):
+        """Up to `limit` rows beyond the position, nearest first."""
+        if direction == OLDER:
+            if sent_at is not None:
+                queryset = queryset.filter(
+                    Q(sent_at__lt=sent_at) | Q(sent_at=sent_at, message_id__lt=message_id)
+                )
+            return queryset.order_by("-sent_at", "-message_id")[:limit]
+        queryset = queryset.filter(
+            Q(sent_at__gt=sent_at) | Q(sent_at=sent_at, message_id__gt=message_id)
+        )
+        return queryset.order_by("sent_at", "message_id")[:limit]
+
+    @classmethod
+    def seek(cls, queryset, direction, sent_at, message_id, limit):
+        return list(cls.seek_queryset(queryset, direction, sent_at, message_id, limit))
+
+    @classmethod
+    async def aseek(cls, queryset, direction, sent_at, message_id, limit):
+        return [row async for row in cls.seek_queryset(queryset, direction, sent_at, message_id, limit)]
+
+    def _start(self, queryset, request, view):
+        """Parse the request; returns (size, position, tiers in seek order)."""
+        self.request = request
+        size = self.get_page_size(request)
+        token = request.query_params.get(self.cursor_query_param, "")
+        queryset = queryset.order_by()
+        # Cold tier (chats.archive): every archived row is older than every
+        # hot row, so it is only consulted once the hot side runs out.
+        get_archive = getattr(view, "get_archive_queryset", None)
+        archive = get_archive() if get_archive is not None else None
+
+        if token:
+            position = decode_cursor(token)
+        else:
+            position = (OLDER, None, None)
+
+        tiers = [queryset, archive] if position[0] == OLDER else [archive, queryset]
+        return size, position, [tier.order_by() for tier in tiers if tier is not None]
+
+    def _finish(self, rows, size, position):
+        direction = position[0]
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if direction == OLDER:
+            rows.reverse()
+            self.has_older = has_more
+        else:
+            self.has_older = True
+
+        self.page = rows
+        self.position = position
+        return rows
+
+    def paginate_queryset(self, queryset, request, view=None):
+        size, position, tiers = self._start(queryset, request, view)
+        rows = []
+        for tier in tiers:
+            if len(rows) > size:
+                break
+            rows += self.seek(tier, *position, size + 1 - len(rows))
+        return self._finish(rows, size, position)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() with the page fetched through the async ORM."""
+        size, position, tiers = self._start(queryset, request, view)
+        rows = []
+        for tier in tiers:
+            if len(rows) > size:
+                break
+            rows += await self.aseek(tier, *position, size + 1 - len(rows))
+        return self._finish(rows, size, position)
+
+    def _link(self, message, direction):
+        if isinstance(message, dict):
+            # .values() rows (chats.fastpath)
+            sent_at, message_id = message["sent_at"], message["message_id"]
+        else:
+            sent_at, message_id = message.sent_at, message.message_id
+        return self._position_link(sent_at, message_id, direction)
+
+    def _position_link(self, sent_at, message_id, direction):
+        url = self.request.build_absolute_uri()
+        token = encode_cursor(sent_at, message_id, direction)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_older_link(self):
+        if not self.page or not self.has_older:
+            return None
+        return self._link(self.page[0], OLDER)
+
+    def get_newer_link(self):
+        if self.page:
+            return self._link(self.page[-1], NEWER)
+        direction, sent_at, message_id = self.position
+        if direction != NEWER:
+            return None
+        # Nothing new yet: poll from the same position again
+        return self._position_link(sent_at, message_id, NEWER)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("older", self.get_older_link()),
+            ("newer", self.get_newer_link()),
+            ("results", data),
+        ]))
+
+
+class TieredRows:
+    """
+    Several querysets read as one sequence, for Paginator: `count()` sums
+    the tiers and a slice is served from the tiers it overlaps, in order.
+    """
+
+    ordered = True
+
+    def __init__(self, tiers):
+        self.tiers = tiers
+        self._counts = None
+
+    def counts(self):
+        if self._counts is None:
+            self._counts = [tier.count() for tier in self.tiers]
+        return self._counts
+
+    def count(self):
+        return sum(self.counts())
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("TieredRows only supports slicing.")
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        rows = []
+        offset = 0
+        for tier, count in zip(self.tiers, self.counts()):
+            low, high = max(start - offset, 0), min(stop - offset, count)
+            if low < high:
+                rows += tier[low:high]
+            offset += count
+        return rows
+
+
+class MessagePagination(PageNumberPagination):
+    """
+    Page-number pagination by default; switches to KeysetPagination when the
+    request carries a `cursor` query parameter. Both continue into archived
+    messages when the view defines `get_archive_queryset()`: page numbers
+    (and `count`) run over the hot and archived rows as one list.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = KeysetPagination.max_page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            self.keyset.page_size = self.page_size or self.keyset.page_size
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        get_archive = getattr(view, "get_archive_queryset", None)
+        archive = get_archive() if get_archive is not None else None
+        if archive is not None:
+            ordering = queryset.query.order_by
+            # Every archived row is older than every hot row
+            newest_first = bool(ordering) and str(ordering[0]).startswith("-")
+            archive = archive.order_by(*ordering)
+            queryset = TieredRows([queryset, archive] if newest_first else [archive, queryset])
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
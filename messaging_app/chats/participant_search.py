@@ -0,0 +1,122 @@
+# messaging_app/chats/participant_search.py
+
+"""
+Conversation search by participant, answered from `ParticipantSearchTerm`.
+
+Every participant contributes normalized terms (casefolded, accents
+stripped): their username, email and first/last name, plus the word parts
+of each (so "ada.lovelace@example.com" is also found by "lovelace" and
+"example"). A query word matches a conversation when it is a prefix of one
+of its terms, evaluated as `term LIKE 'word%'` on the (term, conversation)
+index: a range scan on MySQL/PostgreSQL instead of an icontains scan over
+the participants join, and no duplicate rows. (A hand-built upper bound
+such as `term < word[:-1] + chr(ord(word[-1]) + 1)` would assume binary
+ordering; MySQL's default collation sorts punctuation before letters and
+digits.)
+"""
+
+import re
+import unicodedata
+
+from django.db import transaction
+
+from .models import ConversationParticipant, ParticipantSearchTerm, User
+
+SEARCH_FIELDS = ("username", "email", "first_name", "last_name")
+TERM_LENGTH = ParticipantSearchTerm._meta.get_field("term").max_length
+
+_WORD_SPLIT = re.compile(r"[^\w]+|_")
+
+
+def normalize(text):
+    """Casefold and strip accents: "Zoë" -> "zoe"."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold().strip()
+
+
+def terms_for(user):
+    """The set of normalized search terms for one user."""
+    terms = set()
+    for field in SEARCH_FIELDS:
+        value = normalize(getattr(user, field))
+        if not value:
+            continue
+        terms.add(value[:TERM_LENGTH])
+        terms.update(part[:TERM_LENGTH] for part in _WORD_SPLIT.split(value) if part)
+    return terms
+
+
+def query_words(query):
+    """Normalized words of a search query; each must match (AND)."""
+    return [word for word in normalize(query).split() if word]
+
+
+def matching_conversation_ids(word):
+    """Conversation ids having a participant term that starts with `word`."""
+    return ParticipantSearchTerm.objects.filter(term__startswith=word).values("conversation_id")
+
+
+def filter_conversations(queryset, query):
+    for word in query_words(query):
+        queryset = queryset.filter(pk__in=matching_conversation_ids(word))
+    return queryset
+
+
+# --- Maintenance ---
+
+def index_memberships(pairs):
+    """Add the terms of (conversation_id, user) pairs; returns rows written."""
+    rows = [
+        ParticipantSearchTerm(conversation_id=conversation_id, user_id=user.pk, term=term)
+        for conversation_id, user in pairs
+        for term in terms_for(user)
+    ]
+    ParticipantSearchTerm.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+def remove_memberships(conversation_ids, user_ids):
+    ParticipantSearchTerm.objects.filter(
+        conversation_id__in=conversation_ids, user_id__in=user_ids
+    ).delete()
+
+
+def reindex_user(user):
+    """
+    Refresh a user's terms in all their conversations after a profile change.
+    One SELECT when nothing search-relevant changed.
+    """
+    new_terms = terms_for(user)
+    stored = ParticipantSearchTerm.objects.filter(user_id=user.pk)
+    if set(stored.values_list("term", flat=True).distinct()) == new_terms:
+        return
+    conversation_ids = ConversationParticipant.objects.filter(user_id=user.pk).values_list(
+        "conversation_id", flat=True
+    )
+    with transaction.atomic():
+        stored.delete()
+        index_memberships((conversation_id, user) for conversation_id in conversation_ids)
+
+
+def rebuild_index(batch_size=1000):
+    """Recreate every term from the membership table; returns rows written."""
+    written = 0
+    with transaction.atomic():
+        ParticipantSearchTerm.objects.all().delete()
+        users = {}
+        memberships = ConversationParticipant.objects.order_by().values_list("conversation_id", "user_id")
+        batch = []
+        for conversation_id, user_id in memberships.iterator(chunk_size=batch_size):
+            batch.append((conversation_id, user_id))
+            if len(batch) >= batch_size:
+                written += _index_batch(batch, users)
+                batch = []
+        written += _index_batch(batch, users)
+    return written
+
+
+def _index_batch(batch, users):
+    missing = {user_id for _, user_id in batch} - users.keys()
+    if missing:
+        users.update(User.objects.only(*SEARCH_FIELDS).in_bulk(missing))
+    return index_memberships((conversation_id, users[user_id]) for conversation_id, user_id in batch)
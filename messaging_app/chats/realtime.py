@@ -0,0 +1,281 @@
+# messaging_app/chats/realtime.py
+
+"""
+Real-time fan-out of new messages to WebSocket subscribers.
+
+    ws[s]://<host>/ws/conversations/<conversation_id>/?token=<JWT access token>
+
+`messaging_app.asgi` routes websocket scopes here; everything else goes to
+Django. Publishing happens from MessageViewSet.create (after commit) through
+the configured broker:
+
+- InProcessBroker (default): subscribers of this worker process only.
+- TCPBroker: set `CHATS_REALTIME_BROKER_URL = "tcp://127.0.0.1:8765"` and run
+  `manage.py realtime_broker`; every worker relays publishes through the
+  broker process, which fans them out to all workers.
+
+The token and membership are checked at connect; membership and the user's
+active flag are checked again before every event sent (both from the
+in-process cache tiers), so a removed or deactivated participant's socket
+is closed with CLOSE_FORBIDDEN at the next message.
+"""
+
+import asyncio
+import json
+import re
+import socket
+import threading
+import uuid
+from urllib.parse import parse_qs, urlparse
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+SOCKET_PATH_RE = re.compile(r"^/ws/conversations/(?P<conversation_id>[0-9a-fA-F-]{32,36})/?$")
+
+# Close codes (4000-4999 are application defined)
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+CLOSE_TOO_SLOW = 4408
+
+
+class Subscription:
+    """One subscriber's bounded queue, bound to the event loop that reads it."""
+
+    max_pending = 100
+
+    def __init__(self, conversation_id, loop):
+        self.conversation_id = conversation_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.overflowed = False
+
+    def _put(self, payload):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # Slow consumer: wake the reader so it can drop the connection.
+            self.overflowed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    def deliver(self, payload):
+        """Thread-safe enqueue of an already-encoded payload."""
+        self.loop.call_soon_threadsafe(self._put, payload)
+
+
+class InProcessBroker:
+    """Conversation id -> subscriptions, for a single worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def subscribe(self, conversation_id):
+        subscription = Subscription(str(conversation_id), asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(subscription.conversation_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.conversation_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.conversation_id]
+
+    def subscriber_count(self, conversation_id=None):
+        with self._lock:
+            if conversation_id is not None:
+                return len(self._subscriptions.get(str(conversation_id), ()))
+            return sum(len(s) for s in self._subscriptions.values())
+
+    def publish(self, conversation_id, payload):
+        """Fan `payload` (a JSON string) out to local subscribers."""
+        with self._lock:
+            subscribers = list(self._subscriptions.get(str(conversation_id), ()))
+        for subscription in subscribers:
+            subscription.deliver(payload)
+        return len(subscribers)
+
+
+class TCPBroker(InProcessBroker):
+    """
+    Relays publishes through a `manage.py realtime_broker` process so that
+    subscribers on every worker receive them. Wire format: one JSON object
+    per line, {"conversation_id": ..., "payload": ...}.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or "127.0.0.1", parsed.port or 8765)
+        self._local = threading.local()
+        self._reader_started = False
+
+    def _publisher_socket(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.create_connection(self.address, timeout=2)
+            self._local.sock = sock
+        return sock
+
+    def publish(self, conversation_id, payload):
+        line = json.dumps({"conversation_id": str(conversation_id), "payload": payload}) + "\n"
+        try:
+            self._publisher_socket().sendall(line.encode("utf-8"))
+        except OSError:
+            # Reconnect once; the broker may have restarted.
+            self._local.sock = None
+            self._publisher_socket().sendall(line.encode("utf-8"))
+
+    def subscribe(self, conversation_id):
+        subscription = super().subscribe(conversation_id)
+        if not self._reader_started:
+            self._reader_started = True
+            asyncio.get_running_loop().create_task(self._relay())
+        return subscription
+
+    async def _relay(self):
+        """Feed everything the broker process broadcasts to local subscribers."""
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(*self.address)
+                writer.write(b'{"subscribe": true}\n')
+                await writer.drain()
+                while line := await reader.readline():
+                    event = json.loads(line)
+                    InProcessBroker.publish(self, event["conversation_id"], event["payload"])
+            except (OSError, ValueError):
+                pass
+            await asyncio.sleep(1)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        url = getattr(settings, "CHATS_REALTIME_BROKER_URL", None)
+        _broker = TCPBroker(url) if url else InProcessBroker()
+    return _broker
+
+
+def uses_in_process_broker():
+    """True without CHATS_REALTIME_BROKER_URL: only this process's sockets get events."""
+    return not getattr(settings, "CHATS_REALTIME_BROKER_URL", None)
+
+
+def publish_message(message_data):
+    """Publish a serialized message to its conversation's subscribers."""
+    payload = json.dumps(
+        {"type": "message.created", "message": message_data},
+        cls=JSONEncoder,
+    )
+    return get_broker().publish(message_data["conversation"], payload)
+
+
+# --- ASGI websocket handling ---
+
+@sync_to_async
+def _authorize(token, conversation_id):
+    """Return (user, close_code); close_code is None when allowed."""
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+    from rest_framework.exceptions import AuthenticationFailed
+
+    from .authentication import CachedJWTAuthentication
+    from .membership import get_membership_cache
+
+    if not token:
+        return None, CLOSE_UNAUTHORIZED
+    auth = CachedJWTAuthentication()
+    try:
+        user = auth.get_user(auth.get_validated_token(token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None, CLOSE_UNAUTHORIZED
+    if not get_membership_cache().is_member(conversation_id, user.pk):
+        return user, CLOSE_FORBIDDEN
+    return user, None
+
+
+async def _still_allowed(user_id, conversation_id):
+    """Whether `user_id` is still an active member of `conversation_id`."""
+    from .authentication import get_user_auth_cache
+    from .db.replicas import use_primary
+    from .membership import get_membership_cache
+    from .models import User
+
+    if not await get_membership_cache().ais_member(conversation_id, user_id):
+        return False
+    cache = get_user_auth_cache()
+    # Only active users are cached, and user saves invalidate the entry
+    if await cache.aget(user_id) is not None:
+        return True
+    with use_primary():
+        user = await User.objects.filter(pk=user_id).afirst()
+    if user is None or not user.is_active:
+        return False
+    await cache.aset(user_id, user)
+    return True
+
+
+async def serve_subscription(conversation_id, receive, send, broker=None, user_id=None):
+    """
+    Stream broker events for `conversation_id` to an accepted socket, while
+    `user_id` (if given) may still read the conversation.
+    """
+    broker = broker or get_broker()
+    subscription = broker.subscribe(conversation_id)
+
+    async def pump():
+        while True:
+            payload = await subscription.queue.get()
+            if payload is None:
+                await send({"type": "websocket.close", "code": CLOSE_TOO_SLOW})
+                return
+            if user_id is not None and not await _still_allowed(user_id, conversation_id):
+                await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+                return
+            await send({"type": "websocket.send", "text": payload})
+
+    pump_task = asyncio.ensure_future(pump())
+    try:
+        while True:
+            event = await receive()
+            if event["type"] == "websocket.disconnect":
+                break
+            # Client frames are ignored (pings are handled by the server).
+    finally:
+        pump_task.cancel()
+        broker.unsubscribe(subscription)
+
+
+async def websocket_application(scope, receive, send):
+    match = SOCKET_PATH_RE.match(scope["path"])
+    event = await receive()
+    if event["type"] != "websocket.connect":
+        return
+    if match is None:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+
+    try:
+        conversation_id = uuid.UUID(match.group("conversation_id"))
+    except ValueError:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    token = (query.get("token") or [None])[0]
+    user, close_code = await _authorize(token, conversation_id)
+    if close_code is not None:
+        await send({"type": "websocket.close", "code": close_code})
+        return
+
+    await send({"type": "websocket.accept"})
+    await serve_subscription(conversation_id, receive, send, user_id=user.pk)
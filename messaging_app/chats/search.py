@@ -0,0 +1,215 @@
+# messaging_app/chats/search.py
+
+"""
+Pluggable full-text search for messages.
+
+Each backend keeps a side table `chats_message_search` of (message_id,
+conversation_id, body, sender text) in sync with `Message` (see
+chats.signals) and answers ranked searches scoped to the conversations a
+user participates in:
+
+- SQLiteFTS5Backend:      external-content FTS5 table `chats_message_fts`
+                          (maintained by triggers), ranked with bm25()
+- MySQLFulltextBackend:   FULLTEXT index on the side table, MATCH ... AGAINST
+- IContainsBackend:       no index; falls back to DRF's SearchFilter behaviour
+
+Only the best `max_results` hits of a search are ranked and returned;
+search_ranked() reports when more matched (MessageViewSet sends it as the
+X-Search-Truncated header). Sender names are part of every document, so a
+profile edit reindexes the sender's messages (tasks.reindex_senders).
+
+The backend is chosen from the default connection's vendor, or explicitly
+with the `CHATS_SEARCH_BACKEND` setting (dotted path).
+"""
+
+import re
+import uuid
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+from django.utils.module_loading import import_string
+
+INDEX_TABLE = "chats_message_search"
+FTS_TABLE = "chats_message_fts"
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+SENDER_FIELDS = ("username", "first_name", "last_name", "email")
+
+
+def sender_text(user):
+    return " ".join(filter(None, [getattr(user, field) for field in SENDER_FIELDS]))
+
+
+def document_for(message):
+    """(message_id, conversation_id, body, sender) row stored in the index."""
+    return (
+        message.message_id.hex,
+        uuid.UUID(str(message.conversation_id)).hex,
+        message.message_body,
+        sender_text(message.sender),
+    )
+
+
+class MessageSearchBackend:
+    """Interface shared by all search backends."""
+
+    # Upper bound on ranked hits returned by one search
+    max_results = 1000
+    uses_index = True
+
+    def index(self, message):
+        self.index_many([message])
+
+    def index_many(self, messages):
+        raise NotImplementedError
+
+    def remove(self, message):
+        self.remove_many([message.message_id])
+
+    def remove_many(self, message_ids):
+        ids = [uuid.UUID(str(message_id)).hex for message_id in message_ids]
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {INDEX_TABLE} WHERE message_id IN ({', '.join(['%s'] * len(ids))})", ids
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {INDEX_TABLE}")
+
+    def indexed_sender(self, message_id):
+        """Sender text stored for a message, or None if it is not indexed."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT sender FROM {INDEX_TABLE} WHERE message_id = %s", [uuid.UUID(str(message_id)).hex]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def ranked_ids(self, query, user):
+        """Return up to max_results + 1 message UUIDs matching `query`, best match first."""
+        raise NotImplementedError
+
+    def search(self, queryset, query, user):
+        """Restrict `queryset` to hits for `query`, ordered by relevance."""
+        return self.search_ranked(queryset, query, user)[0]
+
+    def search_ranked(self, queryset, query, user):
+        """search(), plus whether hits beyond `max_results` were dropped."""
+        ids = self.ranked_ids(query, user)
+        truncated = len(ids) > self.max_results
+        return self.rank(queryset, ids[:self.max_results]), truncated
+
+    def rank(self, queryset, ids):
+        if not ids:
+            return queryset.none()
+        rank = Case(
+            *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by("search_rank")
+
+
+class SQLiteFTS5Backend(MessageSearchBackend):
+
+    def index_many(self, messages):
+        rows = [document_for(m) for m in messages]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            # Upsert so the FTS triggers see an UPDATE rather than a REPLACE.
+            cursor.executemany(
+                f"INSERT INTO {INDEX_TABLE} (message_id, conversation_id, body, sender) "
+                "VALUES (%s, %s, %s, %s) "
+                "ON CONFLICT (message_id) DO UPDATE SET "
+                "conversation_id = excluded.conversation_id, body = excluded.body, sender = excluded.sender",
+                rows,
+            )
+
+    @staticmethod
+    def match_expression(query):
+        # Quote every term so user input can never be parsed as FTS5 syntax.
+        return " ".join('"%s"' % term for term in TERM_RE.findall(query))
+
+    def ranked_ids(self, query, user):
+        match = self.match_expression(query)
+        if not match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT s.message_id FROM {FTS_TABLE} "
+                f"JOIN {INDEX_TABLE} s ON s.id = {FTS_TABLE}.rowid "
+                "JOIN chats_conversationparticipant p "
+                "  ON p.conversation_id = s.conversation_id AND p.user_id = %s "
+                f"WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}) LIMIT %s",
+                [user.pk.hex, match, self.max_results + 1],
+            )
+            return [uuid.UUID(row[0]) for row in cursor.fetchall()]
+
+
+class MySQLFulltextBackend(MessageSearchBackend):
+
+    def index_many(self, messages):
+        rows = [document_for(m) for m in messages]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"REPLACE INTO {INDEX_TABLE} (message_id, conversation_id, body, sender) "
+                "VALUES (%s, %s, %s, %s)",
+                rows,
+            )
+
+    def ranked_ids(self, query, user):
+        terms = " ".join(TERM_RE.findall(query))
+        if not terms:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT f.message_id, MATCH(f.body, f.sender) AGAINST (%s IN NATURAL LANGUAGE MODE) AS score "
+                f"FROM {INDEX_TABLE} f "
+                "JOIN chats_conversationparticipant p "
+                "  ON p.conversation_id = f.conversation_id AND p.user_id = %s "
+                "WHERE MATCH(f.body, f.sender) AGAINST (%s IN NATURAL LANGUAGE MODE) "
+                "ORDER BY score DESC LIMIT %s",
+                [terms, user.pk.hex, terms, self.max_results + 1],
+            )
+            return [uuid.UUID(row[0]) for row in cursor.fetchall()]
+
+
+class IContainsBackend(MessageSearchBackend):
+    """No side index; MessageSearchFilter defers to DRF's SearchFilter."""
+
+    uses_index = False
+
+    def index_many(self, messages):
+        pass
+
+    def remove_many(self, message_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def indexed_sender(self, message_id):
+        return None
+
+
+VENDOR_BACKENDS = {
+    "sqlite": SQLiteFTS5Backend,
+    "mysql": MySQLFulltextBackend,
+}
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, "CHATS_SEARCH_BACKEND", None)
+        backend_class = import_string(path) if path else VENDOR_BACKENDS.get(connection.vendor, IContainsBackend)
+        _backend = backend_class()
+    return _backend
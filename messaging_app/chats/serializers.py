@@ -1,7 +1,42 @@
 # messaging_app/chats/serializers.py
 
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from .models import User, Conversation, Message
+from rest_framework.relations import MANY_RELATION_KWARGS
+from .conversations import create_conversation
+from .models import User, Conversation, ConversationParticipant, Message
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """ManyRelatedField resolving all primary keys with one query (not one each)."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+        child = self.child_relation
+        queryset = child.get_queryset()
+        pks = []
+        for value in data:
+            try:
+                pks.append(queryset.model._meta.pk.to_python(value))
+            except (DjangoValidationError, TypeError, ValueError):
+                child.fail("incorrect_type", data_type=type(value).__name__)
+        found = queryset.in_bulk(pks)
+        for pk in pks:
+            if pk not in found:
+                child.fail("does_not_exist", pk_value=pk)
+        return [found[pk] for pk in dict.fromkeys(pks)]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        list_kwargs.update((key, value) for key, value in kwargs.items() if key in MANY_RELATION_KWARGS)
+        return BulkManyRelatedField(**list_kwargs)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -59,22 +94,57 @@ class MessageSerializer(serializers.ModelSerializer):
         return value
 
 
+class ReadCursorSerializer(serializers.ModelSerializer):
+    # Input: optional message to read up to (default: latest)
+    message_id = serializers.UUIDField(write_only=True, required=False, allow_null=True)
+
+    class Meta:
+        model = ConversationParticipant
+        fields = [
+            "conversation_id",
+            "message_id",
+            "last_read_message_id",
+            "last_read_at",
+            "unread_count",
+        ]
+        read_only_fields = ["conversation_id", "last_read_message_id", "last_read_at", "unread_count"]
+
+
+class MessageBulkItemSerializer(serializers.Serializer):
+    """
+    One item of a bulk create. Plain UUID fields: existence and membership
+    are checked for the whole batch at once by MessageViewSet.bulk_create.
+    """
+    conversation_id = serializers.UUIDField()
+    sender_id = serializers.UUIDField(required=False, allow_null=True)
+    message_body = serializers.CharField()
+
+    def validate_message_body(self, value: str) -> str:
+        if value is None or not value.strip():
+            raise serializers.ValidationError("message_body cannot be empty.")
+        return value
+
+
 class ConversationSerializer(serializers.ModelSerializer):
-    # Read: nested participants and messages
+    # Read: nested participants and the latest messages (bounded, see
+    # ConversationViewSet.messages_limit)
     participants = UserSerializer(many=True, read_only=True)
-    messages = MessageSerializer(many=True, read_only=True)
+    messages = serializers.SerializerMethodField()
 
-    # Write: accept list of participant UUIDs
-    participants_ids = serializers.PrimaryKeyRelatedField(
+    # Write: accept list of participant UUIDs (looked up with one query)
+    participants_ids = BulkPrimaryKeyRelatedField(
         many=True,
         write_only=True,
         source="participants",
         queryset=User.objects.all(),
     )
 
-    # Extra computed fields via SerializerMethodField()
-    messages_count = serializers.SerializerMethodField()
-    last_message_preview = serializers.SerializerMethodField()
+    # Denormalized summary columns (see chats.summaries) -- no extra queries
+    messages_count = serializers.IntegerField(read_only=True)
+    last_message_preview = serializers.CharField(read_only=True)
+    last_message_at = serializers.DateTimeField(read_only=True)
+    # Requesting user's maintained counter (annotated by ConversationViewSet)
+    unread_count = serializers.IntegerField(read_only=True, default=0)
 
     class Meta:
         model = Conversation
@@ -85,25 +155,37 @@ class ConversationSerializer(serializers.ModelSerializer):
             "messages",
             "messages_count",
             "last_message_preview",
+            "last_message_at",
+            "unread_count",
+            "created_at",
+        ]
+        read_only_fields = [
+            "conversation_id",
             "created_at",
+            "participants",
+            "messages",
+            "messages_count",
+            "last_message_preview",
+            "last_message_at",
+            "unread_count",
         ]
-        read_only_fields = ["conversation_id", "created_at", "participants", "messages", "messages_count", "last_message_preview"]
 
     # Global object-level validation to ensure at least two participants
     def validate(self, attrs):
         participants = attrs.get("participants", [])
         # If creating, attrs will include the write-only mapped list
         if self.instance is None:
+            # find-or-create counts the caller, who is always added
+            caller = self.context.get("add_caller")
+            if caller is not None:
+                participants = {user.pk for user in participants} | {caller.pk}
             if not participants or len(participants) < 2:
                 raise serializers.ValidationError("A conversation requires at least two participants.")
         return attrs
 
     def create(self, validated_data):
-        participants = validated_data.pop("participants", [])
-        conversation = Conversation.objects.create(**validated_data)
-        if participants:
-            conversation.participants.set(participants)
-        return conversation
+        # Row, through-rows and participant key (chats.conversations)
+        return create_conversation(validated_data["participants"])
 
     def update(self, instance, validated_data):
         participants = validated_data.pop("participants", None)
@@ -114,13 +196,16 @@ class ConversationSerializer(serializers.ModelSerializer):
             instance.participants.set(participants)
         return instance
 
-    # ---- SerializerMethodField() resolvers ----
-    def get_messages_count(self, obj) -> int:
-        return obj.messages.count()
-
-    def get_last_message_preview(self, obj) -> str:
-        last = obj.messages.order_by("-sent_at").first()
-        if not last:
-            return ""
-        text = last.message_body or ""
-        return (text[:40] + "…") if len(text) > 40 else text
+    def get_messages(self, obj):
+        limit = self.context.get("messages_limit", 20)
+        messages = getattr(obj, "latest_messages", None)
+        if messages is None:
+            # Not prefetched (e.g. freshly created instance)
+            if not limit:
+                messages = []
+            else:
+                messages = list(
+                    obj.messages.select_related("sender").order_by("-sent_at", "-message_id")[:limit]
+                )
+                messages.reverse()
+        return MessageSerializer(messages, many=True, context=self.context).data
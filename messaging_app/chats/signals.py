@@ -0,0 +1,143 @@
+# messaging_app/chats/signals.py
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import inbox, jobs, participant_search, summaries
+from .authentication import get_user_auth_cache
+from .conversations import release_participant_keys
+from .membership import get_membership_cache
+from .models import Conversation, ConversationParticipant, Message, User
+from .search import SENDER_FIELDS
+from .tasks import INDEX_MESSAGES, REINDEX_SENDERS, UNINDEX_MESSAGES
+
+
+@receiver(post_save, sender=Message, dispatch_uid="chats.message_summary_on_save")
+def update_summary_on_message_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        summaries.message_created(instance)
+    else:
+        summaries.message_updated(instance)
+
+
+@receiver(post_delete, sender=Message, dispatch_uid="chats.message_summary_on_delete")
+def update_summary_on_message_delete(sender, instance, **kwargs):
+    summaries.message_deleted(instance)
+
+
+@receiver(post_save, sender=Message, dispatch_uid="chats.message_inbox_on_save")
+def update_inbox_on_message_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        inbox.messages_created([instance])
+    else:
+        inbox.refresh(instance.conversation_id, last_message_id=instance.pk)
+
+
+@receiver(post_delete, sender=Message, dispatch_uid="chats.message_inbox_on_delete")
+def update_inbox_on_message_delete(sender, instance, **kwargs):
+    # After the summary handler recomputed the last message
+    inbox.refresh(instance.conversation_id)
+
+
+# Search indexing is write-behind: the write path only enqueues (chats.jobs)
+@receiver(post_save, sender=Message, dispatch_uid="chats.message_search_on_save")
+def update_search_index_on_message_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        jobs.enqueue(INDEX_MESSAGES, {"message_ids": [instance.pk]})
+
+
+@receiver(post_delete, sender=Message, dispatch_uid="chats.message_search_on_delete")
+def update_search_index_on_message_delete(sender, instance, **kwargs):
+    jobs.enqueue(UNINDEX_MESSAGES, {"message_ids": [instance.pk]})
+
+
+@receiver(post_save, sender=ConversationParticipant, dispatch_uid="chats.membership_on_save")
+@receiver(post_delete, sender=ConversationParticipant, dispatch_uid="chats.membership_on_delete")
+def invalidate_membership_on_participant_change(sender, instance, created=True, raw=False, **kwargs):
+    get_membership_cache().invalidate([instance.conversation_id], [instance.user_id])
+    summaries.bump_versions([instance.conversation_id])
+    if created and not raw:
+        # Joined or left (post_delete passes no `created`)
+        release_participant_keys([instance.conversation_id])
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through, dispatch_uid="chats.membership_on_m2m")
+def invalidate_membership_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # .add()/.set()/.remove() bulk-write the through table without post_save
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if action == "pre_clear":
+        field = "user_id" if reverse else "conversation_id"
+        other = "conversation_id" if reverse else "user_id"
+        pk_set = set(
+            ConversationParticipant.objects.filter(**{field: instance.pk}).values_list(other, flat=True)
+        )
+    if reverse:
+        conversation_ids, user_ids = pk_set or (), [instance.pk]
+    else:
+        conversation_ids, user_ids = [instance.pk], pk_set or ()
+    get_membership_cache().invalidate(conversation_ids, user_ids)
+    summaries.bump_versions(conversation_ids)
+    if pk_set:
+        release_participant_keys(conversation_ids)
+    if action == "post_add":
+        inbox.add_memberships((c, u) for c in conversation_ids for u in user_ids)
+        if reverse:
+            participant_search.index_memberships((c, instance) for c in conversation_ids)
+        else:
+            users = User.objects.filter(pk__in=user_ids).only(*participant_search.SEARCH_FIELDS)
+            participant_search.index_memberships((instance.pk, u) for u in users)
+    else:
+        inbox.remove_memberships(conversation_ids, user_ids)
+        participant_search.remove_memberships(conversation_ids, user_ids)
+
+
+@receiver(post_save, sender=ConversationParticipant, dispatch_uid="chats.participant_search_on_save")
+def index_participant_on_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        participant_search.index_memberships([(instance.conversation_id, instance.user)])
+
+
+@receiver(post_delete, sender=ConversationParticipant, dispatch_uid="chats.participant_search_on_delete")
+def unindex_participant_on_delete(sender, instance, **kwargs):
+    participant_search.remove_memberships([instance.conversation_id], [instance.user_id])
+
+
+@receiver(post_save, sender=ConversationParticipant, dispatch_uid="chats.inbox_on_participant_save")
+def add_inbox_entry_on_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        inbox.add_memberships([(instance.conversation_id, instance.user_id)])
+
+
+@receiver(post_delete, sender=ConversationParticipant, dispatch_uid="chats.inbox_on_participant_delete")
+def remove_inbox_entry_on_delete(sender, instance, **kwargs):
+    inbox.remove_memberships([instance.conversation_id], [instance.user_id])
+
+
+@receiver(post_save, sender=User, dispatch_uid="chats.participant_search_on_user_save")
+def reindex_participant_on_user_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if created or raw:
+        return  # no memberships yet
+    if update_fields is not None and not set(update_fields) & set(participant_search.SEARCH_FIELDS):
+        return  # e.g. last_login
+    participant_search.reindex_user(instance)
+
+
+@receiver(post_save, sender=User, dispatch_uid="chats.message_search_on_user_save")
+def reindex_sender_on_user_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if created or raw:
+        return  # no messages yet
+    if update_fields is not None and not set(update_fields) & set(SENDER_FIELDS):
+        return
+    jobs.enqueue(REINDEX_SENDERS, {"user_id": instance.pk})
+
+
+@receiver(post_save, sender=User, dispatch_uid="chats.auth_cache_on_user_save")
+@receiver(post_delete, sender=User, dispatch_uid="chats.auth_cache_on_user_delete")
+def invalidate_auth_cache_on_user_change(sender, instance, **kwargs):
+    # Covers profile edits, deactivation and set_password() + save()
+    get_user_auth_cache().invalidate(instance.pk)
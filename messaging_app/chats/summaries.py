@@ -0,0 +1,236 @@
+# messaging_app/chats/summaries.py
+
+"""
+Maintenance of the denormalized message summary stored on `Conversation`
+(messages_count, last_message_id/preview/at, last_sender) and of the
+per-participant unread counters on `ConversationParticipant`.
+
+Archived messages (chats.archive) still count: recomputations read both
+`Message` and `ArchivedMessage`.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import ArchivedMessage, Conversation, ConversationParticipant, Message, make_preview
+
+# Hot and cold tiers of the message history
+MESSAGE_MODELS = (Message, ArchivedMessage)
+
+
+def _last_message_fields(message):
+    if message is None:
+        return {
+            "last_message_id": None,
+            "last_message_preview": "",
+            "last_message_at": None,
+            "last_sender_id": None,
+        }
+    return {
+        "last_message_id": message.message_id,
+        "last_message_preview": make_preview(message.message_body),
+        "last_message_at": message.sent_at,
+        "last_sender_id": message.sender_id,
+    }
+
+
+def _cursor_before(message):
+    """Q for participants whose read cursor is before `message`."""
+    return (
+        Q(last_read_at__isnull=True, joined_at__lte=message.sent_at)
+        | Q(last_read_at__lt=message.sent_at)
+        | Q(last_read_at=message.sent_at, last_read_message_id__lt=message.message_id)
+    )
+
+
+def latest_message(conversation_id, exclude=None):
+    """The conversation's last message, hot or archived (`exclude`: a pk to skip)."""
+    candidates = []
+    for model in MESSAGE_MODELS:
+        messages = model.objects.filter(conversation_id=conversation_id)
+        if exclude is not None:
+            messages = messages.exclude(pk=exclude)
+        candidates.append(messages.order_by("-sent_at", "-message_id").first())
+    candidates = [message for message in candidates if message is not None]
+    return max(candidates, key=lambda message: (message.sent_at, message.message_id), default=None)
+
+
+def message_created(message):
+    """Account for a newly inserted message."""
+    messages_created([message])
+
+
+def messages_created(messages):
+    """
+    Account for newly inserted messages (e.g. from bulk_create, which sends no
+    signals): two UPDATEs per affected conversation for the summary, plus one
+    for the unread counters and one per distinct sender in the batch.
+    """
+    per_conversation = {}
+    per_sender = {}
+    for message in messages:
+        count, latest = per_conversation.get(message.conversation_id, (0, None))
+        if latest is None or (message.sent_at, message.message_id) > (latest.sent_at, latest.message_id):
+            latest = message
+        per_conversation[message.conversation_id] = (count + 1, latest)
+        key = (message.conversation_id, message.sender_id)
+        per_sender[key] = per_sender.get(key, 0) + 1
+
+    with transaction.atomic():
+        for conversation_id, (count, latest) in per_conversation.items():
+            ConversationParticipant.objects.filter(conversation_id=conversation_id).update(
+                unread_count=F("unread_count") + count
+            )
+            conversations = Conversation.objects.filter(pk=conversation_id)
+            conversations.update(
+                messages_count=F("messages_count") + count,
+                version=F("version") + 1,
+            )
+            # Only move the "last message" pointer forward.
+            conversations.filter(
+                Q(last_message_at__isnull=True) | Q(last_message_at__lte=latest.sent_at)
+            ).update(**_last_message_fields(latest))
+        # Own messages are never unread for their sender
+        for (conversation_id, sender_id), count in per_sender.items():
+            ConversationParticipant.objects.filter(
+                conversation_id=conversation_id, user_id=sender_id
+            ).update(unread_count=Greatest(F("unread_count") - count, 0))
+
+
+def message_updated(message):
+    """Account for an edited message (its preview may be the last one)."""
+    with transaction.atomic():
+        conversations = Conversation.objects.filter(pk=message.conversation_id)
+        conversations.update(version=F("version") + 1)
+        conversations.filter(last_message_id=message.message_id).update(
+            last_message_preview=make_preview(message.message_body)
+        )
+
+
+def message_deleted(message):
+    """Account for a deleted message, recomputing the last message if needed."""
+    with transaction.atomic():
+        conversation = (
+            Conversation.objects.select_for_update()
+            .filter(pk=message.conversation_id)
+            .only("pk", "last_message_id")
+            .first()
+        )
+        if conversation is None:
+            # Conversation itself is being deleted (cascade).
+            return
+        fields = {
+            "messages_count": Greatest(F("messages_count") - 1, 0),
+            "version": F("version") + 1,
+        }
+        if conversation.last_message_id == message.message_id:
+            fields.update(_last_message_fields(latest_message(message.conversation_id, exclude=message.pk)))
+        Conversation.objects.filter(pk=conversation.pk).update(**fields)
+        ConversationParticipant.objects.filter(
+            _cursor_before(message), conversation_id=message.conversation_id
+        ).exclude(user_id=message.sender_id).update(
+            unread_count=Greatest(F("unread_count") - 1, 0)
+        )
+
+
+def unread_count_for(participant):
+    """COUNT of messages from others after the participant's read cursor."""
+    if participant.last_read_at is None:
+        after = Q(sent_at__gte=participant.joined_at)
+    else:
+        after = Q(sent_at__gt=participant.last_read_at) | Q(
+            sent_at=participant.last_read_at, message_id__gt=participant.last_read_message_id
+        )
+    return sum(
+        model.objects.filter(after, conversation_id=participant.conversation_id)
+        .exclude(sender_id=participant.user_id)
+        .count()
+        for model in MESSAGE_MODELS
+    )
+
+
+def mark_read(participant, message=None):
+    """
+    Advance `participant`'s read cursor to `message` (default: the latest
+    message). The cursor never moves backwards. Returns the participant.
+    """
+    with transaction.atomic():
+        participant = ConversationParticipant.objects.select_for_update().get(pk=participant.pk)
+        if message is None:
+            message = latest_message(participant.conversation_id)
+            if message is None:
+                return participant
+        if participant.last_read_at is not None and (
+            (message.sent_at, message.message_id)
+            <= (participant.last_read_at, participant.last_read_message_id)
+        ):
+            return participant
+
+        participant.last_read_at = message.sent_at
+        participant.last_read_message_id = message.message_id
+        # Counting is only needed when reading up to an older message
+        latest = Conversation.objects.filter(pk=participant.conversation_id).values_list(
+            "last_message_id", flat=True
+        ).first()
+        participant.unread_count = 0 if latest == message.message_id else unread_count_for(participant)
+        # Queryset update: a save() would fire the membership signal handlers
+        ConversationParticipant.objects.filter(pk=participant.pk).update(
+            last_read_at=participant.last_read_at,
+            last_read_message_id=participant.last_read_message_id,
+            unread_count=participant.unread_count,
+        )
+        bump_versions([participant.conversation_id])
+    return participant
+
+
+def rebuild_summary(conversation_id):
+    """Recompute a conversation's summary from its messages."""
+    with transaction.atomic():
+        Conversation.objects.select_for_update().filter(pk=conversation_id).exists()
+        Conversation.objects.filter(pk=conversation_id).update(
+            messages_count=sum(
+                model.objects.filter(conversation_id=conversation_id).count() for model in MESSAGE_MODELS
+            ),
+            version=F("version") + 1,
+            **_last_message_fields(latest_message(conversation_id)),
+        )
+        for participant in ConversationParticipant.objects.filter(conversation_id=conversation_id):
+            ConversationParticipant.objects.filter(pk=participant.pk).update(
+                unread_count=unread_count_for(participant)
+            )
+
+
+def rebuild_all_summaries(batch_size=500):
+    """Recompute every conversation's summary; returns the number processed."""
+    processed = 0
+    ids = Conversation.objects.order_by().values_list("pk", flat=True)
+    for conversation_id in ids.iterator(chunk_size=batch_size):
+        rebuild_summary(conversation_id)
+        processed += 1
+    return processed
+
+
+def bump_versions(conversation_ids):
+    """Invalidate cached representations (ETags) of the given conversations."""
+    if conversation_ids:
+        Conversation.objects.filter(pk__in=conversation_ids).update(version=F("version") + 1)
+
+
+def _count_subquery(model):
+    counts = (
+        model.objects.filter(conversation_id=OuterRef("pk"))
+        .order_by()
+        .values("conversation_id")
+        .annotate(n=Count("pk"))
+        .values("n")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def stale_summaries():
+    """Conversations whose stored count disagrees with the messages tables."""
+    return (
+        Conversation.objects.annotate(actual_count=_count_subquery(Message) + _count_subquery(ArchivedMessage))
+        .exclude(messages_count=F("actual_count"))
+    )
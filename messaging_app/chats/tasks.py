@@ -0,0 +1,97 @@
+# messaging_app/chats/tasks.py
+
+"""
+Job-queue tasks (chats.jobs) for message side effects. The write paths
+enqueue these instead of doing the work inline:
+
+- chats.index_messages / chats.unindex_messages: message search index;
+- chats.reindex_senders: search documents of a user's messages after a
+  profile edit (sender names are indexed);
+- chats.publish_messages: WebSocket fan-out (chats.realtime); queued only
+  with a shared broker (CHATS_REALTIME_BROKER_URL), otherwise published on
+  commit by the web process that holds the subscribers;
+- chats.inbox_fan_out: inbox rows of large groups (chats.inbox).
+
+Tasks receive a batch of payloads and must be idempotent: a job may run
+again if its worker dies before acknowledging it.
+"""
+
+from django.utils.dateparse import parse_datetime
+
+from .inbox import fan_out_batched
+from .jobs import task
+from .models import Message, User
+from .realtime import publish_message, uses_in_process_broker
+from .search import get_search_backend, sender_text
+from .summaries import bump_versions
+
+INDEX_MESSAGES = "chats.index_messages"
+UNINDEX_MESSAGES = "chats.unindex_messages"
+REINDEX_SENDERS = "chats.reindex_senders"
+PUBLISH_MESSAGES = "chats.publish_messages"
+INBOX_FAN_OUT = "chats.inbox_fan_out"
+
+REINDEX_BATCH_SIZE = 1000
+
+
+@task(INDEX_MESSAGES)
+def index_messages(payloads):
+    # Indexes the current row; messages deleted meanwhile are skipped
+    ids = {message_id for payload in payloads for message_id in payload["message_ids"]}
+    messages = list(Message.objects.filter(pk__in=ids).select_related("sender"))
+    get_search_backend().index_many(messages)
+    # ?search= results changed: drop their ETags
+    bump_versions({message.conversation_id for message in messages})
+
+
+@task(UNINDEX_MESSAGES)
+def unindex_messages(payloads):
+    get_search_backend().remove_many(
+        {message_id for payload in payloads for message_id in payload["message_ids"]}
+    )
+
+
+@task(REINDEX_SENDERS)
+def reindex_senders(payloads):
+    backend = get_search_backend()
+    if not backend.uses_index:
+        return
+    for user in User.objects.filter(pk__in={payload["user_id"] for payload in payloads}):
+        messages = Message.objects.filter(sender=user).order_by("sent_at", "message_id")
+        latest = messages.last()
+        # Oldest first, so the newest row is written last: if it is current,
+        # the sender text did not change (or a previous run completed)
+        if latest is None or backend.indexed_sender(latest.pk) == sender_text(user):
+            continue
+        conversation_ids = set()
+        batch = []
+        for message in messages.iterator(chunk_size=REINDEX_BATCH_SIZE):
+            message.sender = user
+            batch.append(message)
+            if len(batch) == REINDEX_BATCH_SIZE:
+                backend.index_many(batch)
+                conversation_ids.update(m.conversation_id for m in batch)
+                batch = []
+        backend.index_many(batch)
+        conversation_ids.update(m.conversation_id for m in batch)
+        bump_versions(conversation_ids)
+
+
+@task(PUBLISH_MESSAGES, on_commit=True, in_process=uses_in_process_broker)
+def publish_messages(payloads):
+    for payload in payloads:
+        for message in payload["messages"]:
+            publish_message(message)
+
+
+@task(INBOX_FAN_OUT)
+def inbox_fan_out(payloads):
+    # Rows only move forward: replays and reordering are no-ops
+    moved = set()
+    for payload in payloads:
+        if fan_out_batched(
+            payload["conversation_id"], parse_datetime(payload["last_activity_at"]), payload["snippet"]
+        ):
+            moved.add(payload["conversation_id"])
+    # Members' conversation lists were reordered: drop their ETags
+    bump_versions(moved)
@@ -1,3 +1,1687 @@
-from django.test import TestCase
+# messaging_app/chats/tests.py
 
-# Create your tests here.
+import asyncio
+import json
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from asgiref.sync import SyncToAsync, async_to_sync, sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import export, instrumentation, jobs, participant_search, summaries, tasks
+from .conversations import participant_key
+from .archive import archive_cutoff, archive_messages
+from .authentication import (
+    CachedBasicAuthentication,
+    get_user_auth_cache,
+    get_verified_credentials_cache,
+)
+from .benchmarks import backdated_bulk_create
+from .db import replicas
+from .db.pool import ConnectionPool, PoolTimeout
+from .fastpath import compile_plan
+from .ids import uuid7, uuid7_time
+from .loadgen import SEED_PASSWORD, seed_dataset
+from .management.commands.realtime_broker import Command as BrokerCommand
+from .membership import get_membership_cache
+from .models import (
+    ArchivedMessage,
+    Conversation,
+    ConversationParticipant,
+    InboxEntry,
+    Job,
+    Message,
+    ParticipantSearchTerm,
+    User,
+)
+from .pagination import encode_cursor
+from .realtime import CLOSE_FORBIDDEN, get_broker, websocket_application
+from .search import get_search_backend
+from .serializers import MessageSerializer
+
+
+def make_user(username):
+    return User.objects.create_user(
+        username=username,
+        email=f"{username}@example.com",
+        password="pass12345",
+        first_name=username.title(),
+        last_name="Tester",
+    )
+
+
+def make_conversation(*users):
+    conversation = Conversation.objects.create()
+    conversation.participants.set(users)
+    return conversation
+
+
+class ConversationSummaryTests(TestCase):
+    """Denormalized message summary on Conversation."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.conversation = make_conversation(self.alice, self.bob)
+
+    def test_summary_tracks_create_and_delete(self):
+        first = Message.objects.create(
+            conversation=self.conversation, sender=self.alice, message_body="hello"
+        )
+        second = Message.objects.create(
+            conversation=self.conversation, sender=self.bob, message_body="x" * 50
+        )
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.messages_count, 2)
+        self.assertEqual(self.conversation.last_message_id, second.message_id)
+        self.assertEqual(self.conversation.last_message_preview, "x" * 40 + "…")
+        self.assertEqual(self.conversation.last_sender_id, self.bob.pk)
+
+        second.delete()
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.messages_count, 1)
+        self.assertEqual(self.conversation.last_message_id, first.message_id)
+        self.assertEqual(self.conversation.last_sender_id, self.alice.pk)
+
+        first.delete()
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.messages_count, 0)
+        self.assertIsNone(self.conversation.last_message_id)
+        self.assertEqual(self.conversation.last_message_preview, "")
+
+    def test_rebuild_command(self):
+        Message.objects.create(conversation=self.conversation, sender=self.alice, message_body="hi")
+        Conversation.objects.update(messages_count=0, last_message_id=None, last_message_preview="")
+        call_command("rebuild_conversation_summaries", stdout=StringIO())
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.messages_count, 1)
+        self.assertEqual(self.conversation.last_message_preview, "hi")
+
+    def test_list_query_count_is_constant(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        for _ in range(3):
+            convo = make_conversation(self.alice, self.bob)
+            Message.objects.create(conversation=convo, sender=self.bob, message_body="ping")
+
+        get_membership_cache().conversations(self.alice.pk)  # warm
+        with self.assertNumQueries(5):
+            # ETag versions, count, page, participants prefetch, messages prefetch
+            response = client.get("/api/conversations/")
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(results[0]["messages_count"], 1)
+        self.assertEqual(results[0]["last_message_preview"], "ping")
+
+
+class KeysetPaginationTests(TestCase):
+    """Cursor pagination for MessageViewSet."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.conversation = make_conversation(self.alice, self.bob)
+        self.messages = [
+            Message.objects.create(
+                conversation=self.conversation, sender=self.alice, message_body=f"m{i}"
+            )
+            for i in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def bodies(self, response):
+        return [row["message_body"] for row in response.json()["results"]]
+
+    def test_walk_older_then_newer(self):
+        first = self.client.get("/api/messages/", {"cursor": "", "page_size": 2})
+        self.assertEqual(self.bodies(first), ["m3", "m4"])
+
+        second = self.client.get(first.json()["older"])
+        self.assertEqual(self.bodies(second), ["m1", "m2"])
+        third = self.client.get(second.json()["older"])
+        self.assertEqual(self.bodies(third), ["m0"])
+        self.assertIsNone(third.json()["older"])
+
+        back = self.client.get(third.json()["newer"])
+        self.assertEqual(self.bodies(back), ["m1", "m2"])
+
+    def test_newest_page_links_newer_for_polling(self):
+        head = self.client.get("/api/messages/", {"cursor": "", "page_size": 2}).json()
+        self.assertIsNotNone(head["newer"])
+        poll = self.client.get(head["newer"]).json()
+        self.assertEqual(poll["results"], [])
+        # An empty poll keeps its position
+        self.assertEqual(poll["newer"], head["newer"])
+
+        Message.objects.create(conversation=self.conversation, sender=self.bob, message_body="m5")
+        poll = self.client.get(poll["newer"])
+        self.assertEqual(self.bodies(poll), ["m5"])
+        self.assertEqual(self.bodies(self.client.get(poll.json()["newer"])), [])
+
+    def test_no_count_query(self):
+        response = self.client.get("/api/messages/", {"cursor": ""})
+        older = response.json()["older"]
+        self.assertIsNone(older)
+        with self.assertNumQueries(2):
+            # ETag versions + one keyset page
+            self.client.get("/api/messages/", {"cursor": "", "page_size": 2})
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/messages/", {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_mode_is_default(self):
+        response = self.client.get("/api/messages/")
+        self.assertEqual(response.json()["count"], 5)
+
+
+class LatestMessagesPrefetchTests(TestCase):
+    """Conversation responses embed only the latest N messages."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        for c in range(3):
+            convo = make_conversation(self.alice, self.bob)
+            for i in range(4):
+                Message.objects.create(conversation=convo, sender=self.bob, message_body=f"c{c}m{i}")
+
+    def test_limit_is_applied_per_conversation(self):
+        get_membership_cache().conversations(self.alice.pk)  # warm
+        with self.assertNumQueries(5):
+            response = self.client.get("/api/conversations/", {"messages_limit": 2})
+        for row in response.json()["results"]:
+            bodies = [m["message_body"] for m in row["messages"]]
+            self.assertEqual(len(bodies), 2)
+            self.assertTrue(bodies[0].endswith("m2") and bodies[1].endswith("m3"))
+            self.assertEqual(row["messages_count"], 4)
+
+    def test_zero_limit_skips_messages_query(self):
+        get_membership_cache().conversations(self.alice.pk)  # warm
+        with self.assertNumQueries(4):
+            response = self.client.get("/api/conversations/", {"messages_limit": 0})
+        self.assertEqual(response.json()["results"][0]["messages"], [])
+
+
+class MessageSearchTests(TestCase):
+    """Full-text message search (SQLite FTS5 backend under tests)."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.carol = make_user("carol")
+        self.ours = make_conversation(self.alice, self.bob)
+        self.theirs = make_conversation(self.bob, self.carol)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def search(self, text):
+        response = self.client.get("/api/messages/", {"search": text})
+        return [row["message_body"] for row in response.json()["results"]]
+
+    def test_ranked_and_scoped(self):
+        Message.objects.create(conversation=self.ours, sender=self.bob, message_body="lunch later?")
+        Message.objects.create(
+            conversation=self.ours, sender=self.bob, message_body="lunch lunch lunch, seriously"
+        )
+        Message.objects.create(conversation=self.theirs, sender=self.carol, message_body="lunch secret")
+        self.assertEqual(self.search("lunch"), ["lunch lunch lunch, seriously", "lunch later?"])
+
+    def test_index_follows_update_and_delete(self):
+        message = Message.objects.create(conversation=self.ours, sender=self.bob, message_body="draft")
+        message.message_body = "final"
+        message.save()
+        self.assertEqual(self.search("draft"), [])
+        self.assertEqual(self.search("final"), ["final"])
+        message.delete()
+        self.assertEqual(self.search("final"), [])
+
+    def test_sender_names_and_syntax_are_safe(self):
+        Message.objects.create(conversation=self.ours, sender=self.bob, message_body="hi")
+        self.assertEqual(self.search("Bob"), ["hi"])
+        self.assertEqual(self.search('"AND OR *('), [])
+
+    def test_sender_profile_edits_are_reindexed(self):
+        Message.objects.create(conversation=self.ours, sender=self.bob, message_body="hi")
+        Message.objects.create(conversation=self.ours, sender=self.bob, message_body="again")
+        Message.objects.create(conversation=self.ours, sender=self.alice, message_body="mine")
+        self.assertEqual(self.search("Roberto"), [])
+        etag = self.client.get("/api/messages/", {"search": "Roberto"})["ETag"]
+
+        self.bob.first_name = "Roberto"
+        with patch.object(tasks, "REINDEX_BATCH_SIZE", 1):
+            self.bob.save()
+        self.assertEqual(sorted(self.search("Roberto")), ["again", "hi"])
+        self.assertNotEqual(self.client.get("/api/messages/", {"search": "Roberto"})["ETag"], etag)
+        # Unchanged sender text: user, newest message, its document; no writes
+        with self.assertNumQueries(3):
+            tasks.reindex_senders([{"user_id": self.bob.pk}])
+        with patch.object(jobs, "enqueue") as enqueue:
+            self.bob.save(update_fields=["last_login"])
+        enqueue.assert_not_called()
+
+    def test_truncated_results_are_flagged(self):
+        for n in range(3):
+            Message.objects.create(conversation=self.ours, sender=self.bob, message_body=f"lunch {n}")
+        backend = get_search_backend()
+        with patch.object(backend, "max_results", 2):
+            response = self.client.get("/api/messages/", {"search": "lunch"})
+            self.assertEqual(response.json()["count"], 2)
+            self.assertEqual(response["X-Search-Truncated"], "2")
+        with patch.object(backend, "max_results", 3):
+            self.assertNotIn("X-Search-Truncated", self.client.get("/api/messages/", {"search": "lunch"}))
+
+    def test_rebuild_command(self):
+        Message.objects.create(conversation=self.ours, sender=self.bob, message_body="rebuilt")
+        get_search_backend().clear()
+        self.assertEqual(self.search("rebuilt"), [])
+        call_command("rebuild_message_search_index", stdout=StringIO())
+        self.assertEqual(self.search("rebuilt"), ["rebuilt"])
+
+
+class RealtimeFanOutTests(TestCase):
+    """WebSocket subscriptions served by chats.realtime."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.carol = make_user("carol")
+        self.conversation = make_conversation(self.alice, self.bob)
+
+    def connect(self, user, conversation_id=None):
+        """Open a socket; returns (task, events sent by the server, inbound queue)."""
+        conversation_id = conversation_id or self.conversation.conversation_id
+        token = str(AccessToken.for_user(user))
+        scope = {
+            "type": "websocket",
+            "path": f"/ws/conversations/{conversation_id}/",
+            "query_string": f"token={token}".encode(),
+        }
+        inbound = asyncio.Queue()
+        inbound.put_nowait({"type": "websocket.connect"})
+        sent = []
+
+        async def send(event):
+            sent.append(event)
+
+        task = asyncio.ensure_future(websocket_application(scope, inbound.get, send))
+        return task, sent, inbound
+
+    def test_new_message_is_pushed_to_participants(self):
+        api = APIClient()
+        api.force_authenticate(self.bob)
+
+        async def scenario():
+            task, sent, inbound = self.connect(self.alice)
+            while not sent:
+                await asyncio.sleep(0.01)
+            self.assertEqual(sent[0]["type"], "websocket.accept")
+
+            def post():
+                with self.captureOnCommitCallbacks(execute=True):
+                    return api.post("/api/messages/", {
+                        "conversation_id": str(self.conversation.conversation_id),
+                        "message_body": "live!",
+                    })
+
+            response = await sync_to_async(post)()
+            self.assertEqual(response.status_code, 201)
+            while len(sent) < 2:
+                await asyncio.sleep(0.01)
+            inbound.put_nowait({"type": "websocket.disconnect"})
+            await task
+            return json.loads(sent[1]["text"])
+
+        event = async_to_sync(scenario)()
+        self.assertEqual(event["type"], "message.created")
+        self.assertEqual(event["message"]["message_body"], "live!")
+        self.assertEqual(get_broker().subscriber_count(), 0)
+
+    def test_removed_or_deactivated_subscribers_are_closed(self):
+        api = APIClient()
+        api.force_authenticate(self.bob)
+        dave = make_user("dave")
+        self.conversation.participants.add(self.carol, dave)
+
+        async def scenario():
+            sockets = {user: self.connect(user) for user in (self.alice, self.carol, dave)}
+            while not all(sent for _, sent, _ in sockets.values()):
+                await asyncio.sleep(0.01)
+
+            def change_and_post():
+                self.conversation.participants.remove(self.carol)
+                dave.is_active = False
+                dave.save()
+                with self.captureOnCommitCallbacks(execute=True):
+                    return api.post("/api/messages/", {
+                        "conversation_id": str(self.conversation.conversation_id),
+                        "message_body": "members only",
+                    })
+
+            self.assertEqual((await sync_to_async(change_and_post)()).status_code, 201)
+            while not all(len(sent) > 1 for _, sent, _ in sockets.values()):
+                await asyncio.sleep(0.01)
+            for task, _, inbound in sockets.values():
+                inbound.put_nowait({"type": "websocket.disconnect"})
+                await task
+            return {user.username: sent[1] for user, (_, sent, _) in sockets.items()}
+
+        events = async_to_sync(scenario)()
+        self.assertEqual(json.loads(events["alice"]["text"])["message"]["message_body"], "members only")
+        self.assertEqual(events["carol"], {"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+        self.assertEqual(events["dave"], {"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+
+    def test_broker_drops_subscribers_that_fall_behind(self):
+        async def scenario():
+            server = await BrokerCommand.start_server("127.0.0.1", 0, max_buffer=64 * 1024)
+            port = server.sockets[0].getsockname()[1]
+            slow_reader, slow = await asyncio.open_connection("127.0.0.1", port)
+            slow.write(b'{"subscribe": true}\n')
+            await slow.drain()
+            _, publisher = await asyncio.open_connection("127.0.0.1", port)
+            await asyncio.sleep(0.05)
+            line = b'{"payload": "' + b"x" * 32 * 1024 + b'"}\n'
+            for _ in range(400):  # never read by the subscriber
+                publisher.write(line)
+                await publisher.drain()
+            # Dropped: the broker closed its end instead of buffering everything
+            while await slow_reader.read(1 << 20):
+                pass
+            for writer in (slow, publisher):
+                writer.close()
+                await writer.wait_closed()
+            await asyncio.sleep(0.05)  # let the broker's handlers see EOF
+            server.close()
+            await server.wait_closed()
+
+        async_to_sync(scenario)()
+
+    def test_non_participant_is_rejected(self):
+        async def scenario():
+            task, sent, _ = self.connect(self.carol)
+            await task
+            return sent
+
+        sent = async_to_sync(scenario)()
+        self.assertEqual(sent, [{"type": "websocket.close", "code": CLOSE_FORBIDDEN}])
+
+
+class BulkMessageCreateTests(TestCase):
+    """POST /api/messages/bulk/."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.carol = make_user("carol")
+        self.conversation = make_conversation(self.alice, self.bob)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_per_item_results_and_side_effects(self):
+        cid = str(self.conversation.conversation_id)
+        payload = [
+            {"conversation_id": cid, "message_body": "one"},
+            {"conversation_id": cid, "sender_id": str(self.carol.pk), "message_body": "intruder"},
+            {"conversation_id": cid, "message_body": "   "},
+            {"conversation_id": cid, "sender_id": str(self.bob.pk), "message_body": "two"},
+        ]
+        response = self.client.post("/api/messages/bulk/", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body["created"], body["failed"]), (2, 2))
+        self.assertEqual([r["status"] for r in body["results"]], [201, 400, 400, 201])
+        self.assertEqual(body["results"][3]["message"]["sender"]["username"], "bob")
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.messages_count, 2)
+        self.assertEqual(self.conversation.last_message_preview, "two")
+        self.assertEqual(len(get_search_backend().ranked_ids("two", self.alice)), 1)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        cid = str(self.conversation.conversation_id)
+        payload = [{"conversation_id": cid, "message_body": f"m{i}"} for i in range(50)]
+        with self.assertNumQueries(16):
+            # savepoints + membership, users, conversations, insert, 2 summary
+            # updates, 2 unread counter updates, the inbox fan-out, then the
+            # (eager) index job:
+            # one message load, the search upsert and the version bump
+            self.client.post("/api/messages/bulk/", payload, format="json")
+
+    def test_rejects_non_list(self):
+        response = self.client.post("/api/messages/bulk/", {"message_body": "x"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class MembershipCacheTests(TestCase):
+    """chats.membership cache and its invalidation."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.carol = make_user("carol")
+        self.conversation = make_conversation(self.alice, self.bob)
+        self.cache = get_membership_cache()
+
+    def test_cached_after_first_lookup(self):
+        self.assertTrue(self.cache.is_member(self.conversation.pk, self.alice.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.cache.is_member(self.conversation.pk, self.bob.pk))
+            self.assertFalse(self.cache.is_member(self.conversation.pk, self.carol.pk))
+
+    def test_invalidated_by_add_remove_and_through_rows(self):
+        self.assertFalse(self.cache.is_member(self.conversation.pk, self.carol.pk))
+        self.assertNotIn(self.conversation.pk, self.cache.conversations(self.carol.pk))
+
+        self.conversation.participants.add(self.carol)
+        self.assertTrue(self.cache.is_member(self.conversation.pk, self.carol.pk))
+        self.assertIn(self.conversation.pk, self.cache.conversations(self.carol.pk))
+
+        self.carol.conversations.remove(self.conversation)
+        self.assertFalse(self.cache.is_member(self.conversation.pk, self.carol.pk))
+
+        ConversationParticipant.objects.create(conversation=self.conversation, user=self.carol)
+        self.assertTrue(self.cache.is_member(self.conversation.pk, self.carol.pk))
+        ConversationParticipant.objects.filter(user=self.carol).get().delete()
+        self.assertFalse(self.cache.is_member(self.conversation.pk, self.carol.pk))
+
+        self.conversation.participants.clear()
+        self.assertEqual(self.cache.members(self.conversation.pk), frozenset())
+        self.assertNotIn(self.conversation.pk, self.cache.conversations(self.alice.pk))
+
+    def test_message_create_skips_participant_join(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        self.cache.members(self.conversation.pk)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post("/api/messages/", {
+                "conversation_id": str(self.conversation.conversation_id),
+                "message_body": "hi",
+            })
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(any(
+            q["sql"].startswith("SELECT") and "chats_conversationparticipant" in q["sql"]
+            for q in queries.captured_queries
+        ))
+
+
+class ConditionalGetTests(TestCase):
+    """ETag / If-None-Match driven by Conversation.version."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.carol = make_user("carol")
+        self.conversation = make_conversation(self.alice, self.bob)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        self.detail = f"/api/conversations/{self.conversation.conversation_id}/"
+
+    def revalidate(self, url):
+        etag = self.client.get(url)["ETag"]
+        return etag, self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_resources_return_304_cheaply(self):
+        for url in ("/api/conversations/", self.detail, f"{self.detail}messages/"):
+            etag, response = self.revalidate(url)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response["ETag"], etag)
+            with self.assertNumQueries(1):
+                self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_message_and_participant_changes_change_the_etag(self):
+        etag, _ = self.revalidate(self.detail)
+        message = Message.objects.create(conversation=self.conversation, sender=self.bob, message_body="new")
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        message.message_body = "edited"
+        message.save()
+        self.assertEqual(self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag, _ = self.revalidate("/api/conversations/")
+        self.conversation.participants.add(self.carol)
+        response = self.client.get("/api/conversations/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_is_per_query_string(self):
+        etag = self.client.get("/api/conversations/")["ETag"]
+        response = self.client.get("/api/conversations/?messages_limit=1", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class UnreadCountTests(TestCase):
+    """Per-participant read cursors and maintained unread counters."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.conversation = make_conversation(self.alice, self.bob)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def unread(self, user):
+        return ConversationParticipant.objects.get(conversation=self.conversation, user=user).unread_count
+
+    def send(self, sender, body):
+        return Message.objects.create(conversation=self.conversation, sender=sender, message_body=body)
+
+    def test_counters_follow_messages_and_cursor(self):
+        first = self.send(self.bob, "one")
+        self.send(self.bob, "two")
+        self.send(self.alice, "mine")
+        self.assertEqual((self.unread(self.alice), self.unread(self.bob)), (2, 1))
+
+        url = f"/api/conversations/{self.conversation.conversation_id}/read/"
+        response = self.client.post(url, {"message_id": str(first.message_id)}, format="json")
+        self.assertEqual(response.json()["unread_count"], 1)
+
+        # Never rewinds
+        self.client.post(url, {}, format="json")
+        response = self.client.post(url, {"message_id": str(first.message_id)}, format="json")
+        self.assertEqual(response.json()["unread_count"], 0)
+
+        late = self.send(self.bob, "three")
+        self.assertEqual(self.unread(self.alice), 1)
+        late.delete()
+        self.assertEqual(self.unread(self.alice), 0)
+        first.delete()  # already read: no change
+        self.assertEqual(self.unread(self.alice), 0)
+
+    def test_list_includes_unread_without_scanning_messages(self):
+        self.send(self.bob, "hi")
+        get_membership_cache().conversations(self.alice.pk)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/conversations/", {"messages_limit": 0})
+        self.assertEqual(response.json()["results"][0]["unread_count"], 1)
+        self.assertFalse(any('"chats_message"' in q["sql"] for q in queries.captured_queries))
+
+    def test_bulk_create_counts(self):
+        cid = str(self.conversation.conversation_id)
+        self.client.post("/api/messages/bulk/", [
+            {"conversation_id": cid, "message_body": "a"},
+            {"conversation_id": cid, "sender_id": str(self.bob.pk), "message_body": "b"},
+            {"conversation_id": cid, "sender_id": str(self.bob.pk), "message_body": "c"},
+        ], format="json")
+        self.assertEqual((self.unread(self.alice), self.unread(self.bob)), (2, 1))
+
+    def test_non_participant_cannot_mark_read(self):
+        carol = make_user("carol")
+        self.client.force_authenticate(carol)
+        url = f"/api/conversations/{self.conversation.conversation_id}/read/"
+        self.assertEqual(self.client.post(url, {}, format="json").status_code, 404)
+
+
+class ArchiveTests(TestCase):
+    """Moving old messages to ArchivedMessage and reading through to them."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.conversation = make_conversation(self.alice, self.bob)
+        now = timezone.now()
+        for i in range(6):
+            message = Message.objects.create(
+                conversation=self.conversation, sender=self.bob, message_body=f"m{i}"
+            )
+            # m0..m2 are two years old
+            age = timedelta(days=730 - i) if i < 3 else timedelta(minutes=6 - i)
+            Message.objects.filter(pk=message.pk).update(sent_at=now - age)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_archive_moves_old_rows_in_batches(self):
+        moved = archive_messages(archive_cutoff(365), batch_size=2)
+        self.assertEqual(moved, 3)
+        self.assertEqual(Message.objects.count(), 3)
+        self.assertEqual(ArchivedMessage.objects.count(), 3)
+        # A storage move, not a delete
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.messages_count, 6)
+        # The search index only covers hot messages
+        self.assertEqual(get_search_backend().ranked_ids("m0", self.alice), [])
+        self.assertEqual(len(get_search_backend().ranked_ids("m5", self.alice)), 1)
+
+    def test_archiving_invalidates_listing_etag(self):
+        before = self.client.get("/api/messages/")
+        archive_messages(archive_cutoff(365))
+        after = self.client.get("/api/messages/", HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(after.status_code, 200)
+
+    def test_page_number_listing_includes_archive(self):
+        archive_messages(archive_cutoff(365))
+        page = self.client.get("/api/messages/").json()
+        self.assertEqual(page["count"], 6)
+        self.assertEqual([row["message_body"] for row in page["results"]], [f"m{i}" for i in range(6)])
+
+        newest_first = {"ordering": "-sent_at", "page_size": 4}
+        first = self.client.get("/api/messages/", newest_first).json()
+        self.assertEqual([row["message_body"] for row in first["results"]], ["m5", "m4", "m3", "m2"])
+        second = self.client.get(first["next"]).json()
+        self.assertEqual([row["message_body"] for row in second["results"]], ["m1", "m0"])
+        self.assertEqual(second["count"], 6)
+
+    def test_summaries_count_archived_messages(self):
+        archive_messages(archive_cutoff(-1))
+        self.assertEqual(Message.objects.count(), 0)
+        self.assertFalse(summaries.stale_summaries().exists())
+        summaries.rebuild_summary(self.conversation.pk)
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.messages_count, 6)
+        self.assertEqual(self.conversation.last_message_preview, "m5")
+
+    def test_keyset_reads_fall_through_to_archive(self):
+        archive_messages(archive_cutoff(365))
+        bodies = []
+        url = "/api/messages/?cursor=&page_size=4"
+        while url:
+            page = self.client.get(url).json()
+            bodies = [row["message_body"] for row in page["results"]] + bodies
+            url = page["older"]
+        self.assertEqual(bodies, [f"m{i}" for i in range(6)])
+
+        oldest = ArchivedMessage.objects.order_by("sent_at").first()
+        page = self.client.get(
+            "/api/messages/", {"cursor": encode_cursor(oldest.sent_at, oldest.message_id, "n"), "page_size": 3}
+        ).json()
+        self.assertEqual([row["message_body"] for row in page["results"]], ["m1", "m2", "m3"])
+
+        response = self.client.get(f"/api/messages/{oldest.message_id}/")
+        self.assertEqual(response.json()["message_body"], "m0")
+
+
+class FastReadPathTests(TestCase):
+    """chats.fastpath renders exactly what MessageSerializer renders."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.bob.phone_number = "+254700000000"
+        self.bob.role = User.Role.HOST
+        self.bob.save()
+        self.conversation = make_conversation(self.alice, self.bob)
+        for i, sender in enumerate([self.alice, self.bob, self.alice]):
+            Message.objects.create(conversation=self.conversation, sender=sender, message_body=f"é {i}")
+
+    def test_output_is_byte_identical(self):
+        plan = compile_plan(MessageSerializer)
+        messages = Message.objects.select_related("conversation", "sender").order_by("sent_at")
+        expected = JSONRenderer().render(MessageSerializer(messages, many=True).data)
+        actual = JSONRenderer().render(plan.render_many(messages.values(*plan.lookups)))
+        self.assertEqual(actual, expected)
+
+    def test_endpoints_use_values_rows(self):
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        get_membership_cache().conversations(self.alice.pk)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get("/api/messages/")
+        self.assertEqual(len(response.json()["results"]), 3)
+        page_sql = queries.captured_queries[-1]["sql"]
+        self.assertNotIn('"chats_user"."password"', page_sql)
+
+        message = Message.objects.first()
+        response = client.get(f"/api/messages/{message.message_id}/")
+        self.assertEqual(response.json(), MessageSerializer(message).data)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """chats.authentication.CachedJWTAuthentication."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.alice)}")
+
+    def user_queries(self, url="/api/conversations/"):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return sum('FROM "chats_user"' in q["sql"] for q in queries.captured_queries)
+
+    def test_burst_costs_one_user_query(self):
+        self.assertEqual(self.user_queries(), 1)
+        self.assertEqual(self.user_queries(), 0)
+        self.assertEqual(self.user_queries(), 0)
+
+    def test_save_invalidates(self):
+        self.user_queries()
+        self.alice.first_name = "Alicia"
+        self.alice.save()
+        self.assertEqual(self.user_queries(), 1)
+
+    def test_deactivation_is_seen_immediately(self):
+        self.user_queries()
+        self.alice.is_active = False
+        self.alice.save()
+        self.assertEqual(self.client.get("/api/conversations/").status_code, 401)
+
+    def test_cached_user_is_a_copy(self):
+        self.user_queries()
+        cache = get_user_auth_cache()
+        first = cache.get(self.alice.pk)
+        first.first_name = "mutated"
+        self.assertEqual(cache.get(self.alice.pk).first_name, "Alice")
+
+
+class CachedBasicAuthenticationTests(TestCase):
+    """chats.authentication.CachedBasicAuthentication."""
+
+    def setUp(self):
+        # Process-level caches outlive the per-test transaction rollback
+        get_verified_credentials_cache().clear()
+        get_user_auth_cache().clear()
+        self.alice = make_user("alice")
+        self.auth = CachedBasicAuthentication()
+
+    def test_hashes_once_per_ttl(self):
+        with patch.object(User, "check_password", autospec=True, side_effect=User.check_password) as check:
+            for _ in range(3):
+                user, _ = self.auth.authenticate_credentials("alice", "pass12345")
+                self.assertEqual(user.pk, self.alice.pk)
+        self.assertEqual(check.call_count, 1)
+
+    def test_wrong_password_is_never_cached(self):
+        for _ in range(2):
+            with self.assertRaises(AuthenticationFailed):
+                self.auth.authenticate_credentials("alice", "wrong")
+
+    def test_password_change_invalidates(self):
+        self.auth.authenticate_credentials("alice", "pass12345")
+        self.alice.set_password("new-pass-999")
+        self.alice.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials("alice", "pass12345")
+        user, _ = self.auth.authenticate_credentials("alice", "new-pass-999")
+        self.assertEqual(user.pk, self.alice.pk)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+
+    def ping(self):
+        if not self.alive:
+            raise OSError("gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """chats.db.pool.ConnectionPool (driver-independent)."""
+
+    def make_pool(self, **kwargs):
+        options = {"max_size": 2, "checkout_timeout": 0.05}
+        options.update(kwargs)
+        return ConnectionPool(
+            connect=FakeConnection,
+            ping=lambda conn: conn.ping(),
+            reset=lambda conn: conn.rollback(),
+            **options,
+        )
+
+    def test_connections_are_reused_and_reset(self):
+        pool = self.make_pool()
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertIs(pool.checkout(), first)
+        self.assertEqual(first.rollbacks, 1)
+        stats = pool.stats()
+        self.assertEqual((stats["connections_created"], stats["checkouts"]), (1, 2))
+
+    def test_checkout_times_out_at_max_size(self):
+        pool = self.make_pool()
+        pool.checkout()
+        pool.checkout()
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+        stats = pool.stats()
+        self.assertEqual((stats["waits"], stats["timeouts"]), (1, 1))
+
+    def test_waiter_gets_returned_connection(self):
+        pool = self.make_pool(max_size=1, checkout_timeout=2)
+        held = pool.checkout()
+        timer = threading.Timer(0.05, pool.checkin, args=(held,))
+        timer.start()
+        self.assertIs(pool.checkout(), held)
+        timer.join()
+        self.assertEqual(pool.stats()["waits"], 1)
+
+    def test_dead_connections_are_replaced(self):
+        pool = self.make_pool()
+        conn = pool.checkout()
+        pool.checkin(conn)
+        conn.alive = False
+        replacement = pool.checkout()
+        self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()["failed_health_checks"], 1)
+
+    def test_max_lifetime_and_prefill(self):
+        pool = self.make_pool(min_size=2, max_lifetime=0)
+        pool.prefill()
+        self.assertEqual(pool.stats()["idle"], 2)
+        conn = pool.checkout()
+        self.assertEqual(pool.stats()["expired"], 2)
+        pool.checkin(conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()["size"], 0)
+
+
+class LoadGeneratorTests(TestCase):
+    """chats.loadgen and the seed_chats command."""
+
+    def test_seeded_data_is_skewed_and_consistent(self):
+        users, conversations = seed_dataset(users=40, conversations=60, messages=500, seed=1, batch_size=128)
+        self.assertEqual(Message.objects.count(), 500)
+        self.assertEqual(sum(Conversation.objects.values_list("messages_count", flat=True)), 500)
+        memberships = ConversationParticipant.objects.filter
+        self.assertGreater(
+            memberships(user=users[0]).count(), memberships(user__in=users[-10:]).count()
+        )
+        self.assertTrue(get_search_backend().search(Message.objects.all(), "hello", users[0]).exists())
+        self.assertFalse(Message.objects.exclude(
+            sender__conversation_memberships__conversation=F("conversation")
+        ).exists())
+        # Maintained unread counters match a recount
+        for participant in ConversationParticipant.objects.filter(conversation__in=conversations[:10]):
+            self.assertEqual(participant.unread_count, summaries.unread_count_for(participant))
+
+    def test_seeding_backdates_without_touching_the_model_fields(self):
+        started = timezone.now()
+        seed_dataset(users=10, conversations=5, messages=50, days=30, seed=2, batch_size=20)
+        self.assertTrue(Message._meta.get_field("sent_at").auto_now_add)
+        self.assertTrue(ConversationParticipant._meta.get_field("joined_at").auto_now_add)
+        oldest = Message.objects.order_by("sent_at").first().sent_at
+        self.assertLess(oldest, started - timedelta(days=1))
+        self.assertLessEqual(ConversationParticipant.objects.latest("joined_at").joined_at, oldest)
+        # Rows saved normally are still stamped on insert
+        message = Message.objects.create(
+            conversation=Conversation.objects.first(), sender=User.objects.first(), message_body="now"
+        )
+        self.assertGreaterEqual(message.sent_at, started)
+
+    def test_seed_command(self):
+        out = StringIO()
+        call_command("seed_chats", users=5, conversations=5, messages=20, prefix="cmd", stdout=out)
+        self.assertIn("Seeded 5 users", out.getvalue())
+        self.assertTrue(User.objects.get(username="cmd0").check_password(SEED_PASSWORD))
+
+
+class SQLInstrumentationTests(TestCase):
+    """chats.instrumentation middleware, N+1 fingerprints and metrics endpoint."""
+
+    def setUp(self):
+        instrumentation.registry.reset()
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.conversation = make_conversation(self.alice, self.bob)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_headers_report_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/conversations/")
+        self.assertEqual(int(response["X-DB-Query-Count"]), len(queries))
+        self.assertIn("X-DB-Slowest-Ms", response)
+        self.assertTrue(response["Server-Timing"].startswith("db;dur="))
+        # SQL text shows the schema: staff (or DEBUG) only
+        self.assertNotIn("X-DB-Slowest-Query", response)
+        self.alice.is_staff = True
+        self.alice.save()
+        self.client.force_authenticate(self.alice)
+        self.assertIn("X-DB-Slowest-Query", self.client.get("/api/conversations/"))
+
+    def test_repeated_statements_are_fingerprinted(self):
+        messages = [
+            Message.objects.create(conversation=self.conversation, sender=self.alice, message_body=str(n))
+            for n in range(3)
+        ]
+        recorder = instrumentation.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for message in messages:
+                Message.objects.get(pk=message.pk).sender  # N+1 on sender
+        repeated = recorder.repeated(threshold=3)
+        self.assertEqual(sorted(count for count, _ in repeated.values()), [3, 3])
+        self.assertTrue(any('FROM "chats_user"' in sql for _, sql in repeated.values()))
+        self.assertEqual(
+            instrumentation.fingerprint("SELECT 1 WHERE a IN (%s, %s) AND b = 'x'"),
+            instrumentation.fingerprint("SELECT 2 WHERE a IN (%s) AND b = 'yy'"),
+        )
+
+    def test_metrics_endpoint_aggregates_per_view(self):
+        for _ in range(2):
+            self.client.get("/api/conversations/")
+        self.assertEqual(self.client.get("/api/metrics/sql/").status_code, 403)
+
+        admin = User.objects.create_superuser(
+            username="root", email="root@example.com", password="pass12345", first_name="R", last_name="T"
+        )
+        self.client.force_authenticate(admin)
+        views = self.client.get("/api/metrics/sql/").json()["views"]
+        stats = views["conversation-list"]
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["queries"]["count"], 2)
+        self.assertEqual(sum(stats["db_time_ms"]["buckets"].values()), 2)
+
+    def test_metrics_endpoint_reports_connection_pools(self):
+        admin = User.objects.create_superuser(
+            username="root", email="root@example.com", password="pass12345", first_name="R", last_name="T"
+        )
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.client.get("/api/metrics/sql/").json()["connection_pools"], {})
+
+        pool = ConnectionPool(connect=FakeConnection, max_size=2)
+        pool.checkin(pool.checkout())
+        with patch.object(connection, "get_pool", create=True, return_value=pool):
+            pools = self.client.get("/api/metrics/sql/").json()["connection_pools"]
+        self.assertEqual(list(pools), ["default"])
+        self.assertEqual(pools["default"]["checkouts"], 1)
+        self.assertEqual(pools["default"]["max_size"], 2)
+
+    def test_unsampled_requests_are_untouched(self):
+        with self.settings(CHATS_SQL_INSTRUMENTATION={"SAMPLE_RATE": 0.0}):
+            client = APIClient()
+            client.force_authenticate(self.alice)
+            response = client.get("/api/conversations/")
+        self.assertNotIn("X-DB-Query-Count", response)
+        self.assertEqual(instrumentation.registry.snapshot(), {})
+
+
+class ParticipantSearchTests(TestCase):
+    """ConversationViewSet ?search= via chats.participant_search."""
+
+    def setUp(self):
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.zoe = User.objects.create_user(
+            username="zoe.k", email="zoe@corp.example", password="pass12345", first_name="Zoë", last_name="Kovač"
+        )
+        self.pair = make_conversation(self.alice, self.bob)
+        self.group = make_conversation(self.alice, self.bob, self.zoe)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def search(self, query):
+        response = self.client.get("/api/conversations/", {"search": query})
+        self.assertEqual(response.status_code, 200)
+        return [row["conversation_id"] for row in response.json()["results"]]
+
+    def test_prefix_accent_and_word_matching(self):
+        self.assertEqual(self.search("kova"), [str(self.group.pk)])
+        self.assertEqual(self.search("ZOE"), [str(self.group.pk)])
+        self.assertEqual(self.search("corp"), [str(self.group.pk)])
+        # Matches several participants of the same conversation: no duplicates
+        self.assertEqual(sorted(self.search("b")), sorted([str(self.pair.pk), str(self.group.pk)]))
+        self.assertEqual(self.search("bob zo"), [str(self.group.pk)])
+        self.assertEqual(self.search("ovac"), [])
+
+    def test_index_follows_membership_and_profile_changes(self):
+        self.group.participants.remove(self.zoe)
+        self.assertEqual(self.search("kovac"), [])
+        ConversationParticipant.objects.create(conversation=self.pair, user=self.zoe)
+        self.assertEqual(self.search("kovac"), [str(self.pair.pk)])
+
+        self.zoe.last_name = "Novak"
+        self.zoe.save()
+        self.assertEqual(self.search("kovac"), [])
+        self.assertEqual(self.search("novak"), [str(self.pair.pk)])
+
+        with self.assertNumQueries(1):
+            self.zoe.save(update_fields=["last_login"])
+
+        ParticipantSearchTerm.objects.all().delete()
+        call_command("rebuild_participant_search_index", stdout=StringIO())
+        self.assertEqual(self.search("novak"), [str(self.pair.pk)])
+
+    def test_words_ending_in_z_or_9_match(self):
+        liz = make_user("liz")
+        user9 = make_user("user9")
+        conversation = make_conversation(self.alice, liz, user9)
+        self.assertEqual(self.search("liz"), [str(conversation.pk)])
+        self.assertEqual(self.search("user9"), [str(conversation.pk)])
+
+    def test_lookup_is_a_prefix_match_on_the_term_index(self):
+        # LIKE 'word%' holds under any collation, unlike a computed upper bound
+        sql, params = participant_search.matching_conversation_ids("kov").query.sql_with_params()
+        self.assertIn("LIKE", sql)
+        self.assertEqual(params, ("kov%",))
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn("participant_term_idx", plan)
+
+
+class AsyncViewTests(TestCase):
+    """chats.async_views: same responses as the DRF viewsets."""
+
+    def setUp(self):
+        get_user_auth_cache().clear()
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.conversation = make_conversation(self.alice, self.bob)
+        for n in range(25):
+            Message.objects.create(conversation=self.conversation, sender=self.bob, message_body=f"m{n}")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.alice)}")
+
+    def test_message_list_matches_keyset_viewset(self):
+        sync = self.client.get("/api/messages/", {"cursor": "", "page_size": 10})
+        async_ = self.client.get("/api/async/messages/", {"cursor": "", "page_size": 10})
+        self.assertEqual(async_.status_code, 200)
+        self.assertEqual(
+            async_.content.replace(b"/api/async/messages/", b"/api/messages/"), sync.content
+        )
+        older = self.client.get(async_.json()["older"])
+        self.assertEqual(len(older.json()["results"]), 10)
+
+    def test_conversation_list_matches_viewset(self):
+        make_conversation(self.alice, make_user("carol"))
+        # Activity in the older conversation moves it to the top of the inbox
+        Message.objects.create(conversation=self.conversation, sender=self.bob, message_body="newest")
+        for query in ({}, {"messages_limit": 2}, {"search": "car"}):
+            sync = self.client.get("/api/conversations/", query)
+            async_ = self.client.get("/api/async/conversations/", query)
+            self.assertEqual(async_.status_code, 200)
+            self.assertEqual(async_.content, sync.content)
+
+    def test_create(self):
+        response = self.client.post(
+            "/api/async/messages/",
+            {"conversation_id": str(self.conversation.pk), "message_body": "async hello"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["sender"]["username"], "alice")
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message_preview, "async hello")
+
+        outsider = make_conversation(self.bob, make_user("carol"))
+        response = self.client.post(
+            "/api/async/messages/",
+            {"conversation_id": str(outsider.pk), "message_body": "x"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+        carol = User.objects.get(username="carol")
+        response = self.client.post(
+            "/api/async/conversations/", {"participants_ids": [str(self.bob.pk), str(carol.pk)]}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()["participants"]), 3)
+
+    def test_authentication(self):
+        self.assertEqual(APIClient().get("/api/async/messages/").status_code, 401)
+        self.alice.is_active = False
+        self.alice.save()
+        self.assertEqual(self.client.get("/api/async/conversations/").status_code, 401)
+
+
+FAILURES = {"left": 0}
+
+
+@jobs.task("tests.flaky")
+def flaky_task(payloads):
+    if FAILURES["left"]:
+        FAILURES["left"] -= 1
+        raise RuntimeError("boom")
+
+
+@override_settings(CHATS_JOBS={"EAGER": False, "RETRY_BACKOFF": 0, "MAX_ATTEMPTS": 2})
+class JobQueueTests(TestCase):
+    """chats.jobs: write-behind side effects, batching, retries, dead letters."""
+
+    def setUp(self):
+        get_membership_cache().clear()
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.conversation = make_conversation(self.alice, self.bob)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def post(self, body):
+        return self.client.post(
+            "/api/messages/",
+            {"conversation_id": str(self.conversation.pk), "message_body": body},
+            format="json",
+        )
+
+    def test_create_enqueues_side_effects(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.post("queued hello")
+        self.assertEqual(response.status_code, 201)
+        # In-process broker: only this process can publish, on commit
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(list(Job.objects.values_list("task", flat=True)), ["chats.index_messages"])
+        # Summaries stay transactional; search waits for the worker
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message_preview, "queued hello")
+        self.assertEqual(get_search_backend().ranked_ids("queued", self.alice), [])
+
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        self.assertEqual(len(get_search_backend().ranked_ids("queued", self.alice)), 1)
+        self.assertFalse(Job.objects.exists())
+
+    def test_indexing_invalidates_search_etag(self):
+        self.post("late hello")
+        before = self.client.get("/api/messages/", {"search": "late"})
+        self.assertEqual(before.data["count"], 0)
+        jobs.run_pending()
+        after = self.client.get("/api/messages/", {"search": "late"}, HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after.data["count"], 1)
+
+    @override_settings(CHATS_REALTIME_BROKER_URL="tcp://127.0.0.1:1")
+    def test_publish_queued_with_shared_broker(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(self.post("shared hello").status_code, 201)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(
+            sorted(Job.objects.values_list("task", flat=True)),
+            ["chats.index_messages", "chats.publish_messages"],
+        )
+
+    def test_batched_pickup(self):
+        for n in range(5):
+            jobs.enqueue("tests.flaky", {"n": n})
+        claimed = jobs.claim("w1", batch_size=3)
+        self.assertEqual([job.payload["n"] for job in claimed], [0, 1, 2])
+        self.assertTrue(all(job.status == Job.Status.RUNNING and job.attempts == 1 for job in claimed))
+        # Claimed jobs are not handed to another worker while their lease lasts
+        self.assertEqual([job.payload["n"] for job in jobs.claim("w2", batch_size=10)], [3, 4])
+        self.assertEqual(jobs.claim("w3", batch_size=10), [])
+        self.assertEqual(len(jobs.claim("w3", batch_size=10, lease=-1)), 5)
+
+    def test_retry_then_dead_letter(self):
+        FAILURES["left"] = 3
+        job = jobs.enqueue("tests.flaky", {"n": 1})
+        self.assertEqual(jobs.run_pending(max_batches=1), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.PENDING, 1))
+        self.assertIn("RuntimeError: boom", job.last_error)
+
+        with self.assertLogs("chats.jobs", "ERROR"):
+            self.assertEqual(jobs.run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.DEAD)
+        self.assertEqual(jobs.run_pending(), (0, 0))
+        self.assertEqual(jobs.queue_stats()["dead"], 1)
+
+        self.assertEqual(jobs.requeue_dead("tests.flaky"), 1)
+        FAILURES["left"] = 0
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        self.assertFalse(Job.objects.exists())
+
+    def test_failing_job_does_not_fail_its_batch(self):
+        FAILURES["left"] = 1
+        for n in range(3):
+            jobs.enqueue("tests.flaky", {"n": n})
+        # The batch fails once, then runs job by job: the first job fails again
+        self.assertEqual(jobs.run_jobs(jobs.claim("w1", batch_size=10)), (3, 0))
+        FAILURES["left"] = 2
+        for n in range(3):
+            jobs.enqueue("tests.flaky", {"n": n})
+        self.assertEqual(jobs.run_jobs(jobs.claim("w1", batch_size=10)), (2, 1))
+        self.assertEqual(Job.objects.get().status, Job.Status.PENDING)
+
+    def test_eager_mode_runs_inline(self):
+        with self.settings(CHATS_JOBS={"EAGER": True}):
+            self.assertIsNone(jobs.enqueue("tests.flaky", {"n": 1}))
+        self.assertFalse(Job.objects.exists())
+
+
+@override_settings(CHATS_DB_ROUTING={"REPLICAS": ["replica"], "STICKY_SECONDS": 60})
+class ReplicaRoutingTests(TransactionTestCase):
+    """chats.db.replicas against two SQLite databases, synced on demand."""
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        get_membership_cache().clear()
+        get_user_auth_cache().clear()
+        replicas.get_primary_pins().clear()
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.conversation = make_conversation(self.alice, self.bob)
+        call_command("sync_sqlite_replica", stdout=StringIO())
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.alice)}")
+
+    def bodies(self, response):
+        return [message["message_body"] for message in response.json()["results"]]
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        # User and membership cache misses are filled from the primary
+        response = self.client.get("/api/messages/")
+        self.assertRegex(response["X-DB-Aliases"], r"^default=2, replica=\d+$")
+
+        Message.objects.create(conversation=self.conversation, sender=self.bob, message_body="hi")
+        response = self.client.get("/api/messages/")
+        # Not replicated yet: the replica serves the read
+        self.assertEqual(self.bodies(response), [])
+        self.assertRegex(response["X-DB-Aliases"], r"^replica=\d+$")
+
+        call_command("sync_sqlite_replica", stdout=StringIO())
+        response = self.client.get("/api/messages/")
+        self.assertEqual(self.bodies(response), ["hi"])
+        self.assertRegex(response["X-DB-Aliases"], r"^replica=\d+$")
+
+        response = self.client.post(
+            "/api/messages/", {"conversation_id": str(self.conversation.pk), "message_body": "yo"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertRegex(response["X-DB-Aliases"], r"^default=\d+$")
+        self.assertFalse(Message.objects.using("replica").filter(message_body="yo").exists())
+
+    def test_writer_reads_own_writes(self):
+        self.client.post(
+            "/api/messages/", {"conversation_id": str(self.conversation.pk), "message_body": "mine"}, format="json"
+        )
+        response = self.client.get("/api/messages/")
+        self.assertEqual(self.bodies(response), ["mine"])
+        self.assertRegex(response["X-DB-Aliases"], r"^default=\d+$")
+        response = self.client.get("/api/async/messages/")
+        self.assertEqual(self.bodies(response), ["mine"])
+
+        # Other users read the (lagging) replica
+        bob = APIClient()
+        bob.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.bob)}")
+        self.assertEqual(self.bodies(bob.get("/api/messages/")), [])
+
+    def test_async_views_run_on_an_async_chain(self):
+        # A sync-only middleware would put the whole chain behind a thread
+        self.assertNotIsInstance(ASGIHandler()._middleware_chain, SyncToAsync)
+        client = AsyncClient()
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.alice)}"}
+
+        async def scenario():
+            posted = await client.post(
+                "/api/async/messages/",
+                {"conversation_id": str(self.conversation.pk), "message_body": "async mine"},
+                content_type="application/json",
+                headers=headers,
+            )
+            return posted, await client.get("/api/async/messages/", headers=headers)
+
+        posted, read = async_to_sync(scenario)()
+        self.assertEqual(posted.status_code, 201)
+        self.assertRegex(posted["X-DB-Aliases"], r"^default=\d+$")
+        # Pinned by the async middleware path: the writer reads the primary
+        self.assertEqual(self.bodies(read), ["async mine"])
+        self.assertRegex(read["X-DB-Aliases"], r"^default=\d+$")
+
+    def test_membership_cache_fills_from_primary(self):
+        carol = make_user("carol")
+        conversation = make_conversation(self.alice, carol)
+        Message.objects.create(conversation=conversation, sender=carol, message_body="new")
+        response = self.client.get("/api/conversations/")
+        # The conversation list itself is still replica-stale
+        self.assertEqual(response.json()["count"], 1)
+        self.assertEqual(get_membership_cache().conversations(self.alice.pk), {self.conversation.pk, conversation.pk})
+
+    def test_unrouted_code_uses_primary(self):
+        Message.objects.create(conversation=self.conversation, sender=self.bob, message_body="hi")
+        self.assertEqual(Message.objects.count(), 1)
+        self.assertEqual(Message.objects.using("replica").count(), 0)
+
+
+class ExportTests(TestCase):
+    """chats.export: streamed NDJSON history, chunked and resumable."""
+
+    def setUp(self):
+        get_membership_cache().clear()
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.conversation = make_conversation(self.alice, self.bob)
+        self.other = make_conversation(self.alice, make_user("carol"))
+        base = timezone.now() - timedelta(days=1)
+        backdated_bulk_create(Message, (
+            Message(conversation=self.conversation, sender=self.bob, message_body=f"m{n}",
+                    sent_at=base + timedelta(seconds=n))
+            for n in range(25)
+        ))
+        Message.objects.create(conversation=self.other, sender=self.alice, message_body="elsewhere")
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_conversation_export_matches_serializer(self):
+        get_membership_cache().conversations(self.alice.pk)
+        # One archive query, then chunks of 10 + 10 + 5
+        with patch.object(export, "CHUNK_SIZE", 10), self.assertNumQueries(4):
+            response = self.client.get(f"/api/conversations/{self.conversation.pk}/export/")
+            rows = self.lines(response)
+        expected = MessageSerializer(
+            Message.objects.filter(conversation=self.conversation).order_by("sent_at", "message_id"), many=True
+        ).data
+        self.assertEqual(rows, json.loads(JSONRenderer().render(expected)))
+
+    def test_resume_from_bookmark(self):
+        url = f"/api/conversations/{self.conversation.pk}/export/"
+        rows = self.lines(self.client.get(url))
+        bookmark = rows[9]
+        resumed = self.lines(self.client.get(
+            url, {"after_sent_at": bookmark["sent_at"], "after_message_id": bookmark["message_id"]}
+        ))
+        self.assertEqual(resumed, rows[10:])
+        self.assertEqual(self.client.get(url, {"after_sent_at": "yesterday"}).status_code, 400)
+
+    def test_mailbox_includes_archive_and_all_conversations(self):
+        archive_messages(timezone.now() - timedelta(hours=1))
+        rows = self.lines(self.client.get("/api/messages/export/", HTTP_ACCEPT="application/x-ndjson"))
+        self.assertEqual([row["message_body"] for row in rows], [f"m{n}" for n in range(25)] + ["elsewhere"])
+
+    def test_outsider_gets_404(self):
+        self.client.force_authenticate(make_user("mallory"))
+        response = self.client.get(f"/api/conversations/{self.conversation.pk}/export/")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.lines(self.client.get("/api/messages/export/")), [])
+
+
+class TimeOrderedIdTests(TestCase):
+    """chats.ids: version 7 primary keys."""
+
+    def test_keys_are_version_7_and_increasing(self):
+        keys = [uuid7() for _ in range(5000)]
+        self.assertEqual({key.version for key in keys}, {7})
+        self.assertEqual(len(set(keys)), len(keys))
+        # Ordered both as UUIDs and as the hex strings stored in the table
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual([key.hex for key in keys], sorted(key.hex for key in keys))
+
+    def test_explicit_timestamp(self):
+        key = uuid7(1_700_000_000_123)
+        self.assertEqual(uuid7_time(key), 1_700_000_000_123)
+        self.assertEqual(key.version, 7)
+
+    def test_new_rows_get_time_ordered_keys(self):
+        alice, bob = make_user("alice"), make_user("bob")
+        conversation = make_conversation(alice, bob)
+        first = Message.objects.create(conversation=conversation, sender=alice, message_body="1")
+        second = Message.objects.create(conversation=conversation, sender=bob, message_body="2")
+        self.assertEqual((alice.pk.version, conversation.pk.version, first.pk.version), (7, 7, 7))
+        self.assertLess(first.pk.hex, second.pk.hex)
+        self.assertAlmostEqual(uuid7_time(first.pk) / 1000, first.sent_at.timestamp(), delta=1)
+
+
+class ConversationDedupTests(TestCase):
+    """chats.conversations: participant-set key and find-or-create."""
+
+    def setUp(self):
+        get_membership_cache().clear()
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.carol = make_user("carol")
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def find_or_create(self, *users):
+        return self.client.post(
+            "/api/conversations/find-or-create/",
+            {"participants_ids": [str(user.pk) for user in users]},
+            format="json",
+        )
+
+    def test_key_ignores_order_and_duplicates(self):
+        a, b = self.alice.pk, self.bob.pk
+        self.assertEqual(participant_key([a, b]), participant_key([b, a, b]))
+        self.assertNotEqual(participant_key([a, b]), participant_key([a, self.carol.pk]))
+
+    def test_find_or_create_returns_the_same_conversation(self):
+        created = self.find_or_create(self.bob)
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(len(created.json()["participants"]), 2)
+
+        self.client.force_authenticate(self.bob)
+        found = self.find_or_create(self.alice)
+        self.assertEqual(found.status_code, 200)
+        self.assertEqual(found.json()["conversation_id"], created.json()["conversation_id"])
+        self.assertEqual(Conversation.objects.count(), 1)
+
+    def test_create_writes_through_rows_in_one_insert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.find_or_create(self.bob, self.carol)
+        self.assertEqual(response.status_code, 201)
+        inserts = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("INSERT")]
+        through = [sql for sql in inserts if "conversationparticipant" in sql]
+        self.assertEqual(len(through), 1)
+        # After the inserts only the participants are read back, in one query
+        after = ctx.captured_queries[[q["sql"] for q in ctx.captured_queries].index(through[0]) + 1:]
+        selects = [q["sql"] for q in after if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 1)
+        self.assertIn('INNER JOIN "chats_conversationparticipant"', selects[0])
+
+    def test_plain_create_of_an_existing_set_has_no_key(self):
+        self.find_or_create(self.bob)
+        response = self.client.post(
+            "/api/conversations/",
+            {"participants_ids": [str(self.alice.pk), str(self.bob.pk)]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        second = Conversation.objects.get(pk=response.json()["conversation_id"])
+        self.assertIsNone(second.participant_key)
+        self.assertEqual(self.find_or_create(self.bob).status_code, 200)
+
+    def test_membership_change_releases_the_key(self):
+        first = self.find_or_create(self.bob).json()["conversation_id"]
+        conversation = Conversation.objects.get(pk=first)
+        conversation.participants.add(self.carol)
+        conversation.refresh_from_db()
+        self.assertIsNone(conversation.participant_key)
+
+        response = self.find_or_create(self.bob)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotEqual(response.json()["conversation_id"], first)
+
+
+class NestedMessageRouteTests(TestCase):
+    """MessageViewSet under /api/conversations/{conversation_pk}/messages/."""
+
+    def setUp(self):
+        get_membership_cache().clear()
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.carol = make_user("carol")
+        self.ours = make_conversation(self.alice, self.bob)
+        self.other = make_conversation(self.alice, self.carol)
+        self.theirs = make_conversation(self.bob, self.carol)
+        for conversation, sender in ((self.ours, self.bob), (self.other, self.carol), (self.theirs, self.carol)):
+            for i in range(3):
+                Message.objects.create(conversation=conversation, sender=sender, message_body=f"m{i}")
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def nested_url(self, conversation):
+        return f"/api/conversations/{conversation.pk}/messages/"
+
+    def page_plan(self, url):
+        """EXPLAIN QUERY PLAN of the page query behind `url`."""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        sql = next(
+            q["sql"] for q in ctx.captured_queries
+            if q["sql"].startswith("SELECT") and 'FROM "chats_message"' in q["sql"] and "ORDER BY" in q["sql"]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return sql, " | ".join(str(row[-1]) for row in cursor.fetchall())
+
+    def test_lists_only_the_conversation_in_the_url(self):
+        response = self.client.get(self.nested_url(self.ours))
+        self.assertEqual(response.status_code, 200)
+        rows = response.json()["results"]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row["conversation"] for row in rows}, {str(self.ours.pk)})
+        # The top-level route still spans all of the caller's conversations
+        self.assertEqual(len(self.client.get("/api/messages/").json()["results"]), 6)
+
+    def test_non_members_get_404(self):
+        self.assertEqual(self.client.get(self.nested_url(self.theirs)).status_code, 404)
+        self.assertEqual(self.client.get("/api/conversations/not-a-uuid/messages/").status_code, 404)
+        message = self.ours.messages.first()
+        self.assertEqual(self.client.get(f"{self.nested_url(self.other)}{message.pk}/").status_code, 404)
+        self.assertEqual(self.client.get(f"{self.nested_url(self.ours)}{message.pk}/").status_code, 200)
+
+    def test_membership_is_one_indexed_lookup(self):
+        get_membership_cache().clear()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.nested_url(self.ours) + "?cursor=")
+        participant_queries = [q["sql"] for q in ctx.captured_queries if "chats_conversationparticipant" in q["sql"]]
+        self.assertEqual(len(participant_queries), 1)
+        self.assertIn('"chats_conversationparticipant"."conversation_id" IN', participant_queries[0])
+        # Cached afterwards: no participant query at all
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.nested_url(self.ours) + "?cursor=")
+        self.assertFalse([q for q in ctx.captured_queries if "chats_conversationparticipant" in q["sql"]])
+
+    def test_create_defaults_to_the_url_conversation(self):
+        response = self.client.post(self.nested_url(self.ours), {"message_body": "hi"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["conversation"], str(self.ours.pk))
+        response = self.client.post(
+            self.nested_url(self.ours),
+            {"conversation_id": str(self.other.pk), "message_body": "hi"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.nested_url(self.theirs), {"message_body": "hi"}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+    def test_query_plans(self):
+        # Nested: equality on the composite index, rows already in page order
+        sql, plan = self.page_plan(self.nested_url(self.ours) + "?cursor=")
+        self.assertIn(f"\"chats_message\".\"conversation_id\" = '{self.ours.pk.hex}'", sql)
+        self.assertIn("message_conv_sent_at_idx (conversation_id=?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        # Top level: an index search per conversation id, no participants join
+        sql, plan = self.page_plan("/api/messages/?cursor=")
+        self.assertIn("\"chats_message\".\"conversation_id\" IN", sql)
+        self.assertNotIn("chats_conversationparticipant", sql)
+        self.assertRegex(plan, r"SEARCH chats_message USING INDEX \w+ \(conversation_id=\?\)")
+
+
+class InboxTests(TestCase):
+    """chats.inbox: per-user conversation list ordered by latest activity."""
+
+    def setUp(self):
+        get_membership_cache().clear()
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.carol = make_user("carol")
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def listed(self, **params):
+        response = self.client.get("/api/conversations/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["conversation_id"] for row in response.json()["results"]]
+
+    def entry(self, conversation, user):
+        return InboxEntry.objects.get(conversation=conversation, user=user)
+
+    def test_list_follows_latest_activity(self):
+        first = make_conversation(self.alice, self.bob)
+        second = make_conversation(self.alice, self.carol)
+        make_conversation(self.bob, self.carol)
+        self.assertEqual(self.listed(), [str(second.pk), str(first.pk)])
+
+        message = Message.objects.create(conversation=first, sender=self.bob, message_body="hello")
+        self.assertEqual(self.listed(), [str(first.pk), str(second.pk)])
+        self.assertEqual(self.listed(ordering="-created_at"), [str(second.pk), str(first.pk)])
+        entry = self.entry(first, self.alice)
+        self.assertEqual((entry.last_activity_at, entry.snippet), (message.sent_at, "hello"))
+
+        # Editing or deleting the last message resets the rows from the summary
+        message.message_body = "edited"
+        message.save()
+        self.assertEqual(self.entry(first, self.bob).snippet, "edited")
+        message.delete()
+        entry = self.entry(first, self.alice)
+        self.assertEqual((entry.last_activity_at, entry.snippet), (first.created_at, ""))
+        self.assertEqual(self.listed(), [str(second.pk), str(first.pk)])
+
+    def test_rows_follow_membership(self):
+        conversation = make_conversation(self.alice, self.bob)
+        Message.objects.create(conversation=conversation, sender=self.bob, message_body="before carol")
+        ConversationParticipant.objects.create(conversation=conversation, user=self.carol)
+        self.assertEqual(self.entry(conversation, self.carol).snippet, "before carol")
+
+        conversation.participants.remove(self.alice)
+        self.assertEqual(self.listed(), [])
+        self.assertFalse(InboxEntry.objects.filter(user=self.alice).exists())
+        self.carol.conversation_memberships.all().delete()
+        self.assertEqual(list(InboxEntry.objects.values_list("user_id", flat=True)), [self.bob.pk])
+
+        InboxEntry.objects.all().delete()
+        call_command("rebuild_inbox", stdout=StringIO())
+        self.assertEqual(self.entry(conversation, self.bob).snippet, "before carol")
+
+    @override_settings(CHATS_INBOX={"FAN_OUT_BATCH_SIZE": 2}, CHATS_JOBS={"EAGER": False})
+    def test_large_groups_fan_out_in_batches(self):
+        dave = make_user("dave")
+        conversation = make_conversation(self.alice, self.bob, self.carol, dave)
+        message = Message.objects.create(conversation=conversation, sender=self.bob, message_body="all")
+        # Only the sender's row is written with the message
+        activity = dict(InboxEntry.objects.values_list("user_id", "last_activity_at"))
+        self.assertEqual(activity[self.bob.pk], message.sent_at)
+        self.assertEqual(activity[self.alice.pk], conversation.created_at)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(jobs.run_pending(), (2, 0))  # search index and inbox jobs
+        updates = [q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "chats_inboxentry"')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(
+            set(InboxEntry.objects.values_list("last_activity_at", "snippet")), {(message.sent_at, "all")}
+        )
+
+    @override_settings(CHATS_INBOX={"FAN_OUT_BATCH_SIZE": 2}, CHATS_JOBS={"EAGER": False})
+    def test_deferred_fan_out_invalidates_list_etag(self):
+        conversation = make_conversation(self.alice, self.bob, self.carol, make_user("dave"))
+        Message.objects.create(conversation=conversation, sender=self.bob, message_body="all")
+        version = Conversation.objects.get(pk=conversation.pk).version
+        payload = next(job.payload for job in Job.objects.filter(task=tasks.INBOX_FAN_OUT))
+        tasks.inbox_fan_out([payload])
+        self.assertEqual(Conversation.objects.get(pk=conversation.pk).version, version + 1)
+        # Replays move no rows and keep the ETag
+        tasks.inbox_fan_out([payload])
+        self.assertEqual(Conversation.objects.get(pk=conversation.pk).version, version + 1)
+
+    def test_list_is_an_index_range_scan(self):
+        for _ in range(3):
+            make_conversation(self.alice, self.bob)
+        with CaptureQueriesContext(connection) as ctx:
+            self.listed()
+        sql = next(q["sql"] for q in ctx.captured_queries if "ORDER BY" in q["sql"] and "chats_inboxentry" in q["sql"])
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            plan = " | ".join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn("inbox_user_activity_idx (user_id=?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
@@ -3,7 +3,8 @@
 from django.urls import include, path
 from rest_framework import routers
 from rest_framework_nested.routers import NestedDefaultRouter  # <-- ensures "NestedDefaultRouter" appears
-from .views import ConversationViewSet, MessageViewSet
+from .async_views import AsyncConversationView, AsyncMessageView
+from .views import ConversationViewSet, MessageViewSet, SQLMetricsView
 
 # Top-level router
 router = routers.DefaultRouter()
@@ -17,4 +18,8 @@ convo_router.register(r"messages", MessageViewSet, basename="conversation-messag
 urlpatterns = [
     path("", include(router.urls)),
     path("", include(convo_router.urls)),
+    # Async-native list/create for the hot paths (chats.async_views)
+    path("async/conversations/", AsyncConversationView.as_view(), name="async-conversation-list"),
+    path("async/messages/", AsyncMessageView.as_view(), name="async-message-list"),
+    path("metrics/sql/", SQLMetricsView.as_view(), name="sql-metrics"),
 ]
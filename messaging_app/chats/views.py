@@ -1,11 +1,37 @@
+import uuid
+
+from django.http import Http404
 from django.shortcuts import render
 
-from django.db.models import Prefetch
+from django.db import transaction
+from django.db.models import F, OuterRef, Prefetch, Subquery, Window
+from django.db.models.functions import RowNumber
 from rest_framework import viewsets, permissions, status, serializers, filters
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .models import Conversation, Message, User
-from .serializers import ConversationSerializer, MessageSerializer
+from . import instrumentation
+from .conversations import find_or_create_conversation
+from .db.replicas import ReadYourWritesMixin
+from .etags import ConditionalGetMixin
+from .export import NDJSONRenderer, export_response
+from .fastpath import FastReadMixin
+from .filters import MessageSearchFilter, ParticipantSearchFilter
+from .membership import get_membership_cache
+from . import inbox, jobs, summaries
+from .models import ArchivedMessage, Conversation, ConversationParticipant, Message, User
+from .pagination import MessagePagination
+from .search import get_search_backend
+from .serializers import (
+    ConversationSerializer,
+    MessageBulkItemSerializer,
+    MessageSerializer,
+    ReadCursorSerializer,
+)
+from .tasks import INDEX_MESSAGES, PUBLISH_MESSAGES
 
 
 class IsAuthenticated(permissions.IsAuthenticated):
@@ -13,40 +39,111 @@ class IsAuthenticated(permissions.IsAuthenticated):
     pass
 
 
-class ConversationViewSet(viewsets.ModelViewSet):
+def latest_messages_prefetch(limit):
+    """
+    Prefetch at most `limit` recent messages per conversation into
+    `latest_messages`, using one ROW_NUMBER() window query for the whole page.
+    """
+    ranked = (
+        Message.objects.select_related("sender")
+        .annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[F("conversation_id")],
+                order_by=[F("sent_at").desc(), F("message_id").desc()],
+            )
+        )
+        .filter(row_number__lte=limit)
+        .order_by("sent_at", "message_id")
+    )
+    return Prefetch("messages", queryset=ranked, to_attr="latest_messages")
+
+
+def conversations_queryset(user_id, conversation_ids, messages_limit):
+    """
+    The caller's conversations (all of them when `conversation_ids` is
+    None) with participants, the latest `messages_limit` messages and the
+    caller's `unread_count`.
+    """
+    prefetches = ["participants"]
+    if messages_limit:
+        prefetches.append(latest_messages_prefetch(messages_limit))
+    # Caller's maintained counter via the (conversation, user) unique index
+    unread = ConversationParticipant.objects.filter(
+        conversation_id=OuterRef("pk"), user_id=user_id
+    ).values("unread_count")[:1]
+    queryset = Conversation.objects.all()
+    if conversation_ids is not None:
+        queryset = queryset.filter(pk__in=conversation_ids)
+    return (
+        queryset.annotate(unread_count=Subquery(unread))
+        .prefetch_related(*prefetches)
+        .order_by("-created_at")
+    )
+
+
+class ConversationViewSet(ReadYourWritesMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """
     List/retrieve/create conversations.
     Supports:
-      - search: ?search=<text> (by participant username/email)
-      - ordering: ?ordering=created_at or -created_at
+      - search: ?search=<text> (word prefixes of participant username, email
+        or name; see chats.participant_search)
+      - ordering: most recently active first (default), or
+        ?ordering=created_at / -created_at / last_activity_at; the caller's
+        inbox rows drive the list (see chats.inbox)
+      - embedded history: ?messages_limit=<n> (latest n messages per
+        conversation, default 20, max 100); use the messages endpoint for
+        the full, paginated history
+      - conditional GET: list/retrieve send an ETag and honour If-None-Match
+        (see chats.etags)
+      - unread counts: each conversation carries the caller's `unread_count`;
+        POST /api/conversations/{id}/read/ advances the read cursor
+      - read replicas: GET/HEAD read from a replica unless the caller wrote
+        recently (see chats.db.replicas)
+      - export: GET /api/conversations/{id}/export/ streams the full
+        history as NDJSON (see chats.export)
+      - find-or-create: POST /api/conversations/find-or-create/ reuses the
+        conversation of the same participant set
     """
     serializer_class = ConversationSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    messages_limit = 20
+    max_messages_limit = 100
+
     # --- DRF filters ---
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = [
-        "participants__username",
-        "participants__email",
-        "participants__first_name",
-        "participants__last_name",
-    ]
-    ordering_fields = ["created_at"]
-    ordering = ["-created_at"]
+    filter_backends = [ParticipantSearchFilter, filters.OrderingFilter]
+    ordering_fields = ["created_at", "last_activity_at"]
+    ordering = ["-last_activity_at", "-inbox_conversation_id"]
+
+    def get_messages_limit(self):
+        try:
+            limit = int(self.request.query_params["messages_limit"])
+        except (KeyError, ValueError):
+            return self.messages_limit
+        return max(0, min(limit, self.max_messages_limit))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["messages_limit"] = self.get_messages_limit()
+        return context
+
+    def get_etag_conversation_ids(self):
+        conversation_ids = get_membership_cache().conversations(self.request.user.pk)
+        if self.action == "list":
+            return conversation_ids
+        try:
+            conversation_id = uuid.UUID(str(self.kwargs[self.lookup_url_kwarg or self.lookup_field]))
+        except (KeyError, ValueError):
+            return None
+        # Unknown / foreign conversations fall through to the normal 404
+        return [conversation_id] if conversation_id in conversation_ids else None
 
     def get_queryset(self):
         user = self.request.user
-        return (
-            Conversation.objects.filter(participants=user)
-            .prefetch_related(
-                "participants",
-                Prefetch(
-                    "messages",
-                    queryset=Message.objects.select_related("sender").order_by("sent_at"),
-                ),
-            )
-            .order_by("-created_at")
-        )
+        # The caller's inbox rows are their memberships: a range scan on
+        # (user, last_activity_at) instead of a pk IN (...) list
+        return inbox.for_user(conversations_queryset(user.pk, None, self.get_messages_limit()), user.pk)
 
     def create(self, request, *args, **kwargs):
         """
@@ -54,37 +151,118 @@ class ConversationViewSet(viewsets.ModelViewSet):
         {
           "participants_ids": ["<uuid1>", "<uuid2>", ...]
         }
-        Ensures the current user is included.
+        Ensures the current user is included. Always creates a conversation;
+        see find_or_create for "open a chat with ...".
         """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        conversation = serializer.save()
-
-        if request.user not in conversation.participants.all():
-            conversation.participants.add(request.user)
-
+        conversation = serializer.save(
+            participants=[*serializer.validated_data["participants"], request.user]
+        )
+        # Participants are prefetched and there are no messages yet
         out = self.get_serializer(conversation)
         return Response(out.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["post"], url_path="find-or-create")
+    def find_or_create(self, request, *args, **kwargs):
+        """
+        POST /api/conversations/find-or-create/
+        {"participants_ids": ["<uuid>", ...]}   # the caller is added
+        Returns the conversation of exactly this participant set (200),
+        creating it first if there is none (201). The lookup is one indexed
+        equality match on the participant-set hash (chats.conversations).
+        """
+        serializer = self.get_serializer(data=request.data, context={
+            **self.get_serializer_context(), "add_caller": request.user,
+        })
+        serializer.is_valid(raise_exception=True)
+        conversation, created = find_or_create_conversation(
+            [*serializer.validated_data["participants"], request.user],
+            conversations_queryset(request.user.pk, None, self.get_messages_limit()),
+        )
+        return Response(
+            self.get_serializer(conversation).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=["post"], serializer_class=ReadCursorSerializer)
+    def read(self, request, *args, **kwargs):
+        """
+        POST /api/conversations/{id}/read/
+        {"message_id": "<uuid>"}   # optional; defaults to the latest message
+        Advances (never rewinds) the caller's read cursor and returns it.
+        """
+        participant = get_object_or_404(
+            ConversationParticipant,
+            conversation_id=kwargs[self.lookup_url_kwarg or self.lookup_field],
+            user_id=request.user.pk,
+        )
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        message = None
+        message_id = serializer.validated_data.get("message_id")
+        if message_id is not None:
+            message = get_object_or_404(
+                Message, pk=message_id, conversation_id=participant.conversation_id
+            )
+        participant = summaries.mark_read(participant, message)
+        return Response(self.get_serializer(participant).data)
+
+    @action(detail=True, methods=["get"], renderer_classes=[NDJSONRenderer, JSONRenderer])
+    def export(self, request, *args, **kwargs):
+        """
+        GET /api/conversations/{id}/export/
+        The full history as NDJSON, streamed (see chats.export).
+        """
+        try:
+            conversation_id = uuid.UUID(str(kwargs[self.lookup_url_kwarg or self.lookup_field]))
+        except ValueError:
+            raise Http404
+        if conversation_id not in get_membership_cache().conversations(request.user.pk):
+            raise Http404
+        return export_response([conversation_id], request.query_params, f"conversation-{conversation_id}.ndjson")
 
-class MessageViewSet(viewsets.ModelViewSet):
+
+class MessageViewSet(ReadYourWritesMixin, ConditionalGetMixin, FastReadMixin, viewsets.ModelViewSet):
     """
     List/retrieve/create messages.
     Supports:
-      - search: ?search=<text> (by body or sender username/email)
+      - search: ?search=<text> (full-text over body and sender names,
+        ranked by relevance; see chats.search). Only the best
+        MessageSearchBackend.max_results hits are listed; when more matched,
+        the response carries `X-Search-Truncated: <max_results>`
       - ordering: ?ordering=sent_at or -sent_at
+      - keyset pagination: ?cursor= (newest page), then follow the
+        `older` / `newer` links (see chats.pagination); pages (and
+        page-number pages and their `count`) continue into archived
+        messages (see chats.archive)
+      - conditional GET: list sends an ETag and honours If-None-Match
+      - list/retrieve render from .values() rows through a compiled plan of
+        MessageSerializer (chats.fastpath); output is identical
+      - read replicas: as for conversations (see chats.db.replicas)
+      - export: GET /api/messages/export/ streams the caller's mailbox as
+        NDJSON (see chats.export)
+      - nested route: /api/conversations/{conversation_pk}/messages/ reads,
+        creates and exports within that conversation only, after one
+        membership check (404 for non-members)
     Create payload:
     {
       "conversation_id": "<uuid>",
       "sender_id": "<uuid>",     # optional; defaults to current user
       "message_body": "text"
     }
+    Bulk create: POST /api/messages/bulk/ with a list of create payloads
+    (see bulk_create).
     """
     serializer_class = MessageSerializer
+    max_bulk_size = 1000
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MessagePagination
 
     # --- DRF filters ---
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    # Search runs last so its relevance ordering wins over the default ordering.
+    # search_fields is only used by the icontains fallback backend.
+    filter_backends = [filters.OrderingFilter, MessageSearchFilter]
     search_fields = [
         "message_body",
         "sender__username",
@@ -95,29 +273,216 @@ class MessageViewSet(viewsets.ModelViewSet):
     ordering_fields = ["sent_at"]
     ordering = ["sent_at"]
 
+    def get_nested_conversation_id(self):
+        """
+        The conversation of the nested route (None on /api/messages/). The
+        caller's membership is checked once per request, from the
+        membership cache (on a miss, one query on the (conversation, user)
+        index); non-members get a 404.
+        """
+        if "conversation_pk" not in self.kwargs:
+            return None
+        if not hasattr(self, "_nested_conversation_id"):
+            try:
+                conversation_id = uuid.UUID(str(self.kwargs["conversation_pk"]))
+            except ValueError:
+                raise Http404
+            if not get_membership_cache().is_member(conversation_id, self.request.user.pk):
+                raise Http404
+            self._nested_conversation_id = conversation_id
+        return self._nested_conversation_id
+
+    def get_scope_filter(self):
+        """Filter kwargs selecting the conversations this request may read."""
+        conversation_id = self.get_nested_conversation_id()
+        if conversation_id is not None:
+            # Equality on the leading column of message_conv_sent_at_idx
+            return {"conversation_id": conversation_id}
+        return {"conversation_id__in": get_membership_cache().conversations(self.request.user.pk)}
+
+    def get_etag_conversation_ids(self):
+        if self.action != "list":
+            return None
+        conversation_id = self.get_nested_conversation_id()
+        if conversation_id is not None:
+            return [conversation_id]
+        return get_membership_cache().conversations(self.request.user.pk)
+
     def get_queryset(self):
-        user = self.request.user
         return (
-            Message.objects.filter(conversation__participants=user)
+            Message.objects.filter(**self.get_scope_filter())
             .select_related("conversation", "sender")
             .order_by("sent_at")
         )
 
+    def get_archive_queryset(self):
+        """Cold-tier rows in the same scope, for read fall-through."""
+        if self.request.query_params.get(MessageSearchFilter.search_param):
+            return None  # the search index only covers hot messages
+        archive = ArchivedMessage.objects.filter(**self.get_scope_filter()).select_related(
+            "conversation", "sender"
+        )
+        if self.action == "list":
+            archive = archive.values(*self.get_fast_plan().lookups)
+        return archive
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(request, "search_truncated", False):
+            response["X-Search-Truncated"] = str(get_search_backend().max_results)
+        return response
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if self.action != "retrieve":
+                raise
+        # Read-only fall-through to the archive
+        archive = self.get_archive_queryset()
+        if archive is None:
+            raise Http404
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        return get_object_or_404(archive, pk=self.kwargs[lookup])
+
     def create(self, request, *args, **kwargs):
         data = request.data.copy()
 
         if "sender_id" not in data or data.get("sender_id") in ("", None):
             data["sender_id"] = str(request.user.pk)
 
+        nested_conversation_id = self.get_nested_conversation_id()
+        if nested_conversation_id is not None:
+            if data.get("conversation_id") in ("", None):
+                data["conversation_id"] = str(nested_conversation_id)
+            elif str(data["conversation_id"]) != str(nested_conversation_id):
+                raise serializers.ValidationError(
+                    {"conversation_id": ["Does not match the conversation in the URL."]}
+                )
+
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
 
         conversation = serializer.validated_data["conversation"]
         sender = serializer.validated_data["sender"]
 
-        if not conversation.participants.filter(pk=sender.pk).exists():
+        if not get_membership_cache().is_member(conversation.pk, sender.pk):
             raise serializers.ValidationError("Sender must be a participant in the conversation.")
 
-        message = serializer.save()
-        out = self.get_serializer(message)
+        # Insert, summary update and side-effect jobs (chats.signals) commit together
+        with transaction.atomic():
+            message = serializer.save()
+            out = self.get_serializer(message)
+            # WebSocket fan-out runs in the job worker, after commit
+            jobs.enqueue(PUBLISH_MESSAGES, {"messages": [out.data]})
         return Response(out.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["get"], renderer_classes=[NDJSONRenderer, JSONRenderer])
+    def export(self, request, *args, **kwargs):
+        """
+        GET /api/messages/export/
+        Every message of the caller's conversations as NDJSON, streamed
+        (see chats.export). On the nested route: that conversation only.
+        """
+        conversation_id = self.get_nested_conversation_id()
+        if conversation_id is not None:
+            return export_response([conversation_id], request.query_params, f"conversation-{conversation_id}.ndjson")
+        conversation_ids = get_membership_cache().conversations(request.user.pk)
+        return export_response(conversation_ids, request.query_params, f"mailbox-{request.user.pk}.ndjson")
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request, *args, **kwargs):
+        """
+        POST /api/messages/bulk/
+        [
+          {"conversation_id": "<uuid>", "sender_id": "<uuid>", "message_body": "text"},
+          ...
+        ]
+        Validates membership of every (conversation, sender) pair from the
+        membership cache (at most one query for all misses), inserts the
+        valid items with a single bulk_create and returns a result per item,
+        in request order:
+          {"index": 0, "status": 201, "message": {...}}
+          {"index": 1, "status": 400, "errors": {...}}
+        """
+        items = request.data
+        if not isinstance(items, list):
+            raise serializers.ValidationError("Expected a list of messages.")
+        if len(items) > self.max_bulk_size:
+            raise serializers.ValidationError(f"At most {self.max_bulk_size} messages per request.")
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            item_serializer = MessageBulkItemSerializer(data=item)
+            if not item_serializer.is_valid():
+                results[index] = {"index": index, "status": 400, "errors": item_serializer.errors}
+                continue
+            data = item_serializer.validated_data
+            valid.append((index, data["conversation_id"], data.get("sender_id") or request.user.pk, data))
+
+        # Membership for every conversation in the batch: cache, then one query for misses
+        members = get_membership_cache().members_many(
+            {conversation_id for _, conversation_id, _, _ in valid}
+        )
+
+        to_create = []
+        for index, conversation_id, sender_id, data in valid:
+            if sender_id not in members[conversation_id]:
+                results[index] = {
+                    "index": index,
+                    "status": 400,
+                    "errors": {"non_field_errors": ["Sender must be a participant in the conversation."]},
+                }
+                continue
+            to_create.append((index, Message(
+                conversation_id=conversation_id,
+                sender_id=sender_id,
+                message_body=data["message_body"],
+            )))
+
+        messages = [message for _, message in to_create]
+        if messages:
+            senders = User.objects.in_bulk({message.sender_id for message in messages})
+            conversations = Conversation.objects.in_bulk({message.conversation_id for message in messages})
+            with transaction.atomic():
+                Message.objects.bulk_create(messages)
+                # bulk_create sends no signals: apply their side effects here
+                summaries.messages_created(messages)
+                inbox.messages_created(messages)
+                for message in messages:
+                    message.sender = senders[message.sender_id]
+                    message.conversation = conversations[message.conversation_id]
+                created = MessageSerializer(messages, many=True, context=self.get_serializer_context()).data
+                jobs.enqueue(INDEX_MESSAGES, {"message_ids": [message.pk for message in messages]})
+                jobs.enqueue(PUBLISH_MESSAGES, {"messages": created})
+            for (index, _), row in zip(to_create, created):
+                results[index] = {"index": index, "status": 201, "message": row}
+
+        return Response(
+            {"created": len(messages), "failed": len(items) - len(messages), "results": results},
+            status=status.HTTP_201_CREATED if messages else status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class SQLMetricsView(APIView):
+    """
+    Per-view SQL statistics gathered by SQLInstrumentationMiddleware from
+    sampled requests: query-count and DB-time histograms plus the most
+    repeated statement fingerprints (N+1 candidates), and the counters of
+    this process's connection pools. DELETE resets the per-view statistics.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        config = instrumentation.get_settings()
+        return Response({
+            "sample_rate": config["SAMPLE_RATE"] if config["ENABLED"] else 0.0,
+            "views": instrumentation.registry.snapshot(),
+            "connection_pools": instrumentation.pool_stats(),
+        })
+
+    def delete(self, request):
+        instrumentation.registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
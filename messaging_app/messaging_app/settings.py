@@ -167,6 +167,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # Outermost app middleware so it sees every query of the request
+    "chats.instrumentation.SQLInstrumentationMiddleware",
+    "chats.db.replicas.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -206,7 +209,8 @@ USE_MYSQL = (
 if USE_MYSQL:
     DATABASES = {
         "default": {
-            "ENGINE": "django.db.backends.mysql",
+            # django.db.backends.mysql with a per-process connection pool
+            "ENGINE": "chats.db.backends.mysql_pool",
             "NAME": os.environ.get("DB_NAME", "messaging_db"),
             "USER": os.environ.get("DB_USER", "messaging_user"),
             "PASSWORD": os.environ.get("DB_PASSWORD", ""),
@@ -215,15 +219,43 @@ if USE_MYSQL:
             "OPTIONS": {
                 "init_command": "SET sql_mode='STRICT_ALL_TABLES'",
             },
+            "POOL": {
+                "ENABLED": os.environ.get("DB_POOL", "1") != "0",
+                "MIN_SIZE": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+                "MAX_SIZE": int(os.environ.get("DB_POOL_MAX_SIZE", "20")),
+                "MAX_LIFETIME": float(os.environ.get("DB_POOL_MAX_LIFETIME", "1800")),
+                "CHECKOUT_TIMEOUT": float(os.environ.get("DB_POOL_TIMEOUT", "5")),
+                "HEALTH_CHECK_AFTER": float(os.environ.get("DB_POOL_HEALTH_CHECK_AFTER", "1")),
+            },
         }
     }
+    # Read replicas: DB_REPLICA_HOSTS=host1,host2 adds aliases replica1, replica2
+    replica_aliases = []
+    for number, host in enumerate(filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(",")), 1):
+        DATABASES[f"replica{number}"] = {
+            **DATABASES["default"],
+            "HOST": host.strip(),
+            "TEST": {"MIRROR": "default"},
+        }
+        replica_aliases.append(f"replica{number}")
 else:
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
-        }
+        },
+        # Local stand-in for a replica: a second file refreshed from the
+        # primary by `manage.py sync_sqlite_replica`. Used only when listed
+        # in DB_READ_REPLICAS (e.g. DB_READ_REPLICAS=replica). Tests get a
+        # separate test database for it too, so replication lag is testable.
+        "replica": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_SQLITE_REPLICA", str(BASE_DIR / "db.replica.sqlite3")),
+        },
     }
+    replica_aliases = []
+
+DATABASE_ROUTERS = ["chats.db.replicas.ReplicaRouter"]
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -248,7 +280,8 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # REST Framework Configuration
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # JWTAuthentication with the resolved user cached (chats.authentication)
+        "chats.authentication.CachedJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
@@ -276,7 +309,81 @@ SIMPLE_JWT = {
     "AUDIENCE": None,
     "ISSUER": None,
     "JTI_CLAIM": "jti",
+    "USER_ID_FIELD": "user_id",  # chats.User has a UUID `user_id` PK, not `id`
     "SLIDING_TOKEN_REFRESH_EXP_CLAIM": "refresh_exp",
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 }
+
+# --- Real-time fan-out (chats.realtime) ---
+# Unset: in-process broker (single worker). For multi-worker deployments run
+# `manage.py realtime_broker` and point every worker at it.
+CHATS_REALTIME_BROKER_URL = os.environ.get("CHATS_REALTIME_BROKER_URL") or None
+
+# --- Conversation membership cache (chats.membership) ---
+# SHARED_ALIAS names an entry in CACHES (e.g. Redis) shared by all workers.
+CHATS_MEMBERSHIP_CACHE = {
+    "MAX_ENTRIES": 10000,
+    "LOCAL_TTL": 5,
+    "SHARED_ALIAS": os.environ.get("CHATS_MEMBERSHIP_CACHE_ALIAS") or None,
+    "SHARED_TTL": 300,
+}
+
+# --- Hot/cold message tiering (chats.archive) ---
+CHATS_ARCHIVE_AFTER_DAYS = int(os.environ.get("CHATS_ARCHIVE_AFTER_DAYS", "365"))
+
+# --- Cached JWT user resolution (chats.authentication) ---
+CHATS_AUTH_USER_CACHE = {
+    "MAX_ENTRIES": 10000,
+    "TTL": 60,
+    "SHARED_ALIAS": os.environ.get("CHATS_AUTH_USER_CACHE_ALIAS") or None,
+}
+
+# --- Per-request SQL instrumentation (chats.instrumentation) ---
+# Sampled requests get X-DB-* / Server-Timing headers and feed the per-view
+# histograms at /api/metrics/sql/ (admin only). X-DB-Slowest-Query (SQL
+# text) is only sent with DEBUG or to staff users.
+CHATS_SQL_INSTRUMENTATION = {
+    "ENABLED": os.environ.get("CHATS_SQL_INSTRUMENTATION", "1") != "0",
+    "SAMPLE_RATE": float(os.environ.get("CHATS_SQL_SAMPLE_RATE", "1.0" if DEBUG else "0.05")),
+    "HEADERS": True,
+    "REPEAT_THRESHOLD": 3,
+}
+
+# --- Write-behind job queue (chats.jobs) ---
+# Message side effects (search indexing, WebSocket fan-out) are enqueued in
+# the write's transaction and run by `manage.py run_job_worker`. EAGER runs
+# them inline instead; it defaults to on with DEBUG so development and tests
+# need no worker. WebSocket fan-out is only queued with a shared realtime
+# broker (CHATS_REALTIME_BROKER_URL); without one it stays in the web process.
+CHATS_JOBS = {
+    "EAGER": os.environ.get("CHATS_JOBS_EAGER", "1" if DEBUG else "0") == "1",
+    "BATCH_SIZE": int(os.environ.get("CHATS_JOBS_BATCH_SIZE", "100")),
+    "MAX_ATTEMPTS": 5,
+    "RETRY_BACKOFF": 2.0,
+    "LEASE": 300,
+    "POLL_INTERVAL": 1.0,
+}
+
+# --- Read replicas (chats.db.replicas) ---
+# GET/HEAD requests read from one of REPLICAS; a user who just wrote reads
+# from the primary for STICKY_SECONDS. SHARED_ALIAS shares those pins
+# between workers.
+CHATS_DB_ROUTING = {
+    "REPLICAS": [
+        alias.strip()
+        for alias in os.environ.get("DB_READ_REPLICAS", ",".join(replica_aliases)).split(",")
+        if alias.strip()
+    ],
+    "STICKY_SECONDS": float(os.environ.get("DB_REPLICA_STICKY_SECONDS", "5")),
+    "MAX_ENTRIES": 10000,
+    "SHARED_ALIAS": os.environ.get("CHATS_DB_ROUTING_CACHE_ALIAS") or None,
+}
+
+# --- Materialized inbox (chats.inbox) ---
+# A message updates its conversation's inbox rows inline for groups of up to
+# FAN_OUT_BATCH_SIZE members; larger groups are fanned out by the job worker
+# in batches of that size.
+CHATS_INBOX = {
+    "FAN_OUT_BATCH_SIZE": int(os.environ.get("CHATS_INBOX_FAN_OUT_BATCH_SIZE", "500")),
+}
@@ -22,6 +22,10 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
+        # BasicAuthentication with verified credentials cached briefly
+        'chats.authentication.CachedBasicAuthentication',
     ],
 }
+
+# Seconds a verified Basic credential is trusted without re-hashing
+CHATS_BASIC_AUTH_CACHE_TTL = 60